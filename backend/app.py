@@ -1,111 +1,344 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from werkzeug.utils import secure_filename
-import pandas as pd
+from services.lazy import startup_report, LazyModule, LazyService, lazy_startup_enabled
+
+with startup_report.phase('import flask'):
+    from flask import Flask, request, jsonify, Response, stream_with_context
+    from flask_cors import CORS
+    from dotenv import load_dotenv
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
 import os
 import json
 from datetime import datetime
 import logging
-from services.who_icd11_service import who_service
-from services.csv_processor import csv_processor
-from services.firebase_service import firebase_service
-from services.fhir_service import fhir_service
+import threading
+import itertools
+
+# Services read credentials at construction, which may now happen after import
+load_dotenv()
+
+# Heavy libraries load on first use (sklearn alone is ~0.7s of import time)
+pd = LazyModule('pandas')
+sp = LazyModule('scipy.sparse')
+sklearn_text = LazyModule('sklearn.feature_extraction.text')
+sklearn_pairwise = LazyModule('sklearn.metrics.pairwise')
+
+# External clients are constructed on first use or by the background warm-up
+who_service = LazyService('services.who_icd11_service', 'who_service')
+csv_processor = LazyService('services.csv_processor', 'csv_processor')
+firebase_service = LazyService('services.firebase_service', 'firebase_service')
+fhir_service = LazyService('services.fhir_service', 'fhir_service')
+suggestion_table = LazyService('services.suggestion_table', 'suggestion_table')
+auto_map_jobs = LazyService('services.auto_map_jobs', 'auto_map_jobs')
+LAZY_SERVICES = [who_service, csv_processor, firebase_service, fhir_service, suggestion_table, auto_map_jobs]
+
+with startup_report.phase('import services'):
+    from services.search_index import NAMASTESearchIndex
+    from services.fuzzy_index import NativeScriptFuzzyIndex
+    from services.model_store import ModelStore
+    from services.topk_retrieval import ImpactOrderedIndex
+    from services.snapshot import MappingSnapshot, source_version
+    from services.stats import TerminologyStats
+    from services.record_store import TerminologyRecordStore
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Uploads are spooled to disk and ingested in chunks, so the limit only caps disk use
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '256')) * 1024 * 1024
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-system resource CSVs and how their columns map onto the combined schema
+SYSTEM_SOURCES = {
+    'Ayurveda': {
+        'path': 'resources/namaste_ayurveda.csv',
+        'columns': {
+            'NAMC_term': 'term_english',
+            'NAMC_term_DEVANAGARI': 'term_original',
+            'Short_definition': 'description',
+            'Ontology_branches': 'category',
+            'NAMC_CODE': 'code'
+        },
+        'category': None
+    },
+    'Siddha': {
+        'path': 'resources/namaste_siddha.csv',
+        'columns': {
+            'NAMC_TERM': 'term_english',
+            'Tamil_term': 'term_original',
+            'Short_definition': 'description',
+            'NAMC_CODE': 'code'
+        },
+        'category': 'Siddha'
+    },
+    'Unani': {
+        'path': 'resources/namaste_unani.csv',
+        'columns': {
+            'NUMC_TERM': 'term_english',
+            'Arabic_term': 'term_original',
+            'Short_definition': 'description',
+            'NUMC_CODE': 'code'
+        },
+        'category': 'Unani'
+    }
+}
+
+RESOURCE_FILES = [source['path'] for source in SYSTEM_SOURCES.values()]
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.1
+# How long a data request waits for the background warm-up before answering from an empty snapshot
+WARMUP_WAIT_SECONDS = float(os.getenv('WARMUP_WAIT_SECONDS', '60'))
+MAX_BATCH_SIZE = 10000
+
+TFIDF_PARAMS = {
+    'max_features': 1000,
+    'stop_words': 'english',
+    'ngram_range': (1, 2)
+}
+
+# Record fields returned for each NAMASTE hit, in API order
+RESULT_FIELDS = ('code', 'term_original', 'term_english', 'system', 'icd11_code', 'icd11_term', 'description')
+
+def parse_prediction_options(top_k, threshold):
+    """Coerce top_k / threshold from a request; raises ValueError with a client-facing message"""
+    try:
+        top_k = int(top_k)
+    except (TypeError, ValueError):
+        raise ValueError(f'top_k must be an integer, got {top_k!r}')
+    if top_k < 1:
+        raise ValueError('top_k must be at least 1')
+    try:
+        threshold = float(threshold)
+    except (TypeError, ValueError):
+        raise ValueError(f'threshold must be a number, got {threshold!r}')
+    if not 0 <= threshold <= 1:
+        raise ValueError('threshold must be between 0 and 1')
+    return top_k, threshold
+
+def namaste_result(records, row_id, confidence=85):
+    """Shape one terminology record as a search/prediction result"""
+    code, term_original, term_english, system, icd11_code, icd11_term, description = records.values(row_id, RESULT_FIELDS)
+    return {
+        'namasteCode': code,
+        'namasteTerm': term_original,
+        'englishTerm': term_english,
+        'system': system,
+        'icd11Code': icd11_code,
+        'icd11Term': icd11_term,
+        'confidence': confidence,
+        'description': description
+    }
+
 class NAMASTEMappingService:
-    def __init__(self):
-        self.ayurveda_data = None
-        self.siddha_data = None
-        self.unani_data = None
-        self.vectorizer = None
+    def __init__(self, autoload=True):
         self.icd11_mappings = {}
-        self.load_data()
-        self.train_model()
+        self.model_store = ModelStore()
+        self._versions = itertools.count(1)
+        self._snapshot = MappingSnapshot(
+            version=0, search_index=NAMASTESearchIndex(), fuzzy_index=NativeScriptFuzzyIndex()
+        )
+        # Serializes writers' publishes only; readers never take it, rebuilds hold it just to publish
+        self._update_lock = threading.RLock()
+        # Bumped by every publish, so a rebuild can tell its inputs went stale while it ran
+        self._generation = 0
+        # One full rebuild at a time, so concurrent reloads cannot keep invalidating each other
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_pending = False
+        self._rebuild_thread = None
+        self._ready = threading.Event()
+        self._warmup_thread = None
+        if autoload:
+            self.reload()
+    
+    @property
+    def snapshot(self):
+        """Current immutable snapshot; grab it once per request and read everything from it"""
+        if not self._ready.is_set():
+            # Lazy startup: wait for the warm-up instead of answering from empty data
+            self._ready.wait(WARMUP_WAIT_SECONDS)
+        return self._snapshot
+    
+    @property
+    def ready(self):
+        return self._ready.is_set()
+    
+    def peek_snapshot(self):
+        """Current snapshot without waiting for warm-up (health checks)"""
+        return self._snapshot
+    
+    def warm_up_async(self, services=()):
+        """Load data and construct external clients in a background thread"""
+        def warm_up():
+            with startup_report.phase('warm-up: data snapshot'):
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"Warm-up data load failed: {e}")
+                    self._ready.set()
+            for service in services:
+                try:
+                    service.warm()
+                except Exception as e:
+                    logger.error(f"Warm-up of {service.name} failed: {e}")
+            logger.info(f"Warm-up finished: {startup_report.to_dict()['deferred_loads']}")
+        
+        self._warmup_thread = threading.Thread(target=warm_up, name='startup-warmup', daemon=True)
+        self._warmup_thread.start()
+    
+    # Read-only views of the current snapshot for callers that need a single field
+    @property
+    def records(self):
+        return self._snapshot.records
+    
+    @property
+    def vectorizer(self):
+        return self._snapshot.vectorizer
+    
+    @property
+    def tfidf_matrix(self):
+        return self._snapshot.tfidf_matrix
+    
+    @property
+    def search_index(self):
+        return self._snapshot.search_index
+    
+    @property
+    def retrieval_index(self):
+        return self._snapshot.retrieval_index
+    
+    @property
+    def data_hash(self):
+        return self._snapshot.data_hash
+    
+    def _publish(self, snapshot):
+        """Swap in a fully built snapshot; a single reference assignment is atomic. Call with _update_lock held"""
+        self._snapshot = snapshot
+        self._generation += 1
+        self._ready.set()
+        logger.info(f"Published data snapshot v{snapshot.version}")
+    
+    def _build_snapshot(self, data_hash, records, vectorizer, tfidf_matrix, retrieval_index=None, search_index=None,
+                        fuzzy_index=None, stats=None, versions=None):
+        if retrieval_index is None:
+            retrieval_index = self.build_retrieval_index(tfidf_matrix)
+        if search_index is None:
+            search_index = self.build_search_index(records)
+        if fuzzy_index is None:
+            fuzzy_index = self.build_fuzzy_index(records)
+        if stats is None:
+            stats = TerminologyStats.from_records(records)
+        return MappingSnapshot(
+            version=next(self._versions),
+            data_hash=data_hash,
+            records=records,
+            vectorizer=vectorizer,
+            tfidf_matrix=tfidf_matrix,
+            search_index=search_index,
+            fuzzy_index=fuzzy_index,
+            retrieval_index=retrieval_index,
+            stats=stats,
+            sources=self._source_rows(records, versions or {})
+        )
+    
+    @staticmethod
+    def _source_versions():
+        """Version of every resource file; taken before reading so a concurrent write can only look newer"""
+        return {system: source_version(source['path']) for system, source in SYSTEM_SOURCES.items()}
+    
+    @staticmethod
+    def _source_rows(records, versions):
+        """Row ids of each system in file order (a full load keeps file order), with the file version read"""
+        sources = {}
+        for system in SYSTEM_SOURCES:
+            row_ids = records.row_ids_where('system', system) if records is not None and records.has_column('system') else []
+            sources[system] = (versions.get(system), np.asarray(row_ids, dtype=np.int64))
+        return sources
+    
+    def reload(self):
+        """Build a fresh snapshot and publish it, reusing the persisted artifact when the resource files are unchanged.
+        
+        Loading and training run without the update lock, so uploads keep being
+        applied incrementally meanwhile. The lock is taken only to publish; if an
+        update was published while building, the build may predate it and is
+        redone.
+        """
+        with self._rebuild_lock:
+            while True:
+                with self._update_lock:
+                    generation = self._generation
+                snapshot = self._load_snapshot()
+                with self._update_lock:
+                    if self._generation == generation:
+                        self._publish(snapshot)
+                        return
+                logger.info("Data changed while rebuilding the snapshot, rebuilding again")
+    
+    def _load_snapshot(self):
+        snapshot = self.load_model_artifact()
+        if snapshot is None:
+            versions = self._source_versions()
+            data_hash, combined_data = self.load_data()
+            # The DataFrame is only a loading format; snapshots keep the compact record store
+            records = TerminologyRecordStore.from_dataframe(combined_data)
+            del combined_data
+            vectorizer, tfidf_matrix = self.train_model(records)
+            snapshot = self._build_snapshot(data_hash, records, vectorizer, tfidf_matrix, versions=versions)
+            # Persist so the next start (or another worker) memory-maps instead of retraining
+            if snapshot.model_ready:
+                self.model_store.save(
+                    data_hash, vectorizer, tfidf_matrix, records, snapshot.retrieval_index, snapshot.search_index,
+                    snapshot.fuzzy_index, snapshot.stats
+                )
+        return snapshot
+    
+    def load_model_artifact(self):
+        """Build a snapshot from a previously trained model for the current resource files"""
+        try:
+            versions = self._source_versions()
+            data_hash = self.model_store.compute_data_hash(RESOURCE_FILES, TFIDF_PARAMS)
+            artifact = self.model_store.load(data_hash)
+            if artifact is None:
+                return None
+            
+            # Matrix, postings, search/fuzzy indexes and record columns are memory-mapped, shared with other workers
+            records = TerminologyRecordStore.from_arrays(artifact['record_schema'], artifact['arrays'])
+            tfidf_matrix = artifact['tfidf_matrix']
+            retrieval_index = (
+                ImpactOrderedIndex.from_arrays(tfidf_matrix, artifact['arrays'])
+                if 'postings_ptr' in artifact['arrays'] else None
+            )
+            search_index = (
+                NAMASTESearchIndex.from_arrays(artifact['arrays'])
+                if 'search_tokens' in artifact['arrays'] else None
+            )
+            fuzzy_index = (
+                NativeScriptFuzzyIndex.from_arrays(artifact['arrays'])
+                if 'fuzzy_grams' in artifact['arrays'] else None
+            )
+            stats = TerminologyStats(**artifact['stats']) if artifact.get('stats') else None
+            snapshot = self._build_snapshot(
+                data_hash, records, artifact['vectorizer'], tfidf_matrix, retrieval_index, search_index,
+                fuzzy_index, stats, versions
+            )
+            logger.info(f"Model restored from artifact: {len(snapshot.records)} total records")
+            return snapshot
+        except Exception as e:
+            logger.error(f"Error loading model artifact: {e}")
+            return None
     
     def load_data(self):
-        """Load NAMASTE CSV data"""
+        """Load NAMASTE CSV data, returning (data_hash, combined_data)"""
+        # Hash before reading so the saved artifact never claims newer data than it holds
+        data_hash = self.model_store.compute_data_hash(RESOURCE_FILES, TFIDF_PARAMS)
         try:
             # Load CSV files
-            if os.path.exists('resources/namaste_ayurveda.csv'):
-                self.ayurveda_data = pd.read_csv('resources/namaste_ayurveda.csv', index_col=None)
-                # Reset index to avoid duplicate index issues
-                self.ayurveda_data.reset_index(drop=True, inplace=True)
-                # Rename columns to match expected format
-                self.ayurveda_data.rename(columns={
-                    'NAMC_term': 'term_english',
-                    'NAMC_term_DEVANAGARI': 'term_original',
-                    'Short_definition': 'description',
-                    'Ontology_branches': 'category',
-                    'NAMC_CODE': 'code'
-                }, inplace=True)
-                # Add missing columns
-                self.ayurveda_data['icd11_code'] = ''
-                self.ayurveda_data['icd11_term'] = ''
-                # Clean NaN values
-                self.ayurveda_data = self.ayurveda_data.fillna('')
-                logger.info(f"Loaded {len(self.ayurveda_data)} Ayurveda records")
-
-            if os.path.exists('resources/namaste_siddha.csv'):
-                self.siddha_data = pd.read_csv('resources/namaste_siddha.csv', index_col=None)
-                # Reset index to avoid duplicate index issues
-                self.siddha_data.reset_index(drop=True, inplace=True)
-                # Rename columns for Siddha (different column names)
-                self.siddha_data.rename(columns={
-                    'NAMC_TERM': 'term_english',
-                    'Tamil_term': 'term_original',
-                    'Short_definition': 'description',
-                    'NAMC_CODE': 'code'
-                }, inplace=True)
-                # Add missing columns
-                self.siddha_data['category'] = 'Siddha'
-                self.siddha_data['icd11_code'] = ''
-                self.siddha_data['icd11_term'] = ''
-                # Clean NaN values
-                self.siddha_data = self.siddha_data.fillna('')
-                logger.info(f"Loaded {len(self.siddha_data)} Siddha records")
-
-            if os.path.exists('resources/namaste_unani.csv'):
-                self.unani_data = pd.read_csv('resources/namaste_unani.csv', index_col=None)
-                # Reset index to avoid duplicate index issues
-                self.unani_data.reset_index(drop=True, inplace=True)
-                # Rename columns for Unani (different column names)
-                self.unani_data.rename(columns={
-                    'NUMC_TERM': 'term_english',
-                    'Arabic_term': 'term_original',
-                    'Short_definition': 'description',
-                    'NUMC_CODE': 'code'
-                }, inplace=True)
-                # Add missing columns
-                self.unani_data['category'] = 'Unani'
-                self.unani_data['icd11_code'] = ''
-                self.unani_data['icd11_term'] = ''
-                # Clean NaN values
-                self.unani_data = self.unani_data.fillna('')
-                logger.info(f"Loaded {len(self.unani_data)} Unani records")
+            ayurveda_data = self._load_system_frame('Ayurveda')
+            siddha_data = self._load_system_frame('Siddha')
+            unani_data = self._load_system_frame('Unani')
             
             # Combine all data
-            all_data = []
-            if self.ayurveda_data is not None:
-                self.ayurveda_data['system'] = 'Ayurveda'
-                all_data.append(self.ayurveda_data)
-            if self.siddha_data is not None:
-                self.siddha_data['system'] = 'Siddha'
-                all_data.append(self.siddha_data)
-            if self.unani_data is not None:
-                self.unani_data['system'] = 'Unani'
-                all_data.append(self.unani_data)
+            all_data = [df for df in (ayurveda_data, siddha_data, unani_data) if df is not None]
             
             if all_data:
                 try:
@@ -115,12 +348,12 @@ class NAMASTEMappingService:
                             all_data[i] = df.reset_index(drop=True)
                     
                     # Use pd.concat with proper error handling
-                    self.combined_data = pd.concat(all_data, ignore_index=True, sort=False)
+                    combined_data = pd.concat(all_data, ignore_index=True, sort=False)
                     # Ensure unique index
-                    self.combined_data.reset_index(drop=True, inplace=True)
+                    combined_data.reset_index(drop=True, inplace=True)
                     # Clean NaN values to prevent JSON serialization errors
-                    self.combined_data = self.combined_data.fillna('')
-                    logger.info(f"Combined dataset: {len(self.combined_data)} total records")
+                    combined_data = combined_data.fillna('')
+                    logger.info(f"Combined dataset: {len(combined_data)} total records")
                 except Exception as concat_error:
                     logger.error(f"Error concatenating dataframes: {concat_error}")
                     # Try alternative approach - combine data manually
@@ -130,97 +363,454 @@ class NAMASTEMappingService:
                             combined_records.extend(df.to_dict('records'))
                     
                     if combined_records:
-                        self.combined_data = pd.DataFrame(combined_records)
-                        self.combined_data.reset_index(drop=True, inplace=True)
+                        combined_data = pd.DataFrame(combined_records)
+                        combined_data.reset_index(drop=True, inplace=True)
                         # Clean NaN values to prevent JSON serialization errors
-                        self.combined_data = self.combined_data.fillna('')
-                        logger.info(f"Combined dataset (alternative method): {len(self.combined_data)} total records")
+                        combined_data = combined_data.fillna('')
+                        logger.info(f"Combined dataset (alternative method): {len(combined_data)} total records")
                     else:
                         raise Exception("No records to combine")
             else:
                 logger.warning("No CSV data found")
-                self.combined_data = pd.DataFrame()
+                combined_data = pd.DataFrame()
                 
         except Exception as e:
             logger.error(f"Error loading data: {e}")
             # Don't use mock data - let the system work with what's available
-            self.combined_data = pd.DataFrame()
+            combined_data = pd.DataFrame()
             logger.warning("No data loaded - system will work with empty dataset")
+        
+        return data_hash, combined_data
+
+    def _load_system_frame(self, system):
+        """Read one system's resource CSV and normalize it to the combined schema"""
+        source = SYSTEM_SOURCES[system]
+        if not os.path.exists(source['path']):
+            return None
+        
+        # Cells are read as text, the form uploads and auto-map write them back in
+        df = self._normalize_system_frame(system, pd.read_csv(source['path'], index_col=None, dtype=str))
+        logger.info(f"Loaded {len(df)} {system} records")
+        return df
     
+    @staticmethod
+    def _normalize_system_frame(system, df):
+        """Rename a system's raw CSV columns to the combined schema"""
+        source = SYSTEM_SOURCES[system]
+        # Reset index to avoid duplicate index issues
+        df = df.reset_index(drop=True)
+        # Uploads and auto-map write canonical columns (code, term_english, ...) next to the
+        # source ones (NAMC_CODE, ...): keep one, preferring the canonical value when it is set
+        for original, canonical in source['columns'].items():
+            if original in df.columns and canonical in df.columns:
+                fallback = df.pop(original)
+                blank = df[canonical].isna() | (df[canonical].astype(str).str.strip() == '')
+                df[canonical] = df[canonical].where(~blank, fallback)
+        # Rename columns to match expected format
+        df = df.rename(columns=source['columns'])
+        # Add missing columns
+        if source['category'] is not None:
+            df['category'] = source['category']
+        # Keep mappings already written by uploads or auto-map; only files without them get blanks
+        for column in ('icd11_code', 'icd11_term'):
+            if column not in df.columns:
+                df[column] = ''
+        # Clean NaN values
+        df = df.fillna('').astype(str)
+        df['system'] = system
+        return df
+
+    def build_search_index(self, records):
+        """Build the token/prefix inverted index used by NAMASTE search"""
+        try:
+            return NAMASTESearchIndex.from_records(records)
+        except Exception as e:
+            logger.error(f"Error building search index: {e}")
+            return NAMASTESearchIndex()
+    
+    def build_fuzzy_index(self, records):
+        """Build the per-script trigram index used for fuzzy native-script search"""
+        try:
+            return NativeScriptFuzzyIndex.from_records(records)
+        except Exception as e:
+            logger.error(f"Error building fuzzy index: {e}")
+            return NativeScriptFuzzyIndex()
     
-    def train_model(self):
-        """Train TF-IDF model for text similarity"""
+    def train_model(self, records):
+        """Train TF-IDF model for text similarity, returning (vectorizer, tfidf_matrix)"""
         try:
-            if self.combined_data is not None and len(self.combined_data) > 0:
+            if records is not None and len(records) > 0:
                 # Combine text fields for training
-                text_data = []
-                for _, row in self.combined_data.iterrows():
-                    combined_text = f"{row.get('term_english', '')} {row.get('description', '')} {row.get('category', '')}"
-                    text_data.append(combined_text.lower())
+                text_data = [
+                    self._document_text(term, description, category)
+                    for term, description, category in zip(
+                        records.column('term_english'), records.column('description'), records.column('category')
+                    )
+                ]
                 
                 # Train TF-IDF vectorizer
-                self.vectorizer = TfidfVectorizer(
-                    max_features=1000,
-                    stop_words='english',
-                    ngram_range=(1, 2)
-                )
-                self.tfidf_matrix = self.vectorizer.fit_transform(text_data)
+                vectorizer = sklearn_text.TfidfVectorizer(**TFIDF_PARAMS)
+                tfidf_matrix = vectorizer.fit_transform(text_data)
                 logger.info("ML model trained successfully")
+                return vectorizer, tfidf_matrix
             else:
                 logger.warning("No data available for training")
         except Exception as e:
             logger.error(f"Error training model: {e}")
+        return None, None
+    
+    def build_retrieval_index(self, tfidf_matrix):
+        """Build impact-ordered posting lists over the TF-IDF weights for top-k prediction"""
+        if tfidf_matrix is None:
+            return None
+        try:
+            return ImpactOrderedIndex(tfidf_matrix)
+        except Exception as e:
+            logger.error(f"Error building retrieval index: {e}")
+            return None
+    
+    @staticmethod
+    def _document_text(term_english, description, category):
+        """Text a row contributes to the TF-IDF model"""
+        return f"{term_english} {description} {category}".lower()
+    
+    @staticmethod
+    def _row_fingerprint(values):
+        """Comparable form of a row, ignoring int/float drift from mixed-type columns"""
+        normalized = []
+        for value in values:
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            normalized.append(str(value))
+        return tuple(normalized)
+    
+    def apply_incremental_update(self, system, delta=None):
+        """Apply only the added, changed and removed rows of one system's resource CSV.
+        
+        With a ``delta`` (SourceDelta) made against the file version this snapshot
+        was built from, only the rows it names are read and vectorized, a chunk
+        at a time (appended rows may be streamed from the upload file). Without
+        one, or when the versions differ, the file is re-read and diffed row by
+        row on full row content, so blank or duplicate codes never collide.
+        Replaced rows are tombstoned, new rows are appended with vectors from
+        the current vocabulary, and the result is published as a new snapshot. A
+        full rebuild (which refits the vocabulary and compacts tombstones) is
+        scheduled off the request path.
+        """
+        system = system.capitalize()
+        base = self._snapshot
+        if system not in SYSTEM_SOURCES or not base.model_ready or not base.has_data:
+            self.reload()
+            return {'mode': 'full'}
+        
+        with self._update_lock:
+            base = self._snapshot
+            if not base.model_ready or not base.has_data:
+                # A reload published an empty snapshot meanwhile; nothing to patch
+                self.schedule_rebuild()
+                return {'mode': 'full'}
+            
+            columns = list(base.records.columns)
+            version, row_ids = base.sources.get(system, (None, np.zeros(0, dtype=np.int64)))
+            if delta is not None and version is not None and delta.base_version == version:
+                plan = self._plan_from_delta(system, row_ids, delta, columns)
+                new_version = delta.version
+            else:
+                new_version = source_version(SYSTEM_SOURCES[system]['path'])
+                plan = self._plan_from_file(system, base, row_ids, columns)
+            stale_ids, chunks, order, counts = plan
+            
+            # New rows are normalized and vectorized a chunk at a time; only the record
+            # store and the vector blocks grow, the whole delta is never held as one batch
+            records = base.records
+            first_new_id = len(records)
+            blocks = []
+            for chunk in chunks:
+                if not len(chunk):
+                    continue
+                records = records.append(chunk)
+                blocks.append(base.vectorizer.transform([
+                    self._document_text(term, description, category)
+                    for term, description, category in zip(chunk['term_english'], chunk['description'], chunk['category'])
+                ]))
+            new_ids = np.arange(first_new_id, len(records), dtype=np.int64)
+            
+            if not stale_ids and not len(new_ids):
+                sources = dict(base.sources)
+                sources[system] = (new_version, row_ids)
+                self._publish(self._derive_snapshot(base, sources=sources))
+                return {'mode': 'incremental', 'added': 0, 'changed': 0, 'removed': 0}
+            
+            # Slots of the new file order still marked -1 are the appended rows, in order
+            order[order < 0] = new_ids
+            
+            # Vectors of new rows go to the delta block; the base matrix is shared, never copied
+            if blocks:
+                new_vectors = blocks[0] if len(blocks) == 1 else sp.vstack(blocks).tocsr()
+            else:
+                # Removal-only update: the vectorizer rejects an empty batch
+                new_vectors = sp.csr_matrix((0, base.tfidf_matrix.shape[1]), dtype=base.tfidf_matrix.dtype)
+            delta_matrix = new_vectors if base.delta_matrix is None else sp.vstack([base.delta_matrix, new_vectors]).tocsr()
+            
+            # Index overlays read the new rows back from the record store
+            added_rows = (
+                (row_id, records.values(row_id, NAMASTESearchIndex.SEARCH_FIELDS), records.value(row_id, 'system'))
+                for row_id in new_ids.tolist()
+            )
+            added_terms = (
+                (row_id, records.value(row_id, 'term_original'), records.value(row_id, 'system'))
+                for row_id in new_ids.tolist()
+            )
+            sources = dict(base.sources)
+            sources[system] = (new_version, order)
+            
+            # Every structure is derived, never modified, so readers of `base` are unaffected
+            snapshot = self._derive_snapshot(
+                base,
+                records=records,
+                delta_matrix=delta_matrix,
+                search_index=base.search_index.with_delta(added_rows, stale_ids),
+                fuzzy_index=base.fuzzy_index.with_delta(added_terms, stale_ids),
+                retrieval_index=(
+                    base.retrieval_index.with_delta(new_vectors, new_ids, stale_ids)
+                    if base.retrieval_index is not None else None
+                ),
+                deleted_rows=base.deleted_rows | set(stale_ids),
+                stats=(base.stats or TerminologyStats.from_records(base.records, base.deleted_rows)).with_delta(
+                    records, new_ids.tolist(), stale_ids
+                ),
+                sources=sources
+            )
+            self._publish(snapshot)
+            
+            logger.info(f"Incremental {system} update: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed")
+        
+        self.schedule_rebuild()
+        return dict(mode='incremental', **counts)
+    
+    def _derive_snapshot(self, base, **changes):
+        """Next snapshot version: the base's fields with some replaced"""
+        fields = {
+            name: getattr(base, name) for name in (
+                'data_hash', 'records', 'vectorizer', 'tfidf_matrix', 'search_index', 'fuzzy_index',
+                'retrieval_index', 'deleted_rows', 'stats', 'delta_matrix', 'sources'
+            )
+        }
+        fields.update(changes)
+        return MappingSnapshot(version=next(self._versions), **fields)
+    
+    def _normalize_rows(self, system, raw, columns):
+        """Raw CSV rows of a system (a frame, or row dicts) as a frame with the record columns"""
+        frame = raw if isinstance(raw, pd.DataFrame) else pd.DataFrame(list(raw))
+        return self._normalize_system_frame(system, frame).reindex(columns=columns, fill_value='')
+    
+    def _plan_from_delta(self, system, row_ids, delta, columns):
+        """Stale ids, new row chunks, new file order and counts from a writer's delta; touches only delta rows"""
+        removed = [position for position in delta.removed if position < len(row_ids)]
+        dropped = set(removed)
+        updated = sorted(position for position in delta.updated if position < len(row_ids) and position not in dropped)
+        stale_ids = row_ids[removed + updated].tolist()
+        
+        def chunks():
+            if updated:
+                yield self._normalize_rows(system, [delta.updated[position] for position in updated], columns)
+            for chunk in delta.iter_appended(csv_processor.chunk_rows):
+                yield self._normalize_rows(system, chunk, columns)
+        
+        # New file order: rewritten rows get new ids in place, dropped rows leave, appended rows go last
+        order = row_ids.copy()
+        order[updated] = -1
+        order = np.concatenate([np.delete(order, removed), np.full(len(delta.appended), -1, dtype=np.int64)])
+        counts = {'added': len(delta.appended), 'changed': len(updated), 'removed': len(removed)}
+        return stale_ids, chunks(), order, counts
+    
+    def _plan_from_file(self, system, base, row_ids, columns):
+        """Stale ids, new row chunks, new file order and counts by diffing the whole file against the snapshot"""
+        new_frame = self._load_system_frame(system)
+        if new_frame is None:
+            new_frame = pd.DataFrame(columns=columns)
+        new_frame = new_frame.reindex(columns=columns, fill_value='')
+        
+        # Identical rows (in full) are kept; duplicates are matched one to one in file order
+        current = {}
+        for row_id in reversed(row_ids.tolist()):
+            fingerprint = self._row_fingerprint(base.records.values(row_id, columns))
+            current.setdefault(fingerprint, []).append(row_id)
+        
+        order = np.full(len(new_frame), -1, dtype=np.int64)
+        new_positions = []
+        for position, values in enumerate(new_frame.values.tolist()):
+            matches = current.get(self._row_fingerprint(values))
+            if matches:
+                order[position] = matches.pop()
+            else:
+                new_positions.append(position)
+        stale_ids = sorted(row_id for matches in current.values() for row_id in matches)
+        
+        changed = min(len(stale_ids), len(new_positions))
+        counts = {'added': len(new_positions) - changed, 'changed': changed, 'removed': len(stale_ids) - changed}
+        chunk_rows = csv_processor.chunk_rows
+        chunks = (
+            new_frame.iloc[new_positions[start:start + chunk_rows]].reset_index(drop=True)
+            for start in range(0, len(new_positions), chunk_rows)
+        )
+        return stale_ids, chunks, order, counts
+    
+    def iter_terms(self, snapshot=None):
+        """Yield (system, code, term_english) for every live row of a snapshot"""
+        snapshot = snapshot or self.snapshot
+        if snapshot.records is None:
+            return
+        systems = snapshot.records.column('system')
+        codes = snapshot.records.column('code')
+        terms = snapshot.records.column('term_english')
+        for row_id, (system, code, term) in enumerate(zip(systems, codes, terms)):
+            if row_id not in snapshot.deleted_rows:
+                yield system, code, term
     
-    def predict_mapping(self, clinical_text, top_k=3):
+    def schedule_rebuild(self):
+        """Run a full reload in a background thread, coalescing requests made while one is running"""
+        with self._update_lock:
+            self._rebuild_pending = True
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(target=self._rebuild_worker, name='model-rebuild', daemon=True)
+            self._rebuild_thread.start()
+    
+    def _rebuild_worker(self):
+        while True:
+            with self._update_lock:
+                if not self._rebuild_pending:
+                    self._rebuild_thread = None
+                    return
+                self._rebuild_pending = False
+            try:
+                self.reload()
+                logger.info("Background model rebuild completed")
+            except Exception as e:
+                logger.error(f"Background model rebuild failed: {e}")
+    
+    def predict_mapping(self, clinical_text, top_k=3, snapshot=None):
         """Predict NAMASTE codes for clinical text"""
+        snapshot = snapshot or self.snapshot
         try:
-            if self.vectorizer is None or self.combined_data is None:
+            if not snapshot.model_ready or snapshot.records is None:
                 return []
             
             # Vectorize input text
-            input_vector = self.vectorizer.transform([clinical_text.lower()])
+            input_vector = snapshot.vectorizer.transform([clinical_text.lower()])
+            
+            # Exact top-k without scoring every row of the corpus
+            if snapshot.retrieval_index is not None:
+                matches = snapshot.retrieval_index.top_k(input_vector, k=top_k, threshold=DEFAULT_SIMILARITY_THRESHOLD)
+                return [self._build_prediction(snapshot, idx, similarity) for idx, similarity in matches]
             
-            # Calculate similarity
-            similarities = cosine_similarity(input_vector, self.tfidf_matrix).flatten()
+            # Fallback: dense similarity over the whole corpus
+            similarities = sklearn_pairwise.cosine_similarity(input_vector, snapshot.corpus_matrix()).flatten()
+            similarities[snapshot.deleted_ids()] = 0
             
             # Get top matches
             top_indices = similarities.argsort()[-top_k:][::-1]
             
             results = []
             for idx in top_indices:
-                if similarities[idx] > 0.1:  # Minimum similarity threshold
-                    row = self.combined_data.iloc[idx]
-                    confidence = min(95, max(70, int(similarities[idx] * 100)))
-                    
-                    results.append({
-                        'namasteCode': row.get('code', 'N/A'),
-                        'namasteTerm': row.get('term_original', 'N/A'),
-                        'englishTerm': row.get('term_english', 'N/A'),
-                        'system': row.get('system', 'Unknown'),
-                        'icd11Code': row.get('icd11_code', 'N/A'),
-                        'icd11Term': row.get('icd11_term', 'N/A'),
-                        'confidence': confidence,
-                        'description': row.get('description', 'No description available')
-                    })
+                if similarities[idx] > DEFAULT_SIMILARITY_THRESHOLD:  # Minimum similarity threshold
+                    results.append(self._build_prediction(snapshot, idx, similarities[idx]))
             
             return results
         except Exception as e:
             logger.error(f"Error in prediction: {e}")
             return []
+    
+    def predict_mapping_batch(self, items, top_k=3, threshold=DEFAULT_SIMILARITY_THRESHOLD, chunk_size=512, snapshot=None):
+        """Predict NAMASTE codes for many clinical texts, yielding (index, predictions) in input order.
+        
+        Each item is either a text or a dict with 'clinical_text' and optional per-item
+        'top_k' / 'threshold' (already validated, see parse_prediction_options). Every chunk of texts is scored against the whole corpus
+        with one sparse matrix product. The whole batch is served from one snapshot.
+        """
+        snapshot = snapshot or self.snapshot
+        if not snapshot.model_ready:
+            for index in range(len(items)):
+                yield index, []
+            return
+        
+        # Rows of both matrices are L2-normalised, so the dot product is the cosine similarity
+        corpus_t = snapshot.corpus_matrix().T.tocsc()
+        deleted = snapshot.deleted_ids()
+        
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            texts, limits, thresholds = [], [], []
+            for item in chunk:
+                if isinstance(item, dict):
+                    texts.append(str(item.get('clinical_text', '')).lower())
+                    limits.append(item.get('top_k', top_k))
+                    thresholds.append(item.get('threshold', threshold))
+                else:
+                    texts.append(str(item).lower())
+                    limits.append(top_k)
+                    thresholds.append(threshold)
+            
+            scores = (snapshot.vectorizer.transform(texts) @ corpus_t).tocsr()
+            
+            for offset in range(len(chunk)):
+                row_start, row_end = scores.indptr[offset], scores.indptr[offset + 1]
+                row_scores = scores.data[row_start:row_end]
+                row_indices = scores.indices[row_start:row_end]
+                
+                keep = row_scores > thresholds[offset]
+                if len(deleted):
+                    keep &= ~np.isin(row_indices, deleted)
+                row_scores, row_indices = row_scores[keep], row_indices[keep]
+                
+                k = limits[offset]
+                if k <= 0:
+                    order = np.array([], dtype=int)
+                elif len(row_scores) > k:
+                    order = np.argpartition(-row_scores, k - 1)[:k]
+                    order = order[np.argsort(-row_scores[order])]
+                else:
+                    order = np.argsort(-row_scores)
+                
+                yield start + offset, [
+                    self._build_prediction(snapshot, row_indices[i], row_scores[i]) for i in order
+                ]
+    
+    @staticmethod
+    def _build_prediction(snapshot, idx, similarity):
+        """Shape a corpus row and its similarity score as a prediction result"""
+        result = namaste_result(snapshot.records, idx)
+        result['confidence'] = min(95, max(70, int(similarity * 100)))
+        return result
 
-# Initialize the service
-mapping_service = NAMASTEMappingService()
+# Initialize the service; with LAZY_STARTUP data and clients load in the background
+if lazy_startup_enabled():
+    mapping_service = NAMASTEMappingService(autoload=False)
+    mapping_service.warm_up_async(LAZY_SERVICES)
+else:
+    with startup_report.phase('load data snapshot'):
+        mapping_service = NAMASTEMappingService()
+
+startup_report.mark('app imported')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    snapshot = mapping_service.peek_snapshot()
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if mapping_service.ready else 'warming_up',
         'timestamp': datetime.now().isoformat(),
-        'data_loaded': mapping_service.combined_data is not None,
-        'model_trained': mapping_service.vectorizer is not None
+        'data_loaded': snapshot.records is not None,
+        'model_trained': snapshot.vectorizer is not None,
+        'snapshot_version': snapshot.version
     })
 
+@app.route('/api/startup', methods=['GET'])
+def startup_timings():
+    """Startup phase and deferred-import timings"""
+    return jsonify(startup_report.to_dict(pending=[service.name for service in LAZY_SERVICES]))
+
 @app.route('/api/ml/predict', methods=['POST'])
 def predict_mapping():
     """ML-based mapping prediction"""
@@ -243,65 +833,107 @@ def predict_mapping():
         logger.error(f"Error in prediction endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ml/predict/batch', methods=['POST'])
+def predict_mapping_batch():
+    """Batch ML-based mapping prediction, streamed back as NDJSON in input order"""
+    try:
+        data = request.get_json()
+        items = data.get('items', data.get('clinical_texts', []))
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'A non-empty list of items is required'}), 400
+        
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch size exceeds maximum of {MAX_BATCH_SIZE}'}), 400
+        
+        # Validate every option up front so a bad item can't break the stream partway
+        try:
+            top_k, threshold = parse_prediction_options(
+                data.get('top_k', 3), data.get('threshold', DEFAULT_SIMILARITY_THRESHOLD)
+            )
+            for index, item in enumerate(items):
+                if isinstance(item, dict) and ('top_k' in item or 'threshold' in item):
+                    try:
+                        item['top_k'], item['threshold'] = parse_prediction_options(
+                            item.get('top_k', top_k), item.get('threshold', threshold)
+                        )
+                    except ValueError as e:
+                        raise ValueError(f'items[{index}]: {e}')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Pin the snapshot so a streamed batch is scored against one consistent model
+        snapshot = mapping_service.snapshot
+        
+        if not data.get('stream', True):
+            predictions = [
+                {'index': index, 'predictions': result}
+                for index, result in mapping_service.predict_mapping_batch(items, top_k, threshold, snapshot=snapshot)
+            ]
+            return jsonify({
+                'success': True,
+                'results': predictions,
+                'total': len(predictions),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        def generate():
+            try:
+                for index, result in mapping_service.predict_mapping_batch(items, top_k, threshold, snapshot=snapshot):
+                    yield json.dumps({'index': index, 'predictions': result}) + '\n'
+            except Exception as e:
+                logger.error(f"Error streaming batch predictions: {e}")
+                yield json.dumps({'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        logger.error(f"Error in batch prediction endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/namaste/search', methods=['POST'])
 def search_namaste():
     """Search NAMASTE codes"""
     try:
         data = request.get_json()
-        query = data.get('query', '').lower()
+        query = data.get('query', '')
         systems = data.get('systems', ['ayurveda', 'siddha', 'unani'])
         limit = data.get('limit', 10)
+        operator = data.get('operator', 'and').lower()
+        fuzzy = data.get('fuzzy', True)
         
-        if mapping_service.combined_data is None:
-            return jsonify({'results': []})
+        # One snapshot for the whole request keeps index and rows consistent during reloads
+        snapshot = mapping_service.snapshot
+        if not snapshot.has_data:
+            return jsonify({'results': [], 'total': 0})
         
-        # Filter by systems - handle case sensitivity and missing data
-        if mapping_service.combined_data is not None and len(mapping_service.combined_data) > 0:
-            # Ensure system column exists and handle NaN values
-            if 'system' in mapping_service.combined_data.columns:
-                # Fill NaN values in system column with 'Unknown'
-                mapping_service.combined_data['system'] = mapping_service.combined_data['system'].fillna('Unknown')
-                
-                # Filter by systems (case insensitive)
-                system_mask = mapping_service.combined_data['system'].str.lower().isin([s.lower() for s in systems])
-                filtered_data = mapping_service.combined_data[system_mask]
-            else:
-                # If no system column, use all data
-                filtered_data = mapping_service.combined_data
-        else:
-            filtered_data = pd.DataFrame()
-        
-        # Search in text fields with better matching
-        mask = (
-            filtered_data['term_english'].fillna('').str.lower().str.contains(query, na=False) |
-            filtered_data['term_original'].fillna('').str.lower().str.contains(query, na=False) |
-            filtered_data['description'].fillna('').str.lower().str.contains(query, na=False) |
-            filtered_data['category'].fillna('').str.lower().str.contains(query, na=False) |
-            filtered_data['code'].fillna('').str.lower().str.contains(query, na=False)
-        )
+        if operator not in ('and', 'or'):
+            return jsonify({'error': "Operator must be 'and' or 'or'"}), 400
+        
+        # Literal token/prefix lookup against the prebuilt inverted index
+        row_ids = snapshot.search_index.search(query, systems=systems, limit=limit, operator=operator)
+        confidences = {}
         
-        results = filtered_data[mask].head(limit)
+        # Top up with misspelled/partial native-script matches from the trigram index
+        if fuzzy and len(row_ids) < limit:
+            seen = set(row_ids)
+            for row_id, edits in snapshot.fuzzy_index.search(query, systems=systems, limit=limit):
+                if row_id not in seen and len(row_ids) < limit:
+                    row_ids.append(row_id)
+                    confidences[row_id] = max(50, 80 - 10 * edits)
         
-        # Map results to expected output format
+        # Map results to expected output format straight from the record store
+        records = snapshot.records
         mapped_results = []
-        for _, row in results.iterrows():
-            # Get ICD-11 mapping suggestions
-            icd11_mappings = who_service.get_mapping_suggestions(
-                row.get('term_english', ''), 
-                row.get('code', '')
+        for row_id in row_ids:
+            result = namaste_result(records, row_id, confidences.get(row_id, 85))
+            # Precomputed ICD-11 mapping suggestions (in-memory, no WHO round trips)
+            result['icd11Mappings'] = suggestion_table.lookup(
+                result['system'],
+                result['namasteCode'],
+                result['englishTerm']
             )
-            
-            mapped_results.append({
-                'namasteCode': row.get('code', 'N/A'),
-                'namasteTerm': row.get('term_original', 'N/A'),
-                'englishTerm': row.get('term_english', 'N/A'),
-                'system': row.get('system', 'Unknown'),
-                'icd11Code': row.get('icd11_code', 'N/A'),
-                'icd11Term': row.get('icd11_term', 'N/A'),
-                'confidence': 85,  # Default confidence
-                'description': row.get('description', 'No description available'),
-                'icd11Mappings': icd11_mappings  # Add ICD-11 mapping suggestions
-            })
+            mapped_results.append(result)
         
         return jsonify({
             'results': mapped_results,
@@ -316,25 +948,50 @@ def search_namaste():
 def get_stats():
     """Get system statistics"""
     try:
-        if mapping_service.combined_data is None:
+        snapshot = mapping_service.snapshot
+        if snapshot.records is None:
             return jsonify({'error': 'No data available'}), 404
         
-        stats = {
-            'total_codes': len(mapping_service.combined_data),
-            'systems': {
-                'ayurveda': len(mapping_service.combined_data[mapping_service.combined_data['system'] == 'Ayurveda']),
-                'siddha': len(mapping_service.combined_data[mapping_service.combined_data['system'] == 'Siddha']),
-                'unani': len(mapping_service.combined_data[mapping_service.combined_data['system'] == 'Unani'])
-            },
-            'categories': mapping_service.combined_data['category'].value_counts().to_dict() if 'category' in mapping_service.combined_data.columns else {}
-        }
-        
-        return jsonify(stats)
+        # Counters are maintained per snapshot; the body and ETag are prerendered
+        stats = snapshot.stats or TerminologyStats.from_records(snapshot.records, snapshot.deleted_rows)
+        if stats.etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(stats.body, mimetype='application/json')
+        response.set_etag(stats.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     
     except Exception as e:
         logger.error(f"Error in stats endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/namaste/export', methods=['GET'])
+def export_namaste():
+    """Export NAMASTE records as NDJSON, optionally for a single system"""
+    try:
+        system = request.args.get('system')
+        snapshot = mapping_service.snapshot
+        records = snapshot.records
+        if records is None:
+            return jsonify({'error': 'No data available'}), 404
+        
+        if system:
+            row_ids = records.row_ids_where('system', system.capitalize())
+        else:
+            row_ids = range(len(records))
+        
+        def generate():
+            for row_id in row_ids:
+                if row_id not in snapshot.deleted_rows:
+                    yield json.dumps(records.row(row_id), ensure_ascii=False, default=str) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        logger.error(f"Error in export endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/who/sync', methods=['POST'])
 def sync_who_icd11():
     """Sync with WHO ICD-11 API"""
@@ -366,11 +1023,13 @@ def search_who_icd11():
         if not query:
             return jsonify({'error': 'Query is required'}), 400
         
-        results = who_service.search_icd11_codes(query, include_tm2)
+        search = who_service.search_icd11_codes_detailed(query, include_tm2)
         
         return jsonify({
             'success': True,
-            'results': results,
+            'results': search['results'],
+            'partial': search['partial'],
+            'sources': search['sources'],
             'query': query,
             'timestamp': datetime.now().isoformat()
         })
@@ -378,6 +1037,61 @@ def search_who_icd11():
         logger.error(f"Error in WHO search endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/who/transport', methods=['GET'])
+def who_transport_stats():
+    """Connection reuse, retry, failure and search-cache counters for WHO API calls"""
+    return jsonify({
+        'success': True,
+        'transport': who_service.transport.stats(),
+        'cache': who_service.search_cache.stats(),
+        'local_cache': who_service.local_cache.stats() if who_service.local_cache is not None else None,
+        'token': who_service.token.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/who/mirror', methods=['GET'])
+def who_mirror_status():
+    """Sync progress and completeness of the offline TM2/MMS mirror"""
+    try:
+        return jsonify({
+            'success': True,
+            'enabled': who_service.mirror_enabled,
+            'mirror': who_service.mirror.status(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error in WHO mirror status endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/who/mirror/sync', methods=['POST'])
+def sync_who_mirror():
+    """Walk the TM2/MMS linearizations into the offline mirror in the background"""
+    try:
+        data = request.get_json(silent=True) or {}
+        linearizations = tuple(data.get('linearizations', ['tm2', 'mms']))
+        restart = bool(data.get('restart', False))
+        
+        if not who_service.credentials_configured():
+            return jsonify({'error': 'WHO ICD-11 API credentials are not configured'}), 503
+        if not who_service.get_access_token():
+            return jsonify({'error': 'Could not obtain a WHO ICD-11 access token'}), 503
+        
+        try:
+            started = who_service.start_mirror_sync(linearizations, restart=restart)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not started:
+            return jsonify({'error': 'A mirror sync is already running'}), 409
+        
+        return jsonify({
+            'success': True,
+            'message': f"Syncing {', '.join(linearizations)} for release {who_service.release_id} in the background",
+            'timestamp': datetime.now().isoformat()
+        }), 202
+    except Exception as e:
+        logger.error(f"Error in WHO mirror sync endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/csv/upload', methods=['POST'])
 def upload_csv():
     """Upload and process NAMASTE CSV file"""
@@ -392,20 +1106,19 @@ def upload_csv():
             return jsonify({'error': 'No file selected'}), 400
         
         result = csv_processor.process_uploaded_csv(file, system_type)
+        source_delta = result.pop('source_delta', None)
         
         if result['success']:
             # Upload to Firebase for real-time ingestion
             try:
-                # Convert CSV data to list of dictionaries for Firebase
-                df = pd.read_csv(f"resources/namaste_{system_type.lower()}.csv")
-                firebase_data = df.to_dict('records')
-                firebase_service.upload_namaste_data(firebase_data, system_type)
+                # Stream the merged CSV in batches that fit one Firestore write batch (500)
+                for firebase_data in csv_processor.iter_records(system_type, batch_rows=500):
+                    firebase_service.upload_namaste_data(firebase_data, system_type)
             except Exception as e:
                 logger.error(f"Failed to upload to Firebase: {e}")
             
-            # Reload data in the mapping service
-            mapping_service.load_data()
-            mapping_service.train_model()
+            # Apply the delta now; the full rebuild runs in the background
+            result['index_update'] = mapping_service.apply_incremental_update(system_type, source_delta)
             
             return jsonify(result)
         else:
@@ -428,60 +1141,126 @@ def get_upload_history():
         logger.error(f"Error in upload history endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+def finalize_auto_map(mapped_df, resource_path, system_type, mapped_rows=()):
+    """Persist an auto-mapped frame: resource CSV, Firebase and the search index"""
+    # Save updated data; the delta names the rows that gained a mapping
+    delta = csv_processor.save_mapping_frame(mapped_df, resource_path, mapped_rows)
+    
+    # Update Firebase with mapping results
+    try:
+        firebase_data = mapped_df.to_dict('records')
+        firebase_service.upload_namaste_data(firebase_data, system_type)
+    except Exception as e:
+        logger.error(f"Failed to update Firebase: {e}")
+    
+    # Apply the delta now; the full rebuild runs in the background
+    index_update = mapping_service.apply_incremental_update(system_type, delta)
+    return {'total_records': len(mapped_df), 'index_update': index_update}
+
 @app.route('/api/mapping/auto', methods=['POST'])
 def auto_map_codes():
-    """Automatically map NAMASTE codes to ICD-11"""
+    """Start (or resume) a background job that maps NAMASTE codes to ICD-11"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         system_type = data.get('system_type', 'ayurveda')
         
-        # Load current data
-        resource_filename = f"namaste_{system_type.lower()}.csv"
-        resource_path = os.path.join('resources', resource_filename)
-
+        resource_path = os.path.join('resources', f"namaste_{system_type.lower()}.csv")
         if not os.path.exists(resource_path):
             return jsonify({'error': f'No data found for {system_type}'}), 404
-
-        df = pd.read_csv(resource_path)
-
-        # Map CSV columns to expected format
-        df['code'] = df.get('code', df.get('NAMC_CODE', ''))
-        df['term_english'] = df.get('term_english', df.get('NAMC_term', ''))
-        df['description'] = df.get('description', df.get('Short_definition', df.get('Long_definition', '')))
-
-        # Ensure ICD-11 columns exist
-        if 'icd11_code' not in df.columns:
-            df['icd11_code'] = ''
-        if 'icd11_term' not in df.columns:
-            df['icd11_term'] = ''
         
-        # Auto-map using WHO API
-        mapped_df, mapped_count = csv_processor.auto_map_to_icd11(df, who_service)
+        job, started = auto_map_jobs.submit(
+            system_type, finalize_auto_map,
+            workers=data.get('workers'), resume=bool(data.get('resume', True))
+        )
+        if not started:
+            return jsonify({
+                'success': False,
+                'error': f"An auto-map job for {system_type} is already {job['status']}",
+                'job': job
+            }), 409
         
-        # Save updated data
-        mapped_df.to_csv(resource_path, index=False)
+        return jsonify({
+            'success': True,
+            'message': f"Auto-mapping {system_type} in the background" + (' (resumed)' if job['resumed'] else ''),
+            'job_id': job['id'],
+            'job': job,
+            'status_url': f"/api/mapping/auto/jobs/{job['id']}",
+            'timestamp': datetime.now().isoformat()
+        }), 202
         
-        # Update Firebase with mapping results
-        try:
-            firebase_data = mapped_df.to_dict('records')
-            firebase_service.upload_namaste_data(firebase_data, system_type)
-        except Exception as e:
-            logger.error(f"Failed to update Firebase: {e}")
+    except Exception as e:
+        logger.error(f"Error in auto-mapping endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mapping/auto/jobs', methods=['GET'])
+def list_auto_map_jobs():
+    """Auto-map jobs, newest first. Optional query: ?system_type=siddha"""
+    return jsonify({
+        'success': True,
+        'jobs': auto_map_jobs.list(request.args.get('system_type')),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/mapping/auto/jobs/<job_id>', methods=['GET'])
+def get_auto_map_job(job_id):
+    """Status and progress of one auto-map job"""
+    job = auto_map_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job, 'timestamp': datetime.now().isoformat()})
+
+@app.route('/api/mapping/auto/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_auto_map_job(job_id):
+    """Stop a running auto-map job; it can be resumed later"""
+    if auto_map_jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not auto_map_jobs.cancel(job_id):
+        return jsonify({'error': 'Job is not running', 'job': auto_map_jobs.get(job_id)}), 409
+    return jsonify({'success': True, 'message': 'Cancelling after in-flight lookups finish', 'job': auto_map_jobs.get(job_id)}), 202
+
+@app.route('/api/mapping/auto/jobs/<job_id>/resume', methods=['POST'])
+def resume_auto_map_job(job_id):
+    """Resume a cancelled, failed or interrupted auto-map job from its checkpoint"""
+    try:
+        job, started = auto_map_jobs.resume(job_id, finalize_auto_map)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if not started:
+            return jsonify({'error': f"Job cannot be resumed while {job['status']}", 'job': job}), 409
+        return jsonify({'success': True, 'job': job, 'timestamp': datetime.now().isoformat()}), 202
+    except Exception as e:
+        logger.error(f"Error resuming auto-map job {job_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mapping/suggestions', methods=['GET'])
+def get_suggestion_table_status():
+    """Status of the precomputed ICD-11 suggestion table"""
+    return jsonify({
+        'success': True,
+        'table': suggestion_table.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/mapping/suggestions/refresh', methods=['POST'])
+def refresh_suggestion_table():
+    """Rebuild missing or stale ICD-11 suggestions in the background"""
+    try:
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force', False))
+        if suggestion_table.building:
+            return jsonify({'error': 'A suggestion build is already running', 'table': suggestion_table.stats()}), 409
+        rows = list(mapping_service.iter_terms())
         
-        # Reload mapping service
-        mapping_service.load_data()
-        mapping_service.train_model()
+        if not suggestion_table.build_async(rows, force=force):
+            return jsonify({'error': 'A suggestion build is already running', 'table': suggestion_table.stats()}), 409
         
         return jsonify({
             'success': True,
-            'message': f'Successfully auto-mapped {mapped_count} codes',
-            'mapped_count': mapped_count,
-            'total_records': len(df),
+            'message': f'Refreshing ICD-11 suggestions for {len(rows)} codes in the background',
             'timestamp': datetime.now().isoformat()
-        })
-        
+        }), 202
     except Exception as e:
-        logger.error(f"Error in auto-mapping endpoint: {e}")
+        logger.error(f"Error in suggestion refresh endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/mapping/validate-fhir', methods=['POST'])
@@ -546,12 +1325,16 @@ def cache_icd_search():
         data = request.get_json()
         query = data.get('query')
         results = data.get('results', [])
+        include_tm2 = data.get('include_tm2', True)
         
         if not query:
             return jsonify({'error': 'Query is required'}), 400
         
-        # Cache results in Firebase
-        success = firebase_service.cache_icd_search_results(query, results)
+        # Cache results in Firebase under the same key WHO searches read
+        _, linearizations, release_id = who_service.search_cache_key(query, include_tm2)
+        success = firebase_service.cache_icd_search_results(
+            query, results, release_id=release_id, linearizations=list(linearizations)
+        )
         
         return jsonify({
             'success': success,
@@ -563,6 +1346,20 @@ def cache_icd_search():
         logger.error(f"Error in cache endpoint: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache/icd-search/sweep', methods=['POST'])
+def sweep_icd_search_cache():
+    """Delete expired ICD search cache documents now"""
+    try:
+        deleted = firebase_service.sweep_expired_icd_cache()
+        return jsonify({
+            'success': True,
+            'deleted': deleted,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error in cache sweep endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/audit/logs', methods=['GET'])
 def get_audit_logs():
     """Get audit logs"""
@@ -1233,10 +2030,19 @@ def home():
         <h2>Available API Endpoints:</h2>
         <ul>
             <li><b>GET /api/health</b> - Health check endpoint</li>
+            <li><b>GET /api/startup</b> - Startup and deferred-import timings</li>
             <li><b>POST /api/namaste/search</b> - Search NAMASTE codes. JSON body: {"query": "search term"}</li>
             <li><b>POST /api/ml/predict</b> - Predict NAMASTE codes from clinical text. JSON body: {"clinical_text": "text"}</li>
+            <li><b>POST /api/ml/predict/batch</b> - Predict NAMASTE codes for many texts, streamed as NDJSON. JSON body: {"items": ["text", {"clinical_text": "text", "top_k": 5}]}</li>
+            <li><b>GET /api/mapping/suggestions</b> - Precomputed ICD-11 suggestion table status</li>
+            <li><b>POST /api/mapping/suggestions/refresh</b> - Rebuild stale ICD-11 suggestions in the background</li>
+            <li><b>GET /api/who/transport</b> - WHO API connection reuse and retry counters</li>
+            <li><b>GET /api/who/mirror</b> - Offline ICD-11 mirror status</li>
+            <li><b>POST /api/who/mirror/sync</b> - Sync the TM2/MMS mirror in the background</li>
             <li><b>GET /api/stats</b> - Get system statistics</li>
-            <li><b>POST /api/mapping/auto</b> - Auto map NAMASTE codes to ICD-11</li>
+            <li><b>GET /api/namaste/export</b> - Export NAMASTE records as NDJSON. Optional query: ?system=siddha</li>
+            <li><b>POST /api/mapping/auto</b> - Start a background job mapping NAMASTE codes to ICD-11</li>
+            <li><b>GET /api/mapping/auto/jobs/&lt;id&gt;</b> - Auto-map job progress (cancel/resume via POST .../cancel, .../resume)</li>
             <li><b>POST /api/who/sync</b> - Sync with WHO ICD-11 API</li>
             <li><b>POST /api/who/search</b> - Search WHO ICD-11 codes</li>
             <li><b>POST /api/csv/upload</b> - Upload NAMASTE CSV file</li>
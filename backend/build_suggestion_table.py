@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Offline job that precomputes ICD-11 mapping suggestions for every NAMASTE code
+"""
+
+import os
+import sys
+import argparse
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import mapping_service
+from services.suggestion_table import suggestion_table
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the precomputed ICD-11 suggestion table')
+    parser.add_argument('--force', action='store_true', help='Recompute entries that are still fresh')
+    parser.add_argument('--system', help='Only build one system (ayurveda, siddha or unani)')
+    args = parser.parse_args()
+    
+    rows = [
+        row for row in mapping_service.iter_terms()
+        if not args.system or row[0].lower() == args.system.lower()
+    ]
+    
+    print(f"Building ICD-11 suggestions for {len(rows)} NAMASTE codes...")
+    result = suggestion_table.build(rows, force=args.force)
+    print(f"✅ Refreshed: {result['refreshed']}, fresh: {result['skipped']}, failed: {result['failed']} ({result['seconds']}s)")
+    print(f"   Saved to {suggestion_table.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Shared pytest fixtures: run the Flask app against a scratch copy of the resource CSVs
+"""
+
+import os
+import sys
+import shutil
+import importlib
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+
+
+@pytest.fixture(scope='session')
+def workdir(tmp_path_factory):
+    """Scratch working directory; app.py reads resources/ and writes cache/ and uploads/ relative to it"""
+    path = tmp_path_factory.mktemp('backend')
+    shutil.copytree(os.path.join(BACKEND_DIR, 'resources'), path / 'resources')
+    (path / 'uploads').mkdir()
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
+
+
+@pytest.fixture(scope='session')
+def app_module(workdir):
+    """The app module, imported (and its data loaded) inside the scratch directory"""
+    return importlib.import_module('app')
+
+
+@pytest.fixture
+def resources(workdir):
+    """Fresh copy of the resource CSVs for a test that rewrites them"""
+    path = workdir / 'resources'
+    shutil.rmtree(path)
+    shutil.copytree(os.path.join(BACKEND_DIR, 'resources'), path)
+    return path
+
+
+@pytest.fixture
+def fresh_service(app_module, tmp_path):
+    """Build a mapping service from the current resource files, never from a saved artifact"""
+    def build():
+        service = app_module.NAMASTEMappingService(autoload=False)
+        service.model_store.cache_dir = str(tmp_path / f"models-{id(service)}")
+        service.reload()
+        return service
+    return build
+
+
+@pytest.fixture
+def service(app_module, resources, fresh_service, monkeypatch):
+    """A service whose snapshots come only from incremental updates (no background rebuild), served by the app"""
+    service = fresh_service()
+    monkeypatch.setattr(service, 'schedule_rebuild', lambda: None)
+    monkeypatch.setattr(app_module, 'mapping_service', service)
+    return service
@@ -0,0 +1,336 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+from services.auto_mapper import AutoMapper
+from services.csv_processor import csv_processor
+from services.file_lock import FileLock
+from services.who_icd11_service import who_service
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ('queued', 'running')
+RESUMABLE_STATES = ('interrupted', 'cancelled', 'failed')
+# Job ids name files, so anything else (e.g. from a URL) is rejected
+JOB_ID = re.compile(r'[0-9a-f]{12}')
+
+
+class AutoMapJobManager:
+    """Background auto-map jobs with progress, cancellation and checkpoint/resume.
+
+    Each job is persisted as ``{directory}/{job_id}.json`` (status and counters)
+    and ``{job_id}.checkpoint.json`` (every row already looked up, keyed by
+    ``"{index}:{code}"``). These files are the source of truth shared by every
+    worker process: status is read from them, and only the process running a
+    job keeps a fresher copy in memory. Status is saved with each progress
+    report; checkpoints every ``checkpoint_every`` rows or ``checkpoint_seconds``.
+
+    A running job holds a file lock for itself and one for its system, so a
+    system is mapped by one job at a time across processes. A job whose file
+    says it is active but whose lock is free was cut off by a crash or restart
+    and is reported ``interrupted``; resuming it skips the checkpointed rows
+    and re-applies their mappings. Cancelling a job running in another process
+    leaves a ``{job_id}.cancel`` marker that its runner picks up.
+    """
+
+    def __init__(self, directory='cache/auto_map_jobs', checkpoint_every=50, checkpoint_seconds=10):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        # Jobs running in this process only; everything else is read from disk
+        self.jobs = {}
+        self._checkpoints = {}
+        self._cancel = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _job_lock(self, job_id):
+        return FileLock(self._path(f"{job_id}.lock"))
+
+    def _system_lock(self, system_type):
+        return FileLock(self._path(f"system-{system_type}.lock"))
+
+    @staticmethod
+    def _write_json(path, data):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        # Atomic replace: a crash mid-write leaves the previous file intact
+        os.replace(temp_path, path)
+
+    def _read(self, job_id):
+        """A job as persisted, with active jobs nobody holds reported as interrupted"""
+        if not JOB_ID.fullmatch(str(job_id)):
+            return None
+        try:
+            with open(self._path(f"{job_id}.json"), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to read auto-map job {job_id}: {e}")
+            return None
+        if data['status'] in ACTIVE_STATES and not self._job_lock(job_id).is_held():
+            data['status'] = 'interrupted'
+        return data
+
+    def _read_checkpoint(self, job_id):
+        try:
+            with open(self._path(f"{job_id}.checkpoint.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save(self, job_id, checkpoint=True):
+        with self._lock:
+            data = dict(self.jobs[job_id])
+            points = dict(self._checkpoints.get(job_id, {})) if checkpoint else None
+        os.makedirs(self.directory, exist_ok=True)
+        if points is not None:
+            self._write_json(self._path(f"{job_id}.checkpoint.json"), points)
+        self._write_json(self._path(f"{job_id}.json"), data)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields, updated_at=datetime.now().isoformat())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._read(job_id)
+
+    def list(self, system_type=None):
+        if not os.path.isdir(self.directory):
+            return []
+        job_ids = [name[:-len('.json')] for name in os.listdir(self.directory)
+                   if name.endswith('.json') and not name.endswith('.checkpoint.json')]
+        jobs = [job for job in map(self.get, job_ids) if job is not None]
+        if system_type:
+            jobs = [job for job in jobs if job['system_type'] == system_type.lower()]
+        return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+    def active_job(self, system_type):
+        for job in self.list(system_type):
+            if job['status'] in ACTIVE_STATES:
+                return job
+        return None
+
+    def submit(self, system_type, finalize, workers=None, resume=True, job_id=None):
+        """Start an auto-map job for a system, resuming its latest unfinished job (or ``job_id``) if any.
+
+        ``finalize(df, resource_path, system_type, mapped_rows)`` persists the mapped
+        frame and returns the job result; ``mapped_rows`` are the index labels that
+        gained a mapping. Returns (job, started); started is False when a
+        job for the system is already queued or running in any process (that
+        job is returned), or when ``job_id`` is no longer resumable.
+        """
+        system_type = system_type.lower()
+        system_lock = self._system_lock(system_type)
+        if not system_lock.acquire():
+            active = self.active_job(system_type)
+            return active or {'id': None, 'system_type': system_type, 'status': 'running'}, False
+
+        job_lock = None
+        try:
+            if job_id is not None:
+                resumable = self._read(job_id)
+                if resumable is None or resumable['status'] not in RESUMABLE_STATES:
+                    system_lock.release()
+                    return resumable, False
+            elif resume:
+                candidates = [job for job in self.list(system_type) if job['status'] in RESUMABLE_STATES]
+                resumable = candidates[0] if candidates else None
+            else:
+                resumable = None
+
+            now = datetime.now().isoformat()
+            if resumable is not None:
+                job = resumable
+                job.update(status='queued', resumed=job.get('resumed', 0) + 1, error=None, updated_at=now)
+                checkpoint = self._read_checkpoint(job['id'])
+            else:
+                job = {
+                    'id': uuid.uuid4().hex[:12],
+                    'system_type': system_type,
+                    'status': 'queued',
+                    'created_at': now,
+                    'updated_at': now,
+                    'finished_at': None,
+                    'workers': workers,
+                    'resumed': 0,
+                    'total': None,
+                    'processed': 0,
+                    'mapped': 0,
+                    'failed': 0,
+                    'rows_per_second': 0.0,
+                    'eta_seconds': None,
+                    'error': None,
+                    'result': None
+                }
+                checkpoint = {}
+            if workers:
+                job['workers'] = workers
+
+            # Held by the system lock, so nobody else can be running this job
+            job_lock = self._job_lock(job['id'])
+            if not job_lock.acquire():
+                system_lock.release()
+                return self.get(job['id']), False
+            with self._lock:
+                self.jobs[job['id']] = job
+                self._checkpoints[job['id']] = checkpoint
+                cancel = self._cancel[job['id']] = threading.Event()
+            self._clear_cancel_request(job['id'])
+            self._save(job['id'])
+        except BaseException:
+            if job_lock is not None:
+                job_lock.release()
+            system_lock.release()
+            raise
+
+        thread = threading.Thread(
+            target=self._run, args=(job['id'], finalize, cancel, (job_lock, system_lock)),
+            name=f"auto-map-{job['id']}", daemon=True
+        )
+        thread.start()
+        return self.get(job['id']), True
+
+    def resume(self, job_id, finalize):
+        job = self.get(job_id)
+        if job is None:
+            return None, False
+        if job['status'] not in RESUMABLE_STATES:
+            return job, False
+        return self.submit(job['system_type'], finalize, workers=job.get('workers'), job_id=job_id)
+
+    def cancel(self, job_id):
+        """Stop a job after its in-flight lookups; progress so far is checkpointed"""
+        job = self.get(job_id)
+        if job is None or job['status'] not in ACTIVE_STATES:
+            return False
+        with self._lock:
+            event = self._cancel.get(job_id)
+        if event is not None:
+            event.set()
+        else:
+            # Running in another worker process: leave a request its runner polls for
+            with open(self._path(f"{job_id}.cancel"), 'w'):
+                pass
+        return True
+
+    def _cancel_requested(self, job_id):
+        return os.path.exists(self._path(f"{job_id}.cancel"))
+
+    def _clear_cancel_request(self, job_id):
+        try:
+            os.remove(self._path(f"{job_id}.cancel"))
+        except FileNotFoundError:
+            pass
+
+    def _run(self, job_id, finalize, cancel, locks):
+        started = time.time()
+        try:
+            job = self.get(job_id)
+            df, resource_path = csv_processor.load_mapping_frame(job['system_type'])
+            if df is None:
+                raise FileNotFoundError(f"No data found for {job['system_type']}")
+
+            # Re-apply checkpointed rows; keys carry the code so a rewritten CSV can't misapply them
+            with self._lock:
+                checkpoint = self._checkpoints.setdefault(job_id, {})
+                done = dict(checkpoint)
+            skip = set()
+            restored = {}
+            for index, code in zip(df.index, df['code'].tolist()):
+                key = f"{index}:{code}"
+                if key in done:
+                    skip.add(index)
+                    if done[key]:
+                        restored[index] = tuple(done[key])
+            AutoMapper.apply(df, restored)
+
+            unmapped = len(AutoMapper.unmapped_rows(df)) + len(restored)
+            base = {'processed': len(skip), 'mapped': len(restored), 'failed': 0}
+            self._update(job_id, status='running', total=unmapped, **base)
+            self._save(job_id, checkpoint=False)
+            logger.info(f"Auto-map job {job_id} ({job['system_type']}): {unmapped} rows, {len(skip)} from checkpoint")
+
+            codes = dict(zip(df.index, df['code'].tolist()))
+            mapped_rows = set(restored)
+            counters = dict(base)
+            last_save = [time.time(), 0]
+
+            def on_result(index, mapping, failed):
+                counters['processed'] += 1
+                if failed:
+                    # Failed rows stay out of the checkpoint so a resume retries them
+                    counters['failed'] += 1
+                else:
+                    counters['mapped'] += mapping is not None
+                    if mapping is not None:
+                        mapped_rows.add(index)
+                    with self._lock:
+                        checkpoint[f"{index}:{codes[index]}"] = list(mapping) if mapping else None
+                last_save[1] += 1
+                if last_save[1] >= self.checkpoint_every or time.time() - last_save[0] >= self.checkpoint_seconds:
+                    self._update(job_id, **counters)
+                    self._save(job_id)
+                    last_save[0], last_save[1] = time.time(), 0
+                    if self._cancel_requested(job_id):
+                        cancel.set()
+
+            def progress(report):
+                self._update(job_id, rows_per_second=report['rows_per_second'], eta_seconds=report['eta_seconds'],
+                             lookups=report['lookups'], distinct_queries=report['distinct_queries'],
+                             rate_limit_wait_seconds=report['rate_limit_wait_seconds'], **counters)
+                # Other workers answer status requests from the job file
+                self._save(job_id, checkpoint=False)
+                if self._cancel_requested(job_id):
+                    cancel.set()
+
+            mapped_df, _ = csv_processor.auto_map_to_icd11(
+                df, who_service, workers=job.get('workers'), progress=progress,
+                skip=skip, cancel=cancel, on_result=on_result
+            )
+            self._update(job_id, **counters)
+
+            if cancel.is_set():
+                self._update(job_id, status='cancelled', eta_seconds=None, finished_at=datetime.now().isoformat())
+                logger.info(f"Auto-map job {job_id} cancelled after {counters['processed']} rows")
+                return
+
+            result = finalize(mapped_df, resource_path, job['system_type'], mapped_rows)
+            self._update(job_id, status='completed', result=result, eta_seconds=0.0,
+                         finished_at=datetime.now().isoformat())
+            logger.info(f"Auto-map job {job_id} completed: {counters['mapped']} mapped in {time.time() - started:.1f}s")
+
+        except Exception as e:
+            logger.error(f"Auto-map job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            try:
+                self._save(job_id)
+                self._clear_cancel_request(job_id)
+            finally:
+                with self._lock:
+                    self._cancel.pop(job_id, None)
+                    self.jobs.pop(job_id, None)
+                    self._checkpoints.pop(job_id, None)
+                # Released last: once free, other processes trust the job file
+                for lock in locks:
+                    lock.release()
+
+
+# Global instance
+auto_map_jobs = AutoMapJobManager(
+    directory=os.getenv('AUTO_MAP_JOB_DIR', 'cache/auto_map_jobs'),
+    checkpoint_every=int(os.getenv('AUTO_MAP_CHECKPOINT_ROWS', '50'))
+)
@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import logging
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from services.http_transport import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+# Long vowels and geminates doubled in ASCII transliteration (vaata/vata, pittaja/pitaja)
+REPEATED_LETTERS = re.compile(r'([a-z])\1+')
+
+# One lookup budget shared by every auto-map run in the process (0 = unlimited).
+# Only bulk mapping is paced; interactive WHO searches never wait on it.
+AUTO_MAP_RATE_LIMIT = float(os.getenv('AUTO_MAP_RATE_LIMIT', '6'))
+lookup_rate_limiter = RateLimiter(AUTO_MAP_RATE_LIMIT) if AUTO_MAP_RATE_LIMIT > 0 else None
+
+
+def query_key(term):
+    """Cluster key for a lookup term; near-identical spellings share it, blank terms get None.
+
+    Folds case, Latin diacritics (vāta/vata), punctuation and spacing
+    (vyAdhi-viniScayaH/vyadhi viniscayah) and doubled Latin letters.
+    """
+    if not isinstance(term, str) or not term.strip():
+        return None
+    folded = []
+    for char in unicodedata.normalize('NFKD', term):
+        # Only strip marks off Latin letters; Indic and Arabic marks carry meaning
+        if unicodedata.combining(char) and folded and folded[-1].isascii():
+            continue
+        # Punctuation, symbols and separators all become spaces
+        folded.append(' ' if unicodedata.category(char)[0] in 'PSZC' else char)
+    key = WHITESPACE.sub(' ', ''.join(folded).lower()).strip()
+    return REPEATED_LETTERS.sub(r'\1', key) or None
+
+
+class AutoMapProgress:
+    """Processed/mapped/failed counters with throughput and ETA"""
+
+    def __init__(self, total, distinct_queries=None):
+        self.total = total
+        self.distinct_queries = total if distinct_queries is None else distinct_queries
+        self.lookups = 0
+        self.processed = 0
+        self.mapped = 0
+        self.failed = 0
+        self.rate_limit_wait = 0.0
+        self.started = time.time()
+
+    def to_dict(self):
+        elapsed = time.time() - self.started
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.processed
+        return {
+            'total': self.total,
+            'processed': self.processed,
+            'mapped': self.mapped,
+            'failed': self.failed,
+            'distinct_queries': self.distinct_queries,
+            'lookups': self.lookups,
+            'rate_limit_wait_seconds': round(self.rate_limit_wait, 1),
+            'elapsed_seconds': round(elapsed, 1),
+            'rows_per_second': round(rate, 2),
+            'eta_seconds': round(remaining / rate, 1) if rate > 0 else None
+        }
+
+
+class AutoMapper:
+    """Maps unmapped NAMASTE rows to ICD-11 with a bounded pool of concurrent lookups.
+
+    Rows are fed to ``workers`` threads through a sliding window, so at most
+    ``workers`` WHO lookups are in flight, and new lookups start no faster than
+    the shared ``lookup_rate_limiter`` allows. Rows with near-identical terms share
+    one lookup (see ``query_key``). Workers only compute suggestions;
+    accepted mappings are written to the DataFrame in one bulk assignment.
+    Runs can skip rows done earlier and be cancelled; rows already in flight
+    finish and are applied.
+    """
+
+    def __init__(self, workers=None, min_confidence=80, report_every=5.0, dedupe=None, rate_limiter=lookup_rate_limiter):
+        self.workers = workers or int(os.getenv('AUTO_MAP_WORKERS', '8'))
+        self.dedupe = dedupe if dedupe is not None else os.getenv('AUTO_MAP_DEDUPE', 'true').lower() == 'true'
+        self.min_confidence = min_confidence
+        self.report_every = report_every
+        self.rate_limiter = rate_limiter
+
+    @staticmethod
+    def unmapped_rows(df):
+        codes = df['icd11_code']
+        return df.index[codes.isna() | (codes == '')]
+
+    @staticmethod
+    def group_rows(terms):
+        """Positions grouped by query_key, in first-seen order; blank terms stay alone"""
+        groups = {}
+        for position, term in enumerate(terms):
+            key = query_key(term)
+            groups.setdefault(key if key is not None else ('', position), []).append(position)
+        return list(groups.values())
+
+    def run(self, df, suggest, progress=None, skip=None, cancel=None, on_result=None):
+        """Map every unmapped row; ``suggest(term, code)`` returns ranked suggestions.
+
+        With ``dedupe`` on, rows whose terms share a ``query_key`` are looked up
+        once, using the first row's term and code, and the suggestions fan out to
+        every row of the group. ``progress`` is called with the counters dict while
+        running and once at the end. Index labels in ``skip`` are not looked up.
+        ``cancel`` (an Event) stops new lookups. ``on_result(index, mapping, failed)``
+        sees every row as it completes, mapping being (icd11_code, icd11_term) or None.
+        Returns (df, mapped_count).
+        """
+        indices = [index for index in self.unmapped_rows(df) if not skip or index not in skip]
+        terms = df.loc[indices, 'term_english'].tolist()
+        codes = df.loc[indices, 'code'].tolist()
+        groups = self.group_rows(terms) if self.dedupe else [[position] for position in range(len(indices))]
+        state = AutoMapProgress(len(indices), len(groups))
+        accepted = {}
+        last_report = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='auto-map') as pool:
+            pending = iter(groups)
+            in_flight = {}
+            while True:
+                while len(in_flight) < self.workers and not (cancel is not None and cancel.is_set()):
+                    group = next(pending, None)
+                    if group is None:
+                        break
+                    if self.rate_limiter is not None:
+                        state.rate_limit_wait += self.rate_limiter.acquire()
+                    first = group[0]
+                    in_flight[pool.submit(suggest, terms[first], codes[first])] = group
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group = in_flight.pop(future)
+                    state.lookups += 1
+                    state.processed += len(group)
+                    try:
+                        suggestions = future.result()
+                    except Exception as e:
+                        state.failed += len(group)
+                        logger.warning(f"Auto-map lookup failed for {codes[group[0]]}: {e}")
+                        if on_result:
+                            for position in group:
+                                on_result(indices[position], None, True)
+                        continue
+                    mapping = None
+                    if suggestions and suggestions[0]['confidence'] > self.min_confidence:
+                        mapping = (suggestions[0]['icd11_code'], suggestions[0]['icd11_term'])
+                    for position in group:
+                        if mapping:
+                            accepted[indices[position]] = mapping
+                            state.mapped += 1
+                        if on_result:
+                            on_result(indices[position], mapping, False)
+
+                if time.time() - last_report >= self.report_every:
+                    last_report = time.time()
+                    report = state.to_dict()
+                    logger.info(f"Auto-map: {report['processed']}/{report['total']} rows, {report['mapped']} mapped, "
+                                f"{report['rows_per_second']} rows/s, ETA {report['eta_seconds']}s")
+                    if progress:
+                        progress(report)
+
+        self.apply(df, accepted)
+        report = state.to_dict()
+        logger.info(f"Auto-map finished: {report['mapped']}/{report['total']} mapped, {report['failed']} failed "
+                     f"in {report['elapsed_seconds']}s ({report['rows_per_second']} rows/s, "
+                     f"{report['lookups']} lookups for {report['distinct_queries']} distinct queries)")
+        if progress:
+            progress(report)
+        return df, len(accepted)
+
+    @staticmethod
+    def apply(df, accepted):
+        """Write accepted (icd11_code, icd11_term) pairs in one bulk assignment"""
+        if not accepted:
+            return
+        index = pd.Index(list(accepted))
+        values = list(accepted.values())
+        for column in ('icd11_code', 'icd11_term'):
+            if not pd.api.types.is_string_dtype(df[column]):
+                # All-empty columns are read as float NaN; codes are strings
+                df[column] = df[column].astype(object)
+        df.loc[index, ['icd11_code', 'icd11_term']] = values
@@ -1,17 +1,26 @@
 import pandas as pd
 import os
 import json
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
 import logging
 from werkzeug.utils import secure_filename
+from services.auto_mapper import AutoMapper
+from services.file_lock import FileLock
+from services.snapshot import FileRows, SourceDelta, source_version
 
 logger = logging.getLogger(__name__)
 
 class CSVProcessor:
-    def __init__(self):
+    def __init__(self, chunk_rows=None):
         self.upload_folder = 'uploads'
         self.resources_folder = 'resources'
         self.allowed_extensions = {'csv'}
+        # Rows held in memory at once while validating, merging and exporting CSVs
+        self.chunk_rows = chunk_rows or int(os.getenv('CSV_CHUNK_ROWS', '10000'))
         
         # Create directories if they don't exist
         os.makedirs(self.upload_folder, exist_ok=True)
@@ -22,7 +31,13 @@ class CSVProcessor:
                filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
     def process_uploaded_csv(self, file, system_type):
-        """Process uploaded CSV file and integrate with existing data"""
+        """Process uploaded CSV file and integrate with existing data.
+        
+        The upload is streamed to disk, then validated and merged chunk by
+        chunk. The rows the merge removed and added are returned as
+        ``source_delta`` for the search index update: removed rows as positions,
+        added rows as positions in the saved upload, read back in chunks.
+        """
         if not file or not self.allowed_file(file.filename):
             return {'success': False, 'error': 'Invalid file type'}
         
@@ -32,34 +47,26 @@ class CSVProcessor:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"{timestamp}_{filename}"
             
-            # Save uploaded file
+            # Save uploaded file (copied to disk in blocks)
             upload_path = os.path.join(self.upload_folder, filename)
             file.save(upload_path)
             
-            # Read and validate CSV
-            df = pd.read_csv(upload_path)
-            validation_result = self.validate_csv_structure(df, system_type)
+            # Validate chunk by chunk, noting where each code last occurs
+            validation_result, last_rows, row_count = self.scan_upload(upload_path, system_type)
             
             if not validation_result['valid']:
                 return {'success': False, 'error': validation_result['error']}
             
-            # Process and merge with existing data
-            processed_data = self.merge_with_existing_data(df, system_type)
-            
-            # Save to resources folder
-            resource_filename = f"namaste_{system_type.lower()}.csv"
-            resource_path = os.path.join(self.resources_folder, resource_filename)
-            processed_data.to_csv(resource_path, index=False)
-            
-            # Generate mapping report
-            mapping_report = self.generate_mapping_report(processed_data, system_type)
+            # Merge with existing data and generate mapping report in one pass
+            mapping_report, source_delta = self.merge_with_existing_data(upload_path, last_rows, system_type)
             
             return {
                 'success': True,
-                'message': f'Successfully processed {len(df)} records',
-                'new_records': len(df),
-                'total_records': len(processed_data),
+                'message': f'Successfully processed {row_count} records',
+                'new_records': row_count,
+                'total_records': mapping_report['total_records'],
                 'mapping_report': mapping_report,
+                'source_delta': source_delta,
                 'filename': filename
             }
             
@@ -67,6 +74,35 @@ class CSVProcessor:
             logger.error(f"Error processing CSV: {e}")
             return {'success': False, 'error': str(e)}
     
+    def resource_path(self, system_type):
+        return os.path.join(self.resources_folder, f"namaste_{system_type.lower()}.csv")
+    
+    def read_chunks(self, path, chunk_rows=None, **options):
+        """Stream a CSV as DataFrames of at most ``chunk_rows`` rows; cells are read as text"""
+        options.setdefault('dtype', str)
+        return pd.read_csv(path, chunksize=chunk_rows or self.chunk_rows, **options)
+    
+    @staticmethod
+    def read_columns(path):
+        return list(pd.read_csv(path, nrows=0).columns)
+    
+    def scan_upload(self, upload_path, system_type):
+        """Validate an uploaded CSV chunk by chunk; returns (validation, last row of each code, row count)"""
+        validation_result = self.validate_csv_structure(pd.DataFrame(columns=self.read_columns(upload_path)), system_type)
+        if not validation_result['valid']:
+            return validation_result, {}, 0
+        
+        last_rows = {}
+        position = 0
+        for chunk in self.read_chunks(upload_path):
+            validation_result = self.validate_csv_structure(chunk, system_type)
+            if not validation_result['valid']:
+                return validation_result, {}, 0
+            for code in chunk['code']:
+                last_rows[code] = position
+                position += 1
+        return {'valid': True}, last_rows, position
+    
     def validate_csv_structure(self, df, system_type):
         """Validate CSV structure matches expected format"""
         required_columns = [
@@ -92,33 +128,117 @@ class CSVProcessor:
         
         return {'valid': True}
     
-    def merge_with_existing_data(self, new_df, system_type):
-        """Merge new data with existing data, avoiding duplicates"""
-        resource_filename = f"namaste_{system_type.lower()}.csv"
-        resource_path = os.path.join(self.resources_folder, resource_filename)
+    def merge_with_existing_data(self, upload_path, last_rows, system_type):
+        """Merge an uploaded CSV into the system's resource file, avoiding duplicates.
         
-        if os.path.exists(resource_path):
-            existing_df = pd.read_csv(resource_path)
+        Keeps the last row of each code, as concatenating existing and new rows
+        and dropping duplicate codes would, but streams both files a chunk at a
+        time. Existing rows without a code are kept. The merged file replaces the
+        resource atomically. Returns (mapping report, SourceDelta): existing rows
+        keep their order, so the delta is the positions of the superseded existing
+        rows plus the upload rows appended after them (a ``FileRows`` of the upload).
+        """
+        resource_path = self.resource_path(system_type)
+        # Held from reading the base version to the replace, so the delta describes exactly this rewrite
+        with self._writer_lock(resource_path):
+            base_version = source_version(resource_path)
+            upload_columns = self.read_columns(upload_path)
+            sources = []
+            columns = upload_columns
             
-            # Remove duplicates based on code
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            combined_df = combined_df.drop_duplicates(subset=['code'], keep='last')
-        else:
-            combined_df = new_df
+            if os.path.exists(resource_path):
+                existing_columns = self.read_columns(resource_path)
+                columns = existing_columns + [col for col in upload_columns if col not in existing_columns]
+                existing_last = {}
+                if 'code' in existing_columns:
+                    position = 0
+                    for chunk in self.read_chunks(resource_path, usecols=['code']):
+                        for code in chunk['code']:
+                            existing_last[code] = position
+                            position += 1
+                sources.append((resource_path, existing_last, last_rows))
+            sources.append((upload_path, last_rows, {}))
+            
+            removed = []
+            # Upload rows that survive stay in the upload file; the delta only records where they are
+            appended = FileRows(os.path.abspath(upload_path))
+            total_records = 0
+            mapped_records = 0
+            categories = Counter()
+            with self._replacing(resource_path) as out:
+                write_header = True
+                for path, own_last, superseded in sources:
+                    position = 0
+                    for chunk in self.read_chunks(path):
+                        keep = []
+                        for code in (chunk['code'] if 'code' in chunk.columns else [None] * len(chunk)):
+                            keep.append(
+                                pd.isna(code) or (own_last.get(code) == position and code not in superseded)
+                            )
+                            position += 1
+                        first = position - len(keep)
+                        if path == upload_path:
+                            for offset, kept in enumerate(keep):
+                                if kept:
+                                    appended.add(first + offset)
+                        else:
+                            removed.extend(first + offset for offset, kept in enumerate(keep) if not kept)
+                        chunk = chunk[keep].reindex(columns=columns)
+                        chunk.to_csv(out, header=write_header, index=False)
+                        write_header = False
+                        
+                        total_records += len(chunk)
+                        mapped_records += int((chunk['icd11_code'].notna() & (chunk['icd11_code'] != '')).sum())
+                        categories.update(chunk['category'].dropna())
+                if write_header:
+                    pd.DataFrame(columns=columns).to_csv(out, index=False)
+            version = source_version(resource_path)
         
-        return combined_df
+        report = self._mapping_report(total_records, mapped_records, dict(categories.most_common()), system_type)
+        delta = SourceDelta(base_version, version, removed=removed, appended=appended)
+        return report, delta
+    
+    @staticmethod
+    def _writer_lock(resource_path):
+        """Lock held across every read-modify-replace of a resource file (upload merges, auto-map saves)"""
+        return FileLock(f"{resource_path}.lock")
+    
+    @staticmethod
+    @contextmanager
+    def _replacing(resource_path):
+        """Write to a temp file of its own next to ``resource_path``; it replaces the resource if the block succeeds"""
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(resource_path) or '.', prefix=f".{os.path.basename(resource_path)}.", suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as out:
+                yield out
+            if os.path.exists(resource_path):
+                # mkstemp creates owner-only files; keep the resource's permissions
+                shutil.copymode(resource_path, temp_path)
+            os.replace(temp_path, resource_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def iter_records(self, system_type, batch_rows=500):
+        """Yield a system's resource rows as lists of dicts, ``batch_rows`` at a time"""
+        # Same read options as the upload scan and merge: text cells, blanks instead of NaN
+        for chunk in self.read_chunks(self.resource_path(system_type), chunk_rows=batch_rows):
+            yield chunk.fillna('').to_dict('records')
     
     def generate_mapping_report(self, df, system_type):
         """Generate mapping statistics and insights"""
-        total_records = len(df)
         mapped_records = len(df[df['icd11_code'].notna() & (df['icd11_code'] != '')])
-        
         category_stats = df['category'].value_counts().to_dict()
-        
+        return self._mapping_report(len(df), mapped_records, category_stats, system_type)
+    
+    @staticmethod
+    def _mapping_report(total_records, mapped_records, category_stats, system_type):
         return {
             'total_records': total_records,
             'mapped_records': mapped_records,
-            'mapping_percentage': round((mapped_records / total_records) * 100, 2),
+            'mapping_percentage': round((mapped_records / total_records) * 100, 2) if total_records else 0.0,
             'categories': category_stats,
             'system_type': system_type,
             'last_updated': datetime.now().isoformat()
@@ -142,28 +262,101 @@ class CSVProcessor:
         
         return sorted(files, key=lambda x: x['upload_date'], reverse=True)
     
-    def auto_map_to_icd11(self, df, who_service):
-        """Automatically map NAMASTE codes to ICD-11 using WHO API"""
-        mapped_count = 0
-
-        for index, row in df.iterrows():
-            if pd.isna(row['icd11_code']) or row['icd11_code'] == '':
-                # Get mapping suggestions from WHO API
-                suggestions = who_service.get_mapping_suggestions(
-                    row['term_english'],
-                    row['code']
-                )
-
-                # If no suggestions from WHO API, use mock mappings for demo
-                if not suggestions:
-                    suggestions = self._get_mock_mapping_suggestions(row['term_english'], row['code'])
-
-                if suggestions and suggestions[0]['confidence'] > 80:
-                    df.at[index, 'icd11_code'] = suggestions[0]['icd11_code']
-                    df.at[index, 'icd11_term'] = suggestions[0]['icd11_term']
-                    mapped_count += 1
-
-        return df, mapped_count
+    def load_mapping_frame(self, system_type):
+        """Resource CSV for a system with the columns auto-mapping needs; (None, path) if missing"""
+        resource_path = self.resource_path(system_type)
+        
+        if not os.path.exists(resource_path):
+            return None, resource_path
+        
+        # Text cells, so unchanged rows are written back exactly as read
+        version = source_version(resource_path)
+        df = pd.read_csv(resource_path, dtype=str)
+        df.attrs['source_version'] = version
+        return self._mapping_columns(df), resource_path
+    
+    @staticmethod
+    def _mapping_columns(df):
+        """Add the columns auto-mapping reads and writes, from whichever source columns the file has"""
+        # Map CSV columns to expected format
+        df['code'] = df.get('code', df.get('NAMC_CODE', ''))
+        df['term_english'] = df.get('term_english', df.get('NAMC_term', ''))
+        df['description'] = df.get('description', df.get('Short_definition', df.get('Long_definition', '')))
+        
+        # Ensure ICD-11 columns exist
+        if 'icd11_code' not in df.columns:
+            df['icd11_code'] = ''
+        if 'icd11_term' not in df.columns:
+            df['icd11_term'] = ''
+        
+        return df
+    
+    def save_mapping_frame(self, df, resource_path, mapped_rows=()):
+        """Write an auto-mapped frame back atomically; returns the SourceDelta of the mapped rows.
+        
+        If the resource changed since the frame was loaded (e.g. an upload was
+        merged while the job ran), the frame is stale: only the new mappings are
+        applied to the current file, matched by code, and only to rows that are
+        still unmapped, so the other writer's rows are kept.
+        """
+        with self._writer_lock(resource_path):
+            base_version = source_version(resource_path)
+            if df.attrs.get('source_version') != base_version:
+                return self._apply_mappings(df, resource_path, mapped_rows, base_version)
+            
+            with self._replacing(resource_path) as out:
+                df.to_csv(out, index=False)
+            version = source_version(resource_path)
+        positions = sorted(df.index.get_loc(index) for index in mapped_rows)
+        return SourceDelta(
+            base_version, version,
+            updated={position: df.iloc[position].to_dict() for position in positions}
+        )
+    
+    def _apply_mappings(self, df, resource_path, mapped_rows, base_version):
+        """Copy the mappings of ``mapped_rows`` onto the current resource file, by code; caller holds the writer lock"""
+        mappings = {}
+        for index in mapped_rows:
+            code = df.at[index, 'code']
+            if not pd.isna(code) and str(code).strip():
+                mappings[code] = (df.at[index, 'icd11_code'], df.at[index, 'icd11_term'])
+        logger.info(f"{resource_path} changed during auto-mapping; applying {len(mappings)} mappings by code")
+        
+        updated = {}
+        position = 0
+        with self._replacing(resource_path) as out:
+            write_header = True
+            for chunk in self.read_chunks(resource_path):
+                chunk = self._mapping_columns(chunk)
+                unmapped = chunk['icd11_code'].isna() | (chunk['icd11_code'].astype(str).str.strip() == '')
+                targets = unmapped & chunk['code'].isin(mappings.keys())
+                if targets.any():
+                    chunk = chunk.astype({'icd11_code': object, 'icd11_term': object})
+                    codes = chunk.loc[targets, 'code']
+                    chunk.loc[targets, 'icd11_code'] = [mappings[code][0] for code in codes]
+                    chunk.loc[targets, 'icd11_term'] = [mappings[code][1] for code in codes]
+                    for offset in targets.to_numpy().nonzero()[0]:
+                        updated[position + int(offset)] = chunk.iloc[offset].to_dict()
+                chunk.to_csv(out, header=write_header, index=False)
+                write_header = False
+                position += len(chunk)
+            if write_header:
+                self._mapping_columns(pd.DataFrame(columns=self.read_columns(resource_path))).to_csv(out, index=False)
+        return SourceDelta(base_version, source_version(resource_path), updated=updated)
+    
+    def auto_map_to_icd11(self, df, who_service, workers=None, progress=None, **options):
+        """Automatically map NAMASTE codes to ICD-11 using WHO API (concurrent lookups, bulk write-back)"""
+        def suggest(term, code):
+            # Get mapping suggestions from WHO API
+            suggestions = who_service.get_mapping_suggestions(term, code)
+            
+            # If no suggestions from WHO API, use mock mappings for demo
+            if not suggestions:
+                suggestions = self._get_mock_mapping_suggestions(term, code)
+            return suggestions
+        
+        # options: skip, cancel, on_result (see AutoMapper.run)
+        return AutoMapper(workers=workers).run(df, suggest, progress=progress, **options)
 
     def _get_mock_mapping_suggestions(self, term, code):
         """Provide mock ICD-11 mapping suggestions for demo purposes"""
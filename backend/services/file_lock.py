@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: locks only coordinate threads within one process
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock on a file, shared by every process on the node.
+
+    Backed by ``flock``, so the operating system drops it when the holding
+    process dies; a lock that can be taken proves nobody is running under it.
+    Within a process the lock is not re-entrant: a second holder waits too.
+    """
+
+    _held = set()
+    _held_lock = threading.Lock()
+
+    def __init__(self, path, poll_seconds=0.02):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._file = None
+
+    def acquire(self, timeout=0):
+        """Take the lock, waiting up to ``timeout`` seconds (None: forever); False if it stayed taken"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_seconds)
+        return True
+
+    def _try_acquire(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with FileLock._held_lock:
+            if self.path in FileLock._held:
+                return False
+            handle = open(self.path, 'a')
+            if fcntl is not None:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    return False
+            FileLock._held.add(self.path)
+            self._file = handle
+        return True
+
+    def release(self):
+        with FileLock._held_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                FileLock._held.discard(self.path)
+
+    def is_held(self):
+        """Whether anyone (this process included) holds the lock right now"""
+        probe = FileLock(self.path)
+        if not probe.acquire():
+            return True
+        probe.release()
+        return False
+
+    def __enter__(self):
+        self.acquire(timeout=None)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
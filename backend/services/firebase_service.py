@@ -2,17 +2,25 @@ import firebase_admin
 from firebase_admin import credentials, firestore, auth
 import os
 import json
+import time
+import hashlib
 import logging
+import threading
+import unicodedata
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+ICD_CACHE_COLLECTION = 'icd_search_cache'
+
 class FirebaseService:
     def __init__(self):
         self.db = None
         self.app = None
+        self._sweeper = None
         self.initialize_firebase()
+        self.start_cache_sweeper(float(os.getenv('ICD_CACHE_SWEEP_INTERVAL', '3600')))
     
     def initialize_firebase(self):
         """Initialize Firebase Admin SDK"""
@@ -148,7 +156,15 @@ class FirebaseService:
             logger.error(f"Failed to get pending mappings from Firebase: {e}")
             return []
     
-    def cache_icd_search_results(self, query: str, results: List[Dict[str, Any]], cache_duration_hours: int = 24) -> bool:
+    @staticmethod
+    def icd_cache_key(query: str, release_id: str = '', linearizations: Optional[List[str]] = None) -> str:
+        """Stable, content-addressed document ID for a search (same in every process and restart)"""
+        normalized = ' '.join(unicodedata.normalize('NFC', str(query)).lower().split())
+        material = '\x1f'.join([str(release_id or ''), ','.join(linearizations or []), normalized])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:40]
+    
+    def cache_icd_search_results(self, query: str, results: List[Dict[str, Any]], cache_duration_hours: int = 24,
+                                 release_id: str = '', linearizations: Optional[List[str]] = None) -> bool:
         """Cache ICD search results in Firebase"""
         if not self.db:
             return False
@@ -156,14 +172,16 @@ class FirebaseService:
         try:
             cache_doc = {
                 'query': query,
+                'release_id': release_id,
+                'linearizations': list(linearizations or []),
                 'results': results,
                 'cached_at': datetime.now(),
                 'expires_at': datetime.now().timestamp() + (cache_duration_hours * 3600)
             }
             
-            # Use query hash as document ID for efficient lookup
-            query_hash = hash(query.lower().strip())
-            doc_ref = self.db.collection('icd_search_cache').document(str(query_hash))
+            # Content-addressed document ID so every worker reads what any other wrote
+            doc_id = self.icd_cache_key(query, release_id, linearizations)
+            doc_ref = self.db.collection(ICD_CACHE_COLLECTION).document(doc_id)
             doc_ref.set(cache_doc)
             
             return True
@@ -172,24 +190,21 @@ class FirebaseService:
             logger.error(f"Failed to cache ICD search results: {e}")
             return False
     
-    def get_cached_icd_results(self, query: str) -> Optional[List[Dict[str, Any]]]:
+    def get_cached_icd_results(self, query: str, release_id: str = '',
+                               linearizations: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
         """Get cached ICD search results from Firebase"""
         if not self.db:
             return None
         
         try:
-            query_hash = hash(query.lower().strip())
-            doc_ref = self.db.collection('icd_search_cache').document(str(query_hash))
-            doc = doc_ref.get()
+            doc_id = self.icd_cache_key(query, release_id, linearizations)
+            doc = self.db.collection(ICD_CACHE_COLLECTION).document(doc_id).get()
             
+            # Expired documents are left for the sweeper; reads never write
             if doc.exists:
                 data = doc.to_dict()
-                # Check if cache is still valid
-                if datetime.now().timestamp() < data['expires_at']:
+                if datetime.now().timestamp() < data.get('expires_at', 0):
                     return data['results']
-                else:
-                    # Remove expired cache
-                    doc_ref.delete()
             
             return None
             
@@ -197,6 +212,49 @@ class FirebaseService:
             logger.error(f"Failed to get cached ICD results: {e}")
             return None
     
+    def sweep_expired_icd_cache(self, batch_size: int = 400) -> int:
+        """Delete expired ICD search cache documents in batched writes, returning the count"""
+        if not self.db:
+            return 0
+        
+        deleted = 0
+        try:
+            collection = self.db.collection(ICD_CACHE_COLLECTION)
+            while True:
+                expired = list(
+                    collection.where('expires_at', '<', datetime.now().timestamp()).limit(batch_size).stream()
+                )
+                if not expired:
+                    break
+                batch = self.db.batch()
+                for doc in expired:
+                    batch.delete(doc.reference)
+                batch.commit()
+                deleted += len(expired)
+                if len(expired) < batch_size:
+                    break
+            
+            if deleted:
+                logger.info(f"Swept {deleted} expired ICD search cache documents")
+            return deleted
+            
+        except Exception as e:
+            logger.error(f"Failed to sweep ICD search cache: {e}")
+            return deleted
+    
+    def start_cache_sweeper(self, interval_seconds: float) -> None:
+        """Sweep expired ICD cache documents periodically in a daemon thread"""
+        if not self.db or interval_seconds <= 0 or self._sweeper is not None:
+            return
+        
+        def sweep_forever():
+            while True:
+                time.sleep(interval_seconds)
+                self.sweep_expired_icd_cache()
+        
+        self._sweeper = threading.Thread(target=sweep_forever, name='icd-cache-sweeper', daemon=True)
+        self._sweeper.start()
+    
     def log_activity(self, activity_data: Dict[str, Any]) -> bool:
         """Log user/system activities for audit trail"""
         if not self.db:
@@ -0,0 +1,258 @@
+import re
+import copy
+import logging
+import unicodedata
+import numpy as np
+from services.record_store import _StringColumn
+from services.search_index import _csr
+
+logger = logging.getLogger(__name__)
+
+# Unicode blocks of the native-script columns (Ayurveda, Siddha, Unani)
+SCRIPT_RANGES = [
+    ('devanagari', 0x0900, 0x097F),
+    ('devanagari', 0xA8E0, 0xA8FF),
+    ('tamil', 0x0B80, 0x0BFF),
+    ('arabic', 0x0600, 0x06FF),
+    ('arabic', 0x0750, 0x077F),
+    ('arabic', 0xFB50, 0xFDFF),
+    ('arabic', 0xFE70, 0xFEFF),
+]
+
+# Arabic harakat/superscript alef and tatweel are optional in Urdu/Arabic spelling
+ARABIC_MARKS = re.compile(r'[\u064b-\u065f\u0670\u0640]')
+ARABIC_FOLDS = str.maketrans({'\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627', '\u0649': '\u064a'})
+# Zero-width joiners change rendering, not spelling; hyphens/punctuation become spaces
+IGNORED_CHARS = re.compile(r'[\u200b-\u200d\u2060\ufeff]')
+SEPARATORS = re.compile(r"[\s\-_.,;:!?()\[\]{}'\"/\\|\u0964\u0965\u060c\u061b\u061f\u06d4]+")
+
+
+def detect_script(text):
+    """Dominant script of a string: devanagari, tamil, arabic or latin"""
+    tally = {}
+    for char in text:
+        point = ord(char)
+        for script, start, end in SCRIPT_RANGES:
+            if start <= point <= end:
+                tally[script] = tally.get(script, 0) + 1
+                break
+    return max(tally, key=tally.get) if tally else 'latin'
+
+
+def normalize_native(text):
+    """NFC, lowercase and fold spelling variants that should not count as edits"""
+    if text is None:
+        return ''
+    text = unicodedata.normalize('NFC', str(text)).lower()
+    text = IGNORED_CHARS.sub('', text)
+    text = ARABIC_MARKS.sub('', text).translate(ARABIC_FOLDS)
+    return SEPARATORS.sub(' ', text).strip()
+
+
+def trigrams(text):
+    """Distinct character trigrams of a normalized string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def substring_distance(query, text, max_distance):
+    """Fewest edits turning query into some substring of text, or None if above max_distance.
+
+    Semi-global Levenshtein: the match may start and end anywhere in ``text``,
+    so partial queries ("vata" in "vatavyadhi") cost nothing for the skipped
+    characters. Stops early on an exact substring match.
+    """
+    previous = list(range(len(query) + 1))
+    best = previous[-1]
+    for char in text:
+        current = [0]
+        for j, query_char in enumerate(query, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (query_char != char)
+            ))
+        best = min(best, current[-1])
+        if best == 0:
+            break
+        previous = current
+    return best if best <= max_distance else None
+
+
+class NativeScriptFuzzyIndex:
+    """Trigram index over ``term_original`` partitioned by script.
+
+    Candidates come from trigram postings of the query's script only: a query
+    with ``k`` edits still shares all but ``3k`` of its distinct trigrams with
+    the matching part of a term (q-gram lemma), so rows below that count are
+    skipped without being read. Survivors are verified with a bounded
+    substring edit distance.
+
+    Postings are kept CSR style like the search index: one sorted array of
+    ``script:trigram`` keys with ``gram_ptr``/``gram_rows``, plus the sorted ids
+    of indexed rows with their normalized terms (UTF-8 offsets + blob) and
+    system codes. Every table is a numpy array, persisted in the model
+    artifact and memory-mapped from it.
+    """
+
+    def __init__(self, grams=None, gram_ptr=None, gram_rows=None, row_ids=None,
+                 term_offsets=None, term_blob=None, row_systems=None, systems=None, field='term_original'):
+        self.field = field
+        self.grams = grams if grams is not None else np.zeros(0, dtype=str)
+        self.gram_ptr = gram_ptr if gram_ptr is not None else np.zeros(1, dtype=np.int64)
+        self.gram_rows = gram_rows if gram_rows is not None else np.zeros(0, dtype=np.int32)
+        self.row_ids = row_ids if row_ids is not None else np.zeros(0, dtype=np.int32)
+        self.terms = _StringColumn(
+            term_offsets if term_offsets is not None else np.zeros(1, dtype=np.int64),
+            term_blob if term_blob is not None else np.zeros(0, dtype=np.uint8)
+        )
+        self.row_systems = row_systems if row_systems is not None else np.zeros(0, dtype=np.int16)
+        self.systems = systems if systems is not None else np.zeros(0, dtype=str)
+        # Overlay used by with_delta(); the base arrays above are never modified
+        self.delta = None
+        self.delta_rows = {}
+        self.removed = np.zeros(0, dtype=np.int32)
+
+    @classmethod
+    def from_rows(cls, rows, field='term_original'):
+        """Build an index from (row_id, term, system) tuples"""
+        postings = {}
+        entries = []
+        for row_id, term, system in rows:
+            term = normalize_native(term)
+            if not term:
+                continue
+            script = detect_script(term)
+            for gram in trigrams(term):
+                postings.setdefault(f"{script}:{gram}", []).append(row_id)
+            entries.append((row_id, term, str(system).lower()))
+        entries.sort()
+
+        systems = sorted({system for _, _, system in entries})
+        codes = {system: code for code, system in enumerate(systems)}
+        terms = _StringColumn.from_values([term for _, term, _ in entries])
+        grams, gram_ptr, gram_rows = _csr(postings)
+        return cls(
+            np.array(grams, dtype=str), gram_ptr, gram_rows,
+            np.array([row_id for row_id, _, _ in entries], dtype=np.int32),
+            terms.offsets, terms.blob,
+            np.array([codes[system] for _, _, system in entries], dtype=np.int16),
+            np.array(systems, dtype=str), field
+        )
+
+    @classmethod
+    def from_records(cls, records, field='term_original'):
+        """Build an index from a TerminologyRecordStore"""
+        if records is None or len(records) == 0 or not records.has_column(field):
+            return cls(field=field)
+
+        index = cls.from_rows(zip(range(len(records)), records.column(field), records.column('system')), field)
+        logger.info(f"Fuzzy index built: {len(index.row_ids)} native terms, {len(index.grams)} script trigrams")
+        return index
+
+    def to_arrays(self):
+        """Index arrays for persisting alongside the TF-IDF matrix"""
+        return {
+            'fuzzy_grams': self.grams,
+            'fuzzy_gram_ptr': self.gram_ptr,
+            'fuzzy_gram_rows': self.gram_rows,
+            'fuzzy_row_ids': self.row_ids,
+            'fuzzy_term_offsets': self.terms.offsets,
+            'fuzzy_term_blob': self.terms.blob,
+            'fuzzy_row_systems': self.row_systems,
+            'fuzzy_systems': self.systems
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, field='term_original'):
+        """Rebuild an index from to_arrays() output without copying the arrays"""
+        return cls(
+            arrays['fuzzy_grams'], arrays['fuzzy_gram_ptr'], arrays['fuzzy_gram_rows'], arrays['fuzzy_row_ids'],
+            arrays['fuzzy_term_offsets'], arrays['fuzzy_term_blob'], arrays['fuzzy_row_systems'],
+            arrays['fuzzy_systems'], field
+        )
+
+    def with_delta(self, added_rows, removed_row_ids):
+        """Return a new index with (row_id, term, system) rows added and row ids removed.
+
+        Added rows go into a small overlay index rebuilt from the delta rows;
+        removed base rows are masked. The receiver is left unchanged.
+        """
+        index = copy.copy(self)
+        removed = np.array(sorted(set(removed_row_ids)), dtype=np.int32)
+
+        delta_rows = dict(self.delta_rows)
+        for row_id in removed.tolist():
+            delta_rows.pop(row_id, None)
+        for row_id, term, system in added_rows:
+            delta_rows[row_id] = (term, system)
+
+        index.delta_rows = delta_rows
+        index.delta = NativeScriptFuzzyIndex.from_rows(
+            ((row_id, term, system) for row_id, (term, system) in delta_rows.items()), self.field
+        ) if delta_rows else None
+        index.removed = np.union1d(self.removed, np.intersect1d(removed, self.row_ids)).astype(np.int32)
+        return index
+
+    @staticmethod
+    def default_distance(query):
+        # About one edit per four characters; combining marks make native words long
+        return max(1, len(query) // 4)
+
+    def _candidates(self, script, grams, min_shared):
+        """Row ids sharing at least min_shared of the query trigrams, minus removed rows"""
+        keys = [f"{script}:{gram}" for gram in grams]
+        positions = np.searchsorted(self.grams, keys)
+        postings = [
+            self.gram_rows[self.gram_ptr[position]:self.gram_ptr[position + 1]]
+            for key, position in zip(keys, positions.tolist())
+            if position < len(self.grams) and self.grams[position] == key
+        ]
+        if not postings:
+            return np.zeros(0, dtype=np.int32)
+        # Each row appears at most once per trigram, so its count is the number of shared trigrams
+        rows, shared = np.unique(np.concatenate(postings), return_counts=True)
+        rows = rows[shared >= min_shared]
+        if len(self.removed):
+            rows = np.setdiff1d(rows, self.removed, assume_unique=True)
+        return rows
+
+    def _verify(self, row_ids, query, systems, max_distance):
+        matches = []
+        positions = np.searchsorted(self.row_ids, row_ids)
+        if systems is not None:
+            allowed = np.isin(self.systems[self.row_systems[positions]], list(systems))
+            row_ids, positions = row_ids[allowed], positions[allowed]
+        for row_id, position in zip(row_ids.tolist(), positions.tolist()):
+            distance = substring_distance(query, self.terms[position], max_distance)
+            if distance is not None:
+                matches.append((row_id, distance))
+        return matches
+
+    def search(self, query, systems=None, limit=10, max_distance=None):
+        """Return [(row_id, edits)] for terms containing the query within max_distance edits.
+
+        Results are ordered by edit count, then table order. Queries shorter than
+        a trigram have no postings to look up and return no fuzzy matches.
+        """
+        query = normalize_native(query)
+        if len(query) < 3:
+            return []
+
+        script = detect_script(query)
+        grams = trigrams(query)
+        if max_distance is None:
+            max_distance = self.default_distance(query)
+        # Keep at least one shared trigram required, otherwise every row is a candidate
+        max_distance = max(0, min(max_distance, (len(grams) - 1) // 3))
+        min_shared = len(grams) - 3 * max_distance
+        if systems is not None:
+            systems = {str(system).lower() for system in systems}
+
+        matches = self._verify(self._candidates(script, grams, min_shared), query, systems, max_distance)
+        if self.delta is not None:
+            matches.extend(self.delta._verify(
+                self.delta._candidates(script, grams, min_shared), query, systems, max_distance
+            ))
+
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches if limit is None else matches[:limit]
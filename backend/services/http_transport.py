@@ -0,0 +1,165 @@
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying: throttling and transient server/gateway errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def _timeout_from_env(name, default):
+    """Parse a "connect,read" timeout pair (seconds) from the environment"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        parts = [float(part) for part in value.split(',')]
+        return (parts[0], parts[-1])
+    except ValueError:
+        logger.warning(f"Ignoring invalid timeout {name}={value!r}")
+        return default
+
+
+class RateLimiter:
+    """Blocking token bucket: at most ``rate`` acquisitions per second, bursts up to ``burst``"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the time waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now (the balance may go negative) so waiters queue fairly
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class HTTPTransport:
+    """Pooled HTTP session with bounded retries, jittered backoff and per-endpoint timeouts.
+
+    Every call names a logical endpoint (``token``, ``search``, ...) which picks
+    its (connect, read) timeout and keys the counters. Retries use full-jitter
+    exponential backoff and honour ``Retry-After`` on 429/503, capped by
+    ``max_backoff``. Connection reuse is read from the urllib3 pools.
+    """
+
+    def __init__(self, timeouts=None, default_timeout=(3.05, 10), pool_size=16,
+                 max_retries=3, backoff_base=0.25, max_backoff=8.0, env_prefix=None):
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        if env_prefix:
+            # e.g. WHO_TIMEOUT_SEARCH=2,5 overrides the search endpoint
+            for endpoint, timeout in list(self.timeouts.items()):
+                self.timeouts[endpoint] = _timeout_from_env(f"{env_prefix}_TIMEOUT_{endpoint.upper()}", timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def _count(self, endpoint, key, amount=1):
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {
+                'requests': 0, 'attempts': 0, 'retries': 0, 'failures': 0, 'statuses': {}
+            })
+            if key == 'status':
+                counters['statuses'][amount] = counters['statuses'].get(amount, 0) + 1
+            else:
+                counters[key] += amount
+
+    def _backoff(self, attempt, response=None):
+        """Full-jitter exponential delay, or the server's Retry-After when it sends one"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, endpoint='default', retries=None, **kwargs):
+        """Send a request, retrying transient failures; raises after the last attempt"""
+        kwargs.setdefault('timeout', self.timeout_for(endpoint))
+        retries = self.max_retries if retries is None else retries
+        self._count(endpoint, 'requests')
+
+        attempt = 0
+        while True:
+            self._count(endpoint, 'attempts')
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= retries:
+                    self._count(endpoint, 'failures')
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{endpoint} {method} failed ({e.__class__.__name__}), retry {attempt + 1}/{retries} in {delay:.2f}s")
+            else:
+                self._count(endpoint, 'status', response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    if response.status_code >= 400:
+                        self._count(endpoint, 'failures')
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{endpoint} {method} returned {response.status_code}, retry {attempt + 1}/{retries} in {delay:.2f}s")
+                response.close()
+
+            self._count(endpoint, 'retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, endpoint='default', **kwargs):
+        return self.request('GET', url, endpoint=endpoint, **kwargs)
+
+    def post(self, url, endpoint='default', **kwargs):
+        return self.request('POST', url, endpoint=endpoint, **kwargs)
+
+    def stats(self):
+        """Per-endpoint counters plus connection reuse across the pool"""
+        opened = served = 0
+        pools = self.adapter.poolmanager.pools
+        # Public mapping interface of urllib3's pool container; a pool may be evicted between the calls
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                served += pool.num_requests
+        with self._lock:
+            endpoints = {
+                name: dict(counters, statuses=dict(counters['statuses']))
+                for name, counters in self._counters.items()
+            }
+        return {
+            'endpoints': endpoints,
+            'connections': {
+                'pools': len(pools),
+                'opened': opened,
+                'requests': served,
+                'reused': max(0, served - opened)
+            },
+            'timeouts': {name: list(timeout) for name, timeout in self.timeouts.items()}
+        }
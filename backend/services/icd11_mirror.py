@@ -0,0 +1,335 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Linearizations mirrored for offline serving, and the system label their results carry
+MIRRORED_LINEARIZATIONS = {'tm2': 'TM2', 'mms': 'ICD-11 MMS'}
+
+
+def _text(value):
+    """WHO language-tagged strings come as {'@value': ...} or plain strings"""
+    if isinstance(value, dict):
+        return value.get('@value', '')
+    return value if isinstance(value, str) else ''
+
+
+class ICD11Mirror:
+    """Local copy of the TM2 and MMS linearizations of one ICD-11 release.
+
+    ``sync`` walks each linearization tree breadth-first from its root with a
+    bounded number of concurrent fetches. The frontier lives in the same SQLite
+    file as the entities, so an interrupted sync resumes where it stopped.
+    Once a linearization is complete, entity lookups and searches (SQLite FTS5,
+    or LIKE where FTS5 is unavailable) are served from the file.
+    """
+
+    def __init__(self, directory='cache/icd11_mirror', release_id='2023-01'):
+        self.release_id = release_id
+        self.path = os.path.join(directory, f"icd11_{release_id}.sqlite3")
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._complete = None
+        self._complete_checked = 0.0
+        self.fts = True
+        self.progress = {}
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._create_schema(connection)
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self, connection):
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS entities (
+                linearization TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                code TEXT,
+                title TEXT,
+                definition TEXT,
+                uri TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (linearization, entity_id)
+            );
+            CREATE INDEX IF NOT EXISTS entities_code ON entities (linearization, code);
+            CREATE TABLE IF NOT EXISTS frontier (
+                linearization TEXT NOT NULL,
+                uri TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (linearization, uri)
+            );
+            CREATE INDEX IF NOT EXISTS frontier_status ON frontier (linearization, status);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        ''')
+        try:
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entity_search USING fts5("
+                "title, definition, linearization UNINDEXED, entity_id UNINDEXED, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError:
+            # SQLite builds without FTS5 fall back to LIKE scans
+            self.fts = False
+
+    # --- status -------------------------------------------------------------
+
+    def _meta(self, key, default=None):
+        row = self._connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key, value):
+        self._connection().execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+
+    # Completion is re-read this often so a sync run by another process (the CLI) is picked up
+    COMPLETE_RECHECK = 30
+
+    def is_complete(self, linearization):
+        if self._complete is None or time.monotonic() - self._complete_checked > self.COMPLETE_RECHECK:
+            if not os.path.exists(self.path):
+                return False
+            self._complete = set(self._meta('complete', []))
+            self._complete_checked = time.monotonic()
+        return linearization in self._complete
+
+    def status(self):
+        if not os.path.exists(self.path):
+            return {'release_id': self.release_id, 'path': self.path, 'linearizations': {}, 'syncing': self._sync_lock.locked()}
+        connection = self._connection()
+        linearizations = {}
+        for linearization in MIRRORED_LINEARIZATIONS:
+            counts = dict(connection.execute(
+                'SELECT status, COUNT(*) FROM frontier WHERE linearization = ? GROUP BY status', (linearization,)
+            ).fetchall())
+            entities = connection.execute(
+                'SELECT COUNT(*) FROM entities WHERE linearization = ?', (linearization,)
+            ).fetchone()[0]
+            linearizations[linearization] = {
+                'complete': self.is_complete(linearization),
+                'entities': entities,
+                'pending': counts.get('pending', 0),
+                'failed': counts.get('failed', 0),
+                'synced_at': self._meta(f"synced_at:{linearization}")
+            }
+        return {
+            'release_id': self.release_id,
+            'path': self.path,
+            'search': 'fts5' if self.fts else 'like',
+            'linearizations': linearizations,
+            'syncing': self._sync_lock.locked(),
+            'progress': dict(self.progress)
+        }
+
+    # --- sync ---------------------------------------------------------------
+
+    def entity_id(self, linearization, uri):
+        """Entity id relative to the linearization, e.g. '1435254666' or '1435254666/other'"""
+        marker = f"/{self.release_id}/{linearization}"
+        tail = uri.split(marker, 1)[1] if marker in uri else uri.rsplit('/', 1)[-1]
+        return tail.strip('/') or 'root'
+
+    def sync(self, fetch, base_uri, linearizations=('tm2', 'mms'), workers=8, max_attempts=3,
+             restart=False, commit_every=200):
+        """Walk and store the linearization trees; ``fetch(uri)`` returns the entity JSON.
+
+        A URI whose fetch fails is retried until it has used ``max_attempts``,
+        then marked failed and skipped: its subtree is missing from the mirror,
+        but it no longer keeps the linearization from completing. Safe to call
+        again after an interruption: only pending URIs are fetched. ``restart``
+        discards progress, failures included.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            raise RuntimeError('A mirror sync is already running')
+        try:
+            connection = self._connection()
+            started = time.time()
+            summary = {}
+            for linearization in linearizations:
+                summary[linearization] = self._sync_linearization(
+                    connection, fetch, f"{base_uri}/release/11/{self.release_id}/{linearization}",
+                    linearization, workers, max_attempts, restart, commit_every
+                )
+            self._complete = None
+            summary['seconds'] = round(time.time() - started, 1)
+            return summary
+        finally:
+            self._sync_lock.release()
+
+    def _sync_linearization(self, connection, fetch, root_uri, linearization, workers,
+                            max_attempts, restart, commit_every):
+        if restart:
+            connection.execute('DELETE FROM frontier WHERE linearization = ?', (linearization,))
+            connection.execute('DELETE FROM entities WHERE linearization = ?', (linearization,))
+            if self.fts:
+                connection.execute('DELETE FROM entity_search WHERE linearization = ?', (linearization,))
+            self._set_meta('complete', sorted(set(self._meta('complete', [])) - {linearization}))
+
+        # Resume: retry failures with attempts left; seed the root on a fresh walk
+        connection.execute(
+            "UPDATE frontier SET status = 'pending' WHERE linearization = ? AND status = 'failed' AND attempts < ?",
+            (linearization, max_attempts)
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO frontier (linearization, uri) VALUES (?, ?)", (linearization, root_uri)
+        )
+
+        fetched = failed = retried = 0
+        # FIFO frontier: rows are read back in insertion order, so a resumed walk stays breadth-first
+        pending = deque(row[0] for row in connection.execute(
+            "SELECT uri FROM frontier WHERE linearization = ? AND status = 'pending' ORDER BY rowid", (linearization,)
+        ))
+        progress = self.progress.setdefault(linearization, {})
+        progress.update({'fetched': 0, 'failed': 0, 'retried': 0, 'queued': len(pending)})
+
+        connection.execute('BEGIN')
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"mirror-{linearization}") as pool:
+                in_flight = {}
+                while pending or in_flight:
+                    # Bounded parallelism: never more than `workers` requests outstanding
+                    while pending and len(in_flight) < workers:
+                        uri = pending.popleft()
+                        in_flight[pool.submit(fetch, uri)] = uri
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                    # Only this thread writes; workers just fetch
+                    for future in done:
+                        uri = in_flight.pop(future)
+                        try:
+                            entity = future.result()
+                            children = self._store_entity(connection, linearization, uri, entity)
+                            for child in children:
+                                inserted = connection.execute(
+                                    "INSERT OR IGNORE INTO frontier (linearization, uri) VALUES (?, ?)",
+                                    (linearization, child)
+                                ).rowcount
+                                if inserted:
+                                    pending.append(child)
+                            connection.execute(
+                                "UPDATE frontier SET status = 'done', attempts = attempts + 1 WHERE linearization = ? AND uri = ?",
+                                (linearization, uri)
+                            )
+                            fetched += 1
+                        except Exception as e:
+                            connection.execute(
+                                "UPDATE frontier SET attempts = attempts + 1 WHERE linearization = ? AND uri = ?",
+                                (linearization, uri)
+                            )
+                            attempts = connection.execute(
+                                "SELECT attempts FROM frontier WHERE linearization = ? AND uri = ?", (linearization, uri)
+                            ).fetchone()[0]
+                            if attempts < max_attempts:
+                                # Retry after the rest of the queue rather than hammering the same URI
+                                pending.append(uri)
+                                retried += 1
+                                logger.warning(f"Mirror fetch failed for {uri} (attempt {attempts}/{max_attempts}): {e}")
+                            else:
+                                connection.execute(
+                                    "UPDATE frontier SET status = 'failed' WHERE linearization = ? AND uri = ?",
+                                    (linearization, uri)
+                                )
+                                failed += 1
+                                logger.error(f"Mirror fetch gave up on {uri} after {attempts} attempts: {e}")
+
+                        if (fetched + failed + retried) % commit_every == 0:
+                            connection.execute('COMMIT')
+                            connection.execute('BEGIN')
+                            progress.update({'fetched': fetched, 'failed': failed, 'retried': retried, 'queued': len(pending)})
+                            logger.info(f"Mirror {linearization}: {fetched} fetched, {failed} failed, {len(pending)} queued")
+        finally:
+            # Stored entities and their frontier rows are written together, so whatever was
+            # stored before an interruption is consistent and kept for the resume
+            connection.execute('COMMIT')
+
+        # Failed URIs are final; only pending ones (left by an interruption) keep the walk incomplete
+        remaining = connection.execute(
+            "SELECT COUNT(*) FROM frontier WHERE linearization = ? AND status = 'pending'", (linearization,)
+        ).fetchone()[0]
+        if remaining == 0:
+            self._set_meta('complete', sorted(set(self._meta('complete', [])) | {linearization}))
+            self._set_meta(f"synced_at:{linearization}", datetime.now().isoformat())
+        progress.update({'fetched': fetched, 'failed': failed, 'retried': retried, 'queued': 0, 'remaining': remaining})
+        logger.info(f"Mirror {linearization} sync: {fetched} fetched, {failed} failed, {retried} retried, {remaining} not done")
+        return {'fetched': fetched, 'failed': failed, 'retried': retried, 'remaining': remaining, 'complete': remaining == 0}
+
+    def _store_entity(self, connection, linearization, uri, entity):
+        entity_id = self.entity_id(linearization, entity.get('@id') or uri)
+        title = _text(entity.get('title'))
+        definition = _text(entity.get('definition'))
+        connection.execute(
+            'INSERT OR REPLACE INTO entities (linearization, entity_id, code, title, definition, uri, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (linearization, entity_id, entity.get('code', ''), title, definition,
+             entity.get('@id') or uri, json.dumps(entity, ensure_ascii=False))
+        )
+        if self.fts:
+            connection.execute(
+                'DELETE FROM entity_search WHERE linearization = ? AND entity_id = ?', (linearization, entity_id)
+            )
+            connection.execute(
+                'INSERT INTO entity_search (title, definition, linearization, entity_id) VALUES (?, ?, ?, ?)',
+                (title, definition, linearization, entity_id)
+            )
+        return entity.get('child', [])
+
+    # --- serving ------------------------------------------------------------
+
+    def get_entity(self, entity_id, linearization='mms'):
+        """Stored entity JSON, or None when not mirrored"""
+        if not self.is_complete(linearization):
+            return None
+        row = self._connection().execute(
+            'SELECT data FROM entities WHERE linearization = ? AND entity_id = ?', (linearization, str(entity_id))
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, query, linearizations=('tm2', 'mms'), limit=50):
+        """Search titles/definitions; returns results shaped like WHO search results"""
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return []
+
+        connection = self._connection()
+        results = []
+        for linearization in linearizations:
+            if self.fts:
+                # Every term must match (prefix), best bm25 first, titles weighted over definitions
+                match = ' '.join(f'"{term}"*' for term in terms)
+                rows = connection.execute(
+                    'SELECT e.code, e.title, e.definition, e.uri FROM entity_search s '
+                    'JOIN entities e ON e.linearization = s.linearization AND e.entity_id = s.entity_id '
+                    'WHERE entity_search MATCH ? AND s.linearization = ? '
+                    'ORDER BY bm25(entity_search, 10.0, 1.0) LIMIT ?',
+                    (match, linearization, limit)
+                ).fetchall()
+            else:
+                clauses = ' AND '.join('(LOWER(title) LIKE ? OR LOWER(definition) LIKE ?)' for _ in terms)
+                params = [value for term in terms for value in (f"%{term}%", f"%{term}%")]
+                rows = connection.execute(
+                    f'SELECT code, title, definition, uri FROM entities WHERE linearization = ? AND {clauses} LIMIT ?',
+                    [linearization] + params + [limit]
+                ).fetchall()
+
+            for code, title, definition, uri in rows:
+                results.append({
+                    'code': code or '',
+                    'title': title or '',
+                    'definition': definition or '',
+                    'system': MIRRORED_LINEARIZATIONS[linearization],
+                    'uri': uri or ''
+                })
+        return results
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Origin for the startup report: app.py imports this module first
+IMPORT_STARTED = time.time()
+
+
+class StartupReport:
+    """Timings of startup phases and of every deferred import/service initialization"""
+
+    def __init__(self):
+        self.phases = []
+        self.loads = {}
+        self._lock = threading.Lock()
+
+    def phase(self, name):
+        """Context manager that records how long a named startup phase took"""
+        return _Timer(self, name)
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            self.phases.append({'name': name, 'ms': round(seconds * 1000, 1)})
+
+    def mark(self, name):
+        """Record a milestone as time elapsed since the app import began"""
+        with self._lock:
+            self.phases.append({'name': name, 'at_ms': round((time.time() - IMPORT_STARTED) * 1000, 1)})
+
+    def record_load(self, name, seconds):
+        with self._lock:
+            self.loads[name] = {
+                'ms': round(seconds * 1000, 1),
+                'at_ms': round((time.time() - IMPORT_STARTED) * 1000, 1),
+                'thread': threading.current_thread().name
+            }
+
+    def to_dict(self, pending=()):
+        with self._lock:
+            return {
+                'since_import_ms': round((time.time() - IMPORT_STARTED) * 1000, 1),
+                'phases': list(self.phases),
+                'deferred_loads': dict(self.loads),
+                'not_loaded_yet': sorted(name for name in pending if name not in self.loads)
+            }
+
+
+class _Timer:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.report.record_phase(self.name, time.perf_counter() - self.started)
+        return False
+
+
+startup_report = StartupReport()
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    already_imported = self._name in sys.modules
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if not already_imported:
+                        startup_report.record_load(self._name, time.perf_counter() - started)
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+class LazyService:
+    """Proxy for a module-level service instance (``module:attribute``).
+
+    The module is imported, and so the service constructed, on first attribute
+    access, in whichever thread touches it first. ``warm()`` forces the load,
+    e.g. from a background warm-up thread.
+    """
+
+    def __init__(self, module_name, attribute):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return f"{self._module_name}:{self._attribute}"
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def warm(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    instance = getattr(importlib.import_module(self._module_name), self._attribute)
+                    startup_report.record_load(self.name, time.perf_counter() - started)
+                    self._instance = instance
+        return self._instance
+
+    def __getattr__(self, attr):
+        return getattr(self.warm(), attr)
+
+
+def lazy_startup_enabled():
+    """Opt-in fast cold start: defer data loading and external clients to a background warm-up"""
+    return os.getenv('LAZY_STARTUP', 'false').lower() == 'true'
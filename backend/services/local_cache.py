@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LocalResponseCache:
+    """Node-local persistent cache (SQLite, WAL) for upstream API responses.
+
+    Every worker process on the node opens the same file, so restarts and new
+    workers start warm. Entries are fresh for ``fresh_seconds`` and may still be
+    served, flagged stale, until ``stale_seconds`` so callers can revalidate in
+    the background (stale-while-revalidate). Total payload size is bounded by
+    ``max_bytes``; the least recently read entries are evicted first.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS responses (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        )
+    '''
+
+    # Reads only refresh accessed_at this often, to keep hot reads from becoming writes
+    TOUCH_INTERVAL = 60
+    # After eviction the cache is trimmed to this share of max_bytes
+    EVICT_TO = 0.9
+
+    def __init__(self, path='cache/who_responses.sqlite3', max_bytes=64 * 1024 * 1024,
+                 fresh_seconds=3600, stale_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._bytes = None
+        self._metrics = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'errors': 0}
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(self.SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._metrics[key] += amount
+
+    def get(self, namespace, key):
+        """Return (value, state) with state 'fresh', 'stale' or 'miss'"""
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                'SELECT value, stored_at, accessed_at FROM responses WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.stale_seconds:
+                self._count('misses')
+                return None, 'miss'
+
+            if now - row[2] > self.TOUCH_INTERVAL:
+                connection.execute(
+                    'UPDATE responses SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                    (now, namespace, key)
+                )
+            state = 'fresh' if now - row[1] <= self.fresh_seconds else 'stale'
+            self._count(f"{state}_hits")
+            return json.loads(row[0]), state
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Local cache read failed for {namespace}:{key}: {e}")
+            return None, 'miss'
+
+    def set(self, namespace, key, value):
+        try:
+            payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+            now = time.time()
+            connection = self._connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (namespace, key, value, size, stored_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (namespace, key, payload, len(payload), now, now)
+            )
+            self._count('writes')
+            with self._lock:
+                self._bytes = None if self._bytes is None else self._bytes + len(payload)
+                over = self._bytes is None or self._bytes > self.max_bytes
+            if over:
+                self._evict(connection)
+            return True
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Local cache write failed for {namespace}:{key}: {e}")
+            return False
+
+    def _evict(self, connection):
+        """Drop expired entries, then least recently read ones, until under the size budget"""
+        connection.execute('DELETE FROM responses WHERE stored_at < ?', (time.time() - self.stale_seconds,))
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * self.EVICT_TO)
+            evicted = 0
+            rows = connection.execute('SELECT namespace, key, size FROM responses ORDER BY accessed_at').fetchall()
+            for namespace, key, size in rows:
+                if total <= target:
+                    break
+                connection.execute('DELETE FROM responses WHERE namespace = ? AND key = ?', (namespace, key))
+                total -= size
+                evicted += 1
+            self._count('evictions', evicted)
+            logger.info(f"Local cache evicted {evicted} entries, {total} bytes remain")
+        with self._lock:
+            # Other processes write too, so this is re-measured at the next eviction check
+            self._bytes = total
+
+    def stats(self):
+        try:
+            entries, total = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+        except Exception:
+            entries, total = None, None
+        with self._lock:
+            return dict(
+                self._metrics,
+                path=self.path,
+                entries=entries,
+                bytes=total,
+                max_bytes=self.max_bytes,
+                fresh_seconds=self.fresh_seconds,
+                stale_seconds=self.stale_seconds
+            )
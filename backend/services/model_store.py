@@ -0,0 +1,177 @@
+import os
+import glob
+import shutil
+import pickle
+import hashlib
+import logging
+import numpy as np
+from importlib import metadata
+from datetime import datetime
+from services.lazy import LazyModule
+
+sp = LazyModule('scipy.sparse')
+# The pickled vectorizer pulls in sklearn; load it through here so the startup report times it
+sklearn_text = LazyModule('sklearn.feature_extraction.text')
+
+logger = logging.getLogger(__name__)
+
+# Bump when the training pipeline changes so old artifacts are not reused
+MODEL_FORMAT_VERSION = 6
+
+
+class ModelStore:
+    """On-disk store for trained TF-IDF artifacts keyed by a hash of the resource files.
+
+    An artifact is a directory: a small pickle with the vectorizer, record
+    schema and prerendered stats, plus one ``.npy`` file per array (CSR
+    data/indices/indptr, posting lists, search and fuzzy indexes, record columns). Arrays are opened with ``mmap_mode='r'`` so every
+    worker process on the node shares one read-only copy via the page cache.
+    """
+
+    def __init__(self, cache_dir='cache/models', keep_artifacts=3):
+        self.cache_dir = cache_dir
+        self.keep_artifacts = keep_artifacts
+
+    def compute_data_hash(self, resource_paths, model_params=None):
+        """Content hash of the resource CSVs plus the training configuration"""
+        digest = hashlib.sha256()
+        digest.update(f"format={MODEL_FORMAT_VERSION};params={sorted((model_params or {}).items())}".encode())
+        # Pickled estimators/frames are only safe to reload on the same library versions
+        digest.update(self._library_versions().encode())
+
+        for path in sorted(resource_paths):
+            digest.update(os.path.basename(path).encode())
+            if not os.path.exists(path):
+                digest.update(b'<missing>')
+                continue
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def _library_versions():
+        # Read installed versions from package metadata; importing sklearn just for this costs ~0.7s
+        versions = []
+        for module_name, distribution in (('numpy', 'numpy'), ('scipy', 'scipy'), ('pandas', 'pandas'), ('sklearn', 'scikit-learn')):
+            try:
+                versions.append(f"{module_name}={metadata.version(distribution)}")
+            except metadata.PackageNotFoundError:
+                versions.append(f"{module_name}=<missing>")
+        return ';'.join(versions)
+
+    def _artifact_path(self, data_hash):
+        return os.path.join(self.cache_dir, f"tfidf_{data_hash[:16]}")
+
+    def load(self, data_hash, mmap_mode='r'):
+        """Load the artifact for a data hash with memory-mapped arrays, or None if missing or unreadable"""
+        path = self._artifact_path(data_hash)
+        meta_path = os.path.join(path, 'meta.pkl')
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            sklearn_text.TfidfVectorizer
+            with open(meta_path, 'rb') as f:
+                artifact = pickle.load(f)
+
+            if artifact.get('data_hash') != data_hash:
+                logger.warning(f"Model artifact {path} does not match data hash, ignoring")
+                return None
+
+            arrays = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                for name in artifact['arrays']
+            }
+            matrix = sp.csr_matrix(
+                (arrays.pop('matrix_data'), arrays.pop('matrix_indices'), arrays.pop('matrix_indptr')),
+                shape=artifact['matrix_shape'],
+                copy=False
+            )
+            matrix.has_sorted_indices = True
+            artifact['tfidf_matrix'] = matrix
+            artifact['arrays'] = arrays
+
+            logger.info(f"Loaded model artifact {path} (built {artifact.get('created_at')})")
+            return artifact
+
+        except Exception as e:
+            logger.error(f"Failed to load model artifact {path}: {e}")
+            return None
+
+    def save(self, data_hash, vectorizer, tfidf_matrix, records, retrieval_index=None, search_index=None,
+             fuzzy_index=None, stats=None):
+        """Persist a trained model atomically and prune older artifacts"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._artifact_path(data_hash)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            matrix = tfidf_matrix.tocsr()
+            if not matrix.has_sorted_indices:
+                matrix = matrix.sorted_indices()
+            record_schema, arrays = records.to_arrays()
+            arrays.update({
+                'matrix_data': matrix.data,
+                'matrix_indices': matrix.indices,
+                'matrix_indptr': matrix.indptr
+            })
+            if retrieval_index is not None:
+                arrays.update(retrieval_index.to_arrays())
+            if search_index is not None:
+                arrays.update(search_index.to_arrays())
+            if fuzzy_index is not None:
+                arrays.update(fuzzy_index.to_arrays())
+
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+            artifact = {
+                'data_hash': data_hash,
+                'format_version': MODEL_FORMAT_VERSION,
+                'created_at': datetime.now().isoformat(),
+                'vectorizer': vectorizer,
+                'matrix_shape': matrix.shape,
+                'record_schema': record_schema,
+                'stats': stats.to_state() if stats is not None else None,
+                'arrays': sorted(arrays)
+            }
+            with open(os.path.join(tmp_path, 'meta.pkl'), 'wb') as f:
+                pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # Atomic rename so concurrent workers never see a partial artifact;
+            # if another worker published the same hash first, keep theirs
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                if not os.path.exists(os.path.join(path, 'meta.pkl')):
+                    raise
+
+            self._prune(keep=path)
+            logger.info(f"Saved model artifact {path}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to save model artifact: {e}")
+            return False
+
+    def _prune(self, keep):
+        artifacts = sorted(
+            (path for path in glob.glob(os.path.join(self.cache_dir, 'tfidf_*')) if not path.endswith('.tmp')),
+            key=os.path.getmtime,
+            reverse=True
+        )
+        for path in artifacts[self.keep_artifacts:]:
+            if path != keep:
+                # Workers that mapped a pruned artifact keep their pages until they reload
+                try:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                except OSError:
+                    pass
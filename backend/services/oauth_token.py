@@ -0,0 +1,152 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RenewingToken:
+    """OAuth2 access token with single-flight refresh and a background renewer.
+
+    ``fetch()`` returns ``(access_token, expires_in_seconds)``. Once started, a
+    daemon thread renews the token ``refresh_margin`` seconds before it expires,
+    so request threads read a valid token without blocking. Only when there is
+    no usable token (cold start, or renewal kept failing until expiry) does a
+    caller fetch one, and concurrent callers share that single fetch. After a
+    failed fetch no new attempt is made for ``retry_seconds``, doubling with each
+    further failure up to ``max_retry_seconds``. Renewal is never scheduled
+    sooner than ``min_renew_seconds`` after a fetch, and a token that is already
+    expired when issued counts as a failure, so a bad ``expires_in`` cannot make
+    the renewer spin.
+    """
+
+    def __init__(self, fetch, refresh_margin=300, expiry_skew=30, retry_seconds=15, max_retry_seconds=300,
+                 min_renew_seconds=5, name='oauth'):
+        self._fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.expiry_skew = expiry_skew
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.min_renew_seconds = min_renew_seconds
+        self.name = name
+        # (token, expires_at, renew_at) on the monotonic clock; replaced as a whole so reads need no lock
+        self._state = (None, 0.0, 0.0)
+        self._lock = threading.Lock()
+        self._flight = None
+        self._failed_at = None
+        self._failures = 0
+        self._renewer = None
+        self._wake = threading.Event()
+        self._metrics = {'fetches': 0, 'failures': 0, 'coalesced': 0, 'background_renewals': 0, 'blocking_fetches': 0}
+
+    def _valid_token(self):
+        token, expires_at, _ = self._state
+        return token if token and time.monotonic() < expires_at else None
+
+    def get(self, wait_timeout=30):
+        """Current token, fetching one (once for all callers) only when none is valid"""
+        token = self._valid_token()
+        if token is not None:
+            return token
+        return self._refresh(blocking=True, wait_timeout=wait_timeout)
+
+    def _refresh(self, blocking, wait_timeout=30):
+        with self._lock:
+            if blocking:
+                token = self._valid_token()
+                if token is not None:
+                    return token
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self._retry_delay():
+                # The token endpoint just failed; don't hammer it from every request
+                return self._valid_token()
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = threading.Event()
+                self._metrics['blocking_fetches' if blocking else 'background_renewals'] += 1
+            else:
+                self._metrics['coalesced'] += 1
+
+        if not leader:
+            flight.wait(wait_timeout)
+            return self._valid_token()
+
+        try:
+            self._fetch_now()
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.set()
+        return self._valid_token()
+
+    def _fetch_now(self):
+        try:
+            token, expires_in = self._fetch()
+            if not expires_in > 0:
+                raise ValueError(f"token endpoint returned expires_in={expires_in!r}")
+            now = time.monotonic()
+            expires_at = now + expires_in - min(self.expiry_skew, expires_in / 10)
+            # Renew refresh_margin early, but never in the first half of the token's life
+            # nor sooner than min_renew_seconds
+            renew_at = now + max(expires_in - self.refresh_margin, expires_in / 2, self.min_renew_seconds)
+            self._state = (token, expires_at, renew_at)
+            with self._lock:
+                self._failed_at = None
+                self._failures = 0
+                self._metrics['fetches'] += 1
+            logger.info(f"Obtained {self.name} access token, renewing in {renew_at - now:.0f}s")
+        except Exception as e:
+            with self._lock:
+                self._failed_at = time.monotonic()
+                self._failures += 1
+                self._metrics['failures'] += 1
+                delay = self._retry_delay()
+            logger.error(f"Failed to get {self.name} access token, retrying in {delay:.0f}s: {e}")
+        self._ensure_renewer()
+
+    def _retry_delay(self):
+        """Wait after the latest failure: retry_seconds, doubled per consecutive failure, capped"""
+        return min(self.retry_seconds * 2 ** max(self._failures - 1, 0), self.max_retry_seconds)
+
+    def start(self):
+        """Fetch the first token and keep it renewed in the background"""
+        self._ensure_renewer()
+
+    def _ensure_renewer(self):
+        with self._lock:
+            if self._renewer is not None and self._renewer.is_alive():
+                return
+            self._renewer = threading.Thread(target=self._renew_loop, name=f"{self.name}-token-renewer", daemon=True)
+            self._renewer.start()
+
+    def _renew_loop(self):
+        while True:
+            _, _, renew_at = self._state
+            with self._lock:
+                failed_at = self._failed_at
+                retry_delay = self._retry_delay()
+            now = time.monotonic()
+            due = renew_at if failed_at is None else failed_at + retry_delay
+            if due > now:
+                self._wake.wait(due - now)
+                self._wake.clear()
+                continue
+            self._refresh(blocking=False)
+
+    def invalidate(self):
+        """Drop the current token (e.g. after a 401) and renew it in the background"""
+        self._state = (None, 0.0, 0.0)
+        self._wake.set()
+
+    def stats(self):
+        token, expires_at, renew_at = self._state
+        now = time.monotonic()
+        with self._lock:
+            return dict(
+                self._metrics,
+                valid=bool(token) and now < expires_at,
+                expires_in=round(expires_at - now, 1) if token else None,
+                renews_in=round(renew_at - now, 1) if token else None,
+                consecutive_failures=self._failures,
+                renewer_running=self._renewer is not None and self._renewer.is_alive()
+            )
@@ -0,0 +1,322 @@
+import sys
+import logging
+from itertools import islice
+import numpy as np
+from services.lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+class _DictionaryColumn:
+    """Low-cardinality column stored as integer codes into a list of distinct values"""
+
+    __slots__ = ('codes', 'values', 'lookup')
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+        self.lookup = {value: code for code, value in enumerate(values)}
+
+    @classmethod
+    def from_values(cls, raw_values):
+        values, lookup = [], {}
+        codes = np.empty(len(raw_values), dtype=np.int32)
+        for i, value in enumerate(raw_values):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(values)
+                values.append(sys.intern(value) if isinstance(value, str) else value)
+            codes[i] = code
+        return cls(codes, values)
+
+    def __getitem__(self, row_id):
+        return self.values[self.codes[row_id]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def tolist(self):
+        values = self.values
+        return [values[code] for code in self.codes.tolist()]
+
+    def row_ids(self, value):
+        """Row ids holding value"""
+        code = self.lookup.get(value)
+        return [] if code is None else np.flatnonzero(self.codes == code).tolist()
+
+    def counts(self, exclude=()):
+        """Occurrences of each distinct value, skipping excluded row ids"""
+        codes = self.codes
+        if exclude:
+            mask = np.ones(len(codes), dtype=bool)
+            mask[list(exclude)] = False
+            codes = codes[mask]
+        tally = np.bincount(codes, minlength=len(self.values))
+        return {self.values[code]: int(count) for code, count in enumerate(tally) if count}
+
+
+class _StringColumn:
+    """Text column stored as one UTF-8 buffer plus row offsets.
+
+    Both arrays can be memory-mapped from a model artifact, so every worker on
+    a node shares the same physical pages; values are decoded on access.
+    """
+
+    __slots__ = ('offsets', 'blob')
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __getitem__(self, row_id):
+        return self.blob[self.offsets[row_id]:self.offsets[row_id + 1]].tobytes().decode('utf-8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        text = self.blob.tobytes()
+        bounds = self.offsets.tolist()
+        for start, end in zip(bounds, bounds[1:]):
+            yield text[start:end].decode('utf-8')
+
+    def tolist(self):
+        return list(self)
+
+
+class _AppendedColumn:
+    """A base column plus appended rows, seen as its first ``size`` rows.
+
+    The tail list is shared by every store appended from the same base and only
+    grows, so an append extends it in place instead of copying the column; each
+    view just records how many rows it covers. Appending to a view the tail has
+    already grown past (an older store) copies that view's part of the tail
+    first. Callers serialize appends.
+    """
+
+    __slots__ = ('base', 'tail', 'size')
+
+    def __init__(self, base, tail, size):
+        self.base = base
+        self.tail = tail
+        self.size = size
+
+    def __getitem__(self, row_id):
+        offset = len(self.base)
+        return self.base[row_id] if row_id < offset else self.tail[row_id - offset]
+
+    def __len__(self):
+        return self.size
+
+    def _tail(self):
+        return islice(self.tail, 0, self.size - len(self.base))
+
+    def __iter__(self):
+        yield from self.base
+        yield from self._tail()
+
+    def tolist(self):
+        base = self.base if isinstance(self.base, list) else self.base.tolist()
+        return base + list(self._tail())
+
+    def extended(self, raw_values):
+        """Return a view with values appended; the receiver is unchanged"""
+        used = self.size - len(self.base)
+        tail = self.tail if len(self.tail) == used else self.tail[:used]
+        tail.extend(raw_values)
+        return _AppendedColumn(self.base, tail, self.size + len(raw_values))
+
+    def row_ids(self, value):
+        """Row ids holding value"""
+        offset = len(self.base)
+        if isinstance(self.base, _DictionaryColumn):
+            base_ids = self.base.row_ids(value)
+        else:
+            base_ids = [row_id for row_id, item in enumerate(self.base) if item == value]
+        return base_ids + [row_id for row_id, item in enumerate(self._tail(), offset) if item == value]
+
+    def counts(self, exclude=()):
+        """Occurrences of each distinct value, skipping excluded row ids"""
+        offset = len(self.base)
+        if isinstance(self.base, _DictionaryColumn):
+            tally = self.base.counts([row_id for row_id in exclude if row_id < offset])
+        else:
+            tally = {}
+            for row_id, item in enumerate(self.base):
+                if row_id not in exclude:
+                    tally[item] = tally.get(item, 0) + 1
+        for row_id, item in enumerate(self._tail(), offset):
+            if row_id not in exclude:
+                tally[item] = tally.get(item, 0) + 1
+        return tally
+
+
+class TerminologyRecordStore:
+    """Compact, read-only columnar store of the combined terminology rows.
+
+    Rows are addressed by the same integer row id used by the search and
+    retrieval indexes. Repetitive columns (system, category, ICD-11 fields, ...)
+    are dictionary-encoded into int32 codes. Free-text columns are plain lists
+    when built from a DataFrame and ``_StringColumn`` (UTF-8 offsets + blob,
+    memory-mapped) when loaded from a model artifact. Appending returns a new
+    store so published snapshots never change: every column becomes an
+    ``_AppendedColumn`` whose rows go to shared tails, so it costs the rows
+    added, not the store.
+    """
+
+    __slots__ = ('columns', '_data', 'size')
+
+    # A column is dictionary-encoded when it has at most this share of distinct values
+    DICTIONARY_RATIO = 0.5
+
+    def __init__(self, columns, data, size):
+        self.columns = tuple(columns)
+        self._data = data
+        self.size = size
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build a store from a (NaN-free) DataFrame"""
+        if df is None:
+            return cls((), {}, 0)
+
+        # Duplicate column labels keep the last occurrence, like DataFrame.to_dict('records')
+        columns = list(dict.fromkeys(df.columns))
+        data = {}
+        for name in columns:
+            series = df.loc[:, name]
+            if isinstance(series, pd.DataFrame):
+                series = series.iloc[:, -1]
+            values = series.tolist()
+            if len(values) and len(set(map(repr, values))) <= cls.DICTIONARY_RATIO * len(values):
+                data[name] = _DictionaryColumn.from_values(values)
+            else:
+                data[name] = values
+
+        store = cls(columns, data, len(df))
+        logger.info(f"Record store built: {store.size} records, {len(columns)} columns")
+        return store
+
+    def __len__(self):
+        return self.size
+
+    def has_column(self, name):
+        return name in self._data
+
+    def value(self, row_id, name, default=''):
+        column = self._data.get(name)
+        if column is None:
+            return default
+        return column[row_id]
+
+    def values(self, row_id, names):
+        """Tuple of several field values for one row"""
+        data = self._data
+        return tuple(data[name][row_id] if name in data else '' for name in names)
+
+    def row(self, row_id):
+        """All fields of one row as a dict"""
+        return {name: self._data[name][row_id] for name in self.columns}
+
+    def column(self, name):
+        """Materialize one column as a list"""
+        column = self._data.get(name)
+        if column is None:
+            return [''] * self.size
+        return column.tolist() if isinstance(column, (_DictionaryColumn, _StringColumn, _AppendedColumn)) else list(column)
+
+    def row_ids_where(self, name, value):
+        """Row ids whose field equals value"""
+        column = self._data.get(name)
+        if column is None:
+            return []
+        if isinstance(column, (_DictionaryColumn, _AppendedColumn)):
+            return column.row_ids(value)
+        return [row_id for row_id, item in enumerate(column) if item == value]
+
+    def counts(self, name, exclude=()):
+        """Occurrences of each value of a field, skipping excluded row ids"""
+        column = self._data.get(name)
+        if column is None:
+            return {}
+        if isinstance(column, (_DictionaryColumn, _AppendedColumn)):
+            return column.counts(exclude)
+        tally = {}
+        for row_id, item in enumerate(column):
+            if row_id not in exclude:
+                tally[item] = tally.get(item, 0) + 1
+        return tally
+
+    def to_arrays(self):
+        """Split the store into (schema, arrays) so the arrays can be memory-mapped.
+
+        Dictionary codes and all-text columns become flat numpy arrays; columns
+        with mixed value types stay in the (small, pickled) schema.
+        """
+        schema = {'columns': list(self.columns), 'size': self.size, 'layout': {}}
+        arrays = {}
+        for position, name in enumerate(self.columns):
+            column = self._data[name]
+            prefix = f"col{position}"
+            if isinstance(column, _AppendedColumn):
+                values = column.tolist()
+                column = _DictionaryColumn.from_values(values) if isinstance(column.base, _DictionaryColumn) else values
+            if isinstance(column, _DictionaryColumn):
+                schema['layout'][name] = ('dictionary', column.values)
+                arrays[f"{prefix}_codes"] = column.codes
+            elif isinstance(column, _StringColumn) or all(isinstance(value, str) for value in column):
+                if not isinstance(column, _StringColumn):
+                    column = _StringColumn.from_values(column)
+                schema['layout'][name] = ('string', None)
+                arrays[f"{prefix}_offsets"] = column.offsets
+                arrays[f"{prefix}_blob"] = column.blob
+            else:
+                schema['layout'][name] = ('list', list(column))
+        return schema, arrays
+
+    @classmethod
+    def from_arrays(cls, schema, arrays):
+        """Rebuild a store from to_arrays() output without copying the arrays"""
+        data = {}
+        for position, name in enumerate(schema['columns']):
+            kind, payload = schema['layout'][name]
+            prefix = f"col{position}"
+            if kind == 'dictionary':
+                data[name] = _DictionaryColumn(arrays[f"{prefix}_codes"], payload)
+            elif kind == 'string':
+                data[name] = _StringColumn(arrays[f"{prefix}_offsets"], arrays[f"{prefix}_blob"])
+            else:
+                data[name] = payload
+        return cls(schema['columns'], data, schema['size'])
+
+    def append(self, df):
+        """Return a new store with the DataFrame rows appended after the existing ids"""
+        columns = list(self.columns) + [name for name in dict.fromkeys(df.columns) if name not in self._data]
+        added = len(df)
+        data = {}
+        for name in columns:
+            if name in df.columns:
+                series = df.loc[:, name]
+                if isinstance(series, pd.DataFrame):
+                    series = series.iloc[:, -1]
+                new_values = series.tolist()
+            else:
+                new_values = [''] * added
+
+            existing = self._data.get(name)
+            if existing is None:
+                existing = [''] * self.size
+            if not isinstance(existing, _AppendedColumn):
+                existing = _AppendedColumn(existing, [], self.size)
+            data[name] = existing.extended(new_values)
+
+        return TerminologyRecordStore(columns, data, self.size + added)
@@ -0,0 +1,134 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """Bounded LRU cache with per-entry TTL and single-flight misses.
+
+    ``get_or_compute(key, compute)`` returns a fresh cached value, or runs
+    ``compute()`` once for all concurrent callers of the same key. Whether a
+    computed value is stored is decided by ``cacheable`` (e.g. skip partial
+    results). The least recently used entry is evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=3600, name='cache'):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.name = name
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'coalesced': 0, 'errors': 0}
+
+    def get(self, key):
+        """Fresh cached value or None"""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._metrics['expired'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def _set_locked(self, key, value, ttl=None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics['evictions'] += 1
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Cached value for key, computing it at most once across concurrent callers"""
+        while True:
+            with self._lock:
+                value = self._get_locked(key)
+                if value is not None:
+                    self._metrics['hits'] += 1
+                    return value
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self._metrics['misses'] += 1
+                else:
+                    self._metrics['coalesced'] += 1
+
+            if leader:
+                return self._lead(key, flight, compute, cacheable)
+
+            flight.done.wait()
+            if flight.error is None:
+                return flight.value
+            if isinstance(flight.error, Exception):
+                raise flight.error
+            # The leader was interrupted (KeyboardInterrupt, SystemExit, ...) rather than
+            # failing: that says nothing about the key, so compute it again
+
+    def _lead(self, key, flight, compute, cacheable):
+        """Run compute() for a flight; only a successful result is ever stored"""
+        try:
+            value = compute()
+            store = cacheable is None or cacheable(value)
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                if isinstance(e, Exception):
+                    self._metrics['errors'] += 1
+                del self._flights[key]
+            flight.done.set()
+            raise
+
+        with self._lock:
+            if store:
+                self._set_locked(key, value)
+            del self._flights[key]
+        flight.value = value
+        flight.done.set()
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._metrics['hits'] + self._metrics['misses'] + self._metrics['coalesced']
+            return dict(
+                self._metrics,
+                name=self.name,
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl,
+                in_flight=len(self._flights),
+                hit_ratio=round((self._metrics['hits'] + self._metrics['coalesced']) / lookups, 4) if lookups else 0.0
+            )
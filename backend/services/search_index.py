@@ -0,0 +1,203 @@
+import re
+import copy
+import unicodedata
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Split on whitespace and punctuation only, so Devanagari/Tamil vowel signs and
+# Arabic diacritics stay attached to their letters (\w would break them apart)
+TOKEN_PATTERN = re.compile(
+    r"[^\s!-/:-@\[-`{-~\u00a0-\u00bf\u2010-\u2027\u0964\u0965\u060c\u061b\u061f\u06d4]+"
+)
+
+# Sorts after every character, so [term, term + PREFIX_END) spans all tokens starting with term
+PREFIX_END = '\U0010ffff'
+
+
+def normalize_text(text):
+    """Lowercase and NFC-normalize a value for indexing or querying"""
+    if text is None:
+        return ''
+    return unicodedata.normalize('NFC', str(text)).lower()
+
+
+def tokenize(text):
+    """Split text into normalized search tokens"""
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+
+def _csr(groups):
+    """Sorted keys of a {key: row ids} dict plus (ptr, rows) arrays of their sorted row ids"""
+    keys = sorted(groups)
+    ptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(groups[key]) for key in keys], out=ptr[1:])
+    rows = np.concatenate([np.sort(np.asarray(groups[key], dtype=np.int32)) for key in keys]) if keys else np.zeros(0, dtype=np.int32)
+    return keys, ptr, rows
+
+
+class NAMASTESearchIndex:
+    """Token inverted index over the NAMASTE terminology table.
+
+    Distinct tokens are kept in one sorted array with a posting list of row ids
+    per token (``token_ptr``/``token_rows``, CSR style), so a prefix query is a
+    binary-searched range of tokens instead of a stored prefix table. System
+    membership uses the same layout. Every table is a numpy array, persisted in
+    the model artifact and memory-mapped from it like the TF-IDF matrix.
+    """
+
+    SEARCH_FIELDS = ['term_english', 'term_original', 'description', 'category', 'code']
+
+    def __init__(self, tokens=None, token_ptr=None, token_rows=None,
+                 systems=None, system_ptr=None, system_rows=None):
+        self.tokens = tokens if tokens is not None else np.zeros(0, dtype=str)
+        self.token_ptr = token_ptr if token_ptr is not None else np.zeros(1, dtype=np.int64)
+        self.token_rows = token_rows if token_rows is not None else np.zeros(0, dtype=np.int32)
+        self.systems = systems if systems is not None else np.zeros(0, dtype=str)
+        self.system_ptr = system_ptr if system_ptr is not None else np.zeros(1, dtype=np.int64)
+        self.system_rows = system_rows if system_rows is not None else np.zeros(0, dtype=np.int32)
+        self._system_positions = {str(name): position for position, name in enumerate(self.systems)}
+        # Every indexed row belongs to exactly one system
+        self.row_ids = np.sort(self.system_rows)
+        self.row_count = len(self.row_ids)
+        # Overlay used by with_delta(); the base arrays above are never modified
+        self.delta = None
+        self.delta_rows = {}
+        self.removed = np.zeros(0, dtype=np.int32)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build an index from (row_id, field_values, system) tuples"""
+        postings = {}
+        system_rows = {}
+        for row_id, values, system in rows:
+            tokens = set()
+            for value in values:
+                tokens.update(tokenize(value))
+            for token in tokens:
+                postings.setdefault(token, []).append(row_id)
+            system_rows.setdefault(normalize_text(system) or 'unknown', []).append(row_id)
+
+        tokens, token_ptr, token_rows = _csr(postings)
+        systems, system_ptr, system_rows = _csr(system_rows)
+        return cls(
+            np.array(tokens, dtype=str), token_ptr, token_rows,
+            np.array(systems, dtype=str), system_ptr, system_rows
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        """Build an index from a TerminologyRecordStore"""
+        if records is None or len(records) == 0:
+            return cls()
+
+        columns = [records.column(field) for field in cls.SEARCH_FIELDS]
+        systems = records.column('system') if records.has_column('system') else ['Unknown'] * len(records)
+        index = cls.from_rows(zip(range(len(records)), zip(*columns), systems))
+
+        logger.info(f"Search index built: {len(index.tokens)} tokens over {index.row_count} records")
+        return index
+
+    def to_arrays(self):
+        """Index arrays for persisting alongside the TF-IDF matrix"""
+        return {
+            'search_tokens': self.tokens,
+            'search_token_ptr': self.token_ptr,
+            'search_token_rows': self.token_rows,
+            'search_systems': self.systems,
+            'search_system_ptr': self.system_ptr,
+            'search_system_rows': self.system_rows
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild an index from to_arrays() output without copying the arrays"""
+        return cls(
+            arrays['search_tokens'], arrays['search_token_ptr'], arrays['search_token_rows'],
+            arrays['search_systems'], arrays['search_system_ptr'], arrays['search_system_rows']
+        )
+
+    def with_delta(self, added_rows, removed_row_ids):
+        """Return a new index with rows added/removed, sharing the base arrays.
+
+        ``added_rows`` yields (row_id, field_values, system). Added rows go into a
+        small overlay index rebuilt from the delta rows; removed base rows are
+        masked. The receiver is left unchanged so readers holding it keep a
+        consistent view.
+        """
+        index = copy.copy(self)
+        removed = np.array(sorted(set(removed_row_ids)), dtype=np.int32)
+
+        delta_rows = dict(self.delta_rows)
+        for row_id in removed.tolist():
+            delta_rows.pop(row_id, None)
+        for row_id, values, system in added_rows:
+            delta_rows[row_id] = (values, system)
+
+        index.delta_rows = delta_rows
+        index.delta = NAMASTESearchIndex.from_rows(
+            (row_id, values, system) for row_id, (values, system) in delta_rows.items()
+        ) if delta_rows else None
+        index.removed = np.union1d(self.removed, np.intersect1d(removed, self.row_ids)).astype(np.int32)
+        index.row_count = len(self.row_ids) - len(index.removed) + len(delta_rows)
+        return index
+
+    def _mask(self, rows, delta_rows):
+        """Drop removed base rows and merge in the overlay's matches"""
+        if len(self.removed):
+            rows = np.setdiff1d(rows, self.removed, assume_unique=True)
+        if self.delta is not None:
+            rows = np.union1d(rows, delta_rows(self.delta))
+        return rows
+
+    def _match_term(self, term):
+        """Sorted row ids containing a token that starts with the given query term"""
+        start, end = np.searchsorted(self.tokens, [term, term + PREFIX_END])
+        rows = np.unique(self.token_rows[self.token_ptr[start]:self.token_ptr[end]])
+        return self._mask(rows, lambda delta: delta._match_term(term))
+
+    def _all_rows(self):
+        return self._mask(self.row_ids, lambda delta: delta._all_rows())
+
+    def _rows_for_system(self, system):
+        position = self._system_positions.get(system)
+        rows = (
+            self.system_rows[self.system_ptr[position]:self.system_ptr[position + 1]]
+            if position is not None else np.zeros(0, dtype=np.int32)
+        )
+        return self._mask(rows, lambda delta: delta._rows_for_system(system))
+
+    def _system_filter(self, systems):
+        if systems is None:
+            return None
+        allowed = [self._rows_for_system(normalize_text(system)) for system in systems]
+        return np.unique(np.concatenate(allowed)) if allowed else np.zeros(0, dtype=np.int32)
+
+    def search(self, query, systems=None, limit=10, operator='and'):
+        """Return matching row ids in table order.
+
+        Each query term matches any token it is a prefix of. Terms are combined
+        with AND (default) or OR. An empty query matches every row.
+        """
+        terms = tokenize(query)
+        allowed = self._system_filter(systems)
+
+        if not terms:
+            matches = self._all_rows() if allowed is None else allowed
+        else:
+            term_rows = sorted((self._match_term(term) for term in set(terms)), key=len)
+            if operator == 'or':
+                matches = np.unique(np.concatenate(term_rows))
+            else:
+                # Intersect starting from the rarest term to keep the work small
+                matches = term_rows[0]
+                for rows in term_rows[1:]:
+                    if not len(matches):
+                        break
+                    matches = np.intersect1d(matches, rows, assume_unique=True)
+            if allowed is not None:
+                matches = np.intersect1d(matches, allowed, assume_unique=True)
+
+        # Row id arrays are sorted, so table order is a plain slice
+        return (matches if limit is None else matches[:limit]).tolist()
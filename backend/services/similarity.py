@@ -0,0 +1,70 @@
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TokenSetScorer:
+    """Batch Jaccard similarity over lowercase whitespace token sets.
+
+    Each distinct string is tokenized once into a sorted array of integer token
+    ids (cached, since WHO titles recur across NAMASTE rows). A query is then
+    scored against a whole candidate list with one sorted membership test and
+    a bincount. Scores equal ``len(a & b) / len(a | b)`` on
+    ``str.lower().split()`` sets. The id cache and the vocabulary are reset
+    together once ``max_cached`` strings are held, so both stay bounded.
+    """
+
+    def __init__(self, max_cached=50000):
+        self.max_cached = max_cached
+        self._vocabulary = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _token_ids_locked(self, text):
+        """Sorted unique token ids of a string"""
+        ids = self._cache.get(text)
+        if ids is None:
+            tokens = set(str(text).lower().split())
+            for token in tokens:
+                if token not in self._vocabulary:
+                    self._vocabulary[token] = len(self._vocabulary)
+            ids = self._cache[text] = np.array(sorted(self._vocabulary[token] for token in tokens), dtype=np.int64)
+        return ids
+
+    def _batch_ids(self, query, candidates):
+        """Token ids of a query and its candidates, all from one vocabulary"""
+        with self._lock:
+            if len(self._cache) + len(candidates) + 1 > self.max_cached:
+                # Cheap bound: start over rather than track recency per string. Ids are only
+                # comparable within one vocabulary, so it is reset with the cache, and never mid-batch
+                self._cache.clear()
+                self._vocabulary.clear()
+            return self._token_ids_locked(query), [self._token_ids_locked(text) for text in candidates]
+
+    def scores(self, query, candidates):
+        """Jaccard similarity of one query against each candidate, as a float array"""
+        if not len(candidates):
+            return np.zeros(0)
+        query_ids, arrays = self._batch_ids(query, candidates)
+        sizes = np.fromiter((len(ids) for ids in arrays), dtype=np.int64, count=len(arrays))
+        flat = np.concatenate(arrays)
+        rows = np.repeat(np.arange(len(arrays)), sizes)
+        if not len(query_ids) or not len(flat):
+            return np.zeros(len(candidates))
+        # Membership by binary search in the sorted query ids (cheaper than np.isin on short lists)
+        positions = np.minimum(np.searchsorted(query_ids, flat), len(query_ids) - 1)
+        intersection = np.bincount(rows, weights=query_ids[positions] == flat, minlength=len(candidates))
+        return self._jaccard(intersection, len(query_ids), sizes)
+
+    @staticmethod
+    def _jaccard(intersection, size_a, size_b):
+        union = size_a + size_b - intersection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.where((size_a > 0) & (size_b > 0), intersection / union, 0.0)
+        return result
+
+
+# Global instance
+token_set_scorer = TokenSetScorer()
@@ -0,0 +1,156 @@
+import os
+import numpy as np
+from datetime import datetime
+from services.lazy import LazyModule
+
+sp = LazyModule('scipy.sparse')
+pd = LazyModule('pandas')
+
+
+def source_version(path):
+    """Identity of a resource file's current contents (inode, size, mtime), or None if missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class FileRows:
+    """Data rows of a CSV file left on disk: ``runs`` of [start, stop) positions, read back in chunks"""
+
+    __slots__ = ('path', 'runs')
+
+    def __init__(self, path, runs=()):
+        self.path = path
+        self.runs = [list(run) for run in runs]
+
+    def add(self, position):
+        """Include one more row; positions must be added in ascending order"""
+        if self.runs and self.runs[-1][1] == position:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([position, position + 1])
+
+    def __len__(self):
+        return sum(stop - start for start, stop in self.runs)
+
+    def iter_chunks(self, chunk_rows):
+        """Yield the rows as DataFrames of text cells, at most ``chunk_rows`` file rows read at a time"""
+        if not self.runs:
+            return
+        starts = np.array([start for start, _ in self.runs], dtype=np.int64)
+        stops = np.array([stop for _, stop in self.runs], dtype=np.int64)
+        position = 0
+        for chunk in pd.read_csv(self.path, dtype=str, chunksize=chunk_rows):
+            positions = np.arange(position, position + len(chunk))
+            position += len(chunk)
+            run = np.searchsorted(starts, positions, side='right') - 1
+            keep = (run >= 0) & (positions < stops[np.maximum(run, 0)])
+            if keep.any():
+                yield chunk[keep].reset_index(drop=True)
+            if position >= stops[-1]:
+                return
+
+
+class SourceDelta:
+    """Row-level change a writer made to a system resource CSV.
+
+    Positions refer to the file as it was at ``base_version``: ``removed`` rows
+    were dropped, ``updated`` ({position: raw row dict}) rows were rewritten in
+    place, and ``appended`` rows were added at the end. ``version`` is the
+    file after the write. Raw rows use the CSV's own column names. Appended rows
+    are either a list of row dicts or a ``FileRows`` (e.g. the kept rows of an
+    upload), which is read back a chunk at a time instead of held in memory.
+    """
+
+    __slots__ = ('base_version', 'version', 'removed', 'updated', 'appended')
+
+    def __init__(self, base_version, version, removed=(), updated=None, appended=None):
+        self.base_version = base_version
+        self.version = version
+        self.removed = sorted(set(removed))
+        self.updated = dict(updated or {})
+        self.appended = appended if isinstance(appended, FileRows) else list(appended or [])
+
+    def __len__(self):
+        return len(self.removed) + len(self.updated) + len(self.appended)
+
+    def iter_appended(self, chunk_rows):
+        """Yield the appended rows as DataFrames of at most ``chunk_rows`` rows"""
+        if isinstance(self.appended, FileRows):
+            yield from self.appended.iter_chunks(chunk_rows)
+            return
+        for start in range(0, len(self.appended), chunk_rows):
+            yield pd.DataFrame(self.appended[start:start + chunk_rows])
+
+
+class MappingSnapshot:
+    """Immutable, versioned view of the terminology data, TF-IDF model and indexes.
+
+    Readers take one reference (``snapshot = mapping_service.snapshot``) and use it
+    for the whole request without locking. Writers never modify a published
+    snapshot; they build a new one and swap the service's reference atomically.
+
+    Incremental updates never copy the base TF-IDF matrix: vectors of appended
+    rows go to ``delta_matrix`` (record ids from ``tfidf_matrix.shape[0]`` on)
+    and replaced rows are only listed in ``deleted_rows``. ``sources`` maps each
+    system to (file version, row ids in file order) so a writer's row-level
+    change can be applied by file position.
+    """
+
+    __slots__ = (
+        'version', 'data_hash', 'records', 'vectorizer', 'tfidf_matrix',
+        'search_index', 'fuzzy_index', 'retrieval_index', 'deleted_rows', 'stats', 'created_at',
+        'delta_matrix', 'sources'
+    )
+
+    def __init__(self, version, data_hash=None, records=None, vectorizer=None,
+                 tfidf_matrix=None, search_index=None, fuzzy_index=None, retrieval_index=None,
+                 deleted_rows=frozenset(), stats=None, delta_matrix=None, sources=None):
+        values = {
+            'version': version,
+            'data_hash': data_hash,
+            'records': records,
+            'vectorizer': vectorizer,
+            'tfidf_matrix': tfidf_matrix,
+            'search_index': search_index,
+            'fuzzy_index': fuzzy_index,
+            'retrieval_index': retrieval_index,
+            'deleted_rows': frozenset(deleted_rows),
+            'stats': stats,
+            'created_at': datetime.now(),
+            'delta_matrix': delta_matrix,
+            'sources': dict(sources or {})
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('MappingSnapshot is immutable; publish a new snapshot instead')
+
+    def __delattr__(self, name):
+        raise AttributeError('MappingSnapshot is immutable; publish a new snapshot instead')
+
+    @property
+    def has_data(self):
+        return self.records is not None and len(self.records) > 0
+
+    @property
+    def model_ready(self):
+        return self.vectorizer is not None and self.tfidf_matrix is not None
+
+    @property
+    def active_count(self):
+        """Number of rows not tombstoned by incremental updates"""
+        return 0 if self.records is None else len(self.records) - len(self.deleted_rows)
+
+    def corpus_matrix(self):
+        """TF-IDF vectors of every record id, base rows followed by incrementally appended ones"""
+        if self.delta_matrix is None or self.delta_matrix.shape[0] == 0:
+            return self.tfidf_matrix
+        return sp.vstack([self.tfidf_matrix, self.delta_matrix]).tocsr()
+
+    def deleted_ids(self):
+        """Tombstoned record ids as a sorted array (for masking scores)"""
+        return np.array(sorted(self.deleted_rows), dtype=np.int64)
@@ -0,0 +1,105 @@
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TerminologyStats:
+    """Counters behind /api/stats, kept alongside each data snapshot.
+
+    Counts by system, by category and mapped/unmapped per system are computed
+    once when a snapshot is built and adjusted by the rows an incremental update
+    adds or tombstones. The JSON body and its ETag are rendered at construction,
+    so serving stats is a constant-time lookup; to_state() keeps them in the
+    model artifact so a restored snapshot neither recounts nor re-renders.
+    """
+
+    __slots__ = ('total', 'systems', 'categories', 'mapped', 'body', 'etag')
+
+    def __init__(self, total=0, systems=None, categories=None, mapped=None, body=None, etag=None):
+        self.total = total
+        self.systems = dict(systems or {})
+        self.categories = dict(categories or {})
+        self.mapped = {system: dict(counts) for system, counts in (mapped or {}).items()}
+        self.body = body if body is not None else json.dumps(self.to_dict(), ensure_ascii=False, sort_keys=True)
+        self.etag = etag if etag is not None else hashlib.sha1(self.body.encode('utf-8')).hexdigest()[:20]
+
+    @staticmethod
+    def _row_keys(records, row_id):
+        system, category, icd11_code = records.values(row_id, ('system', 'category', 'icd11_code'))
+        return system, category, 'mapped' if str(icd11_code).strip() else 'unmapped'
+
+    @classmethod
+    def from_records(cls, records, deleted_rows=frozenset()):
+        """Count every live row of a record store"""
+        if records is None:
+            return cls()
+
+        systems = records.counts('system', exclude=deleted_rows)
+        categories = records.counts('category', exclude=deleted_rows) if records.has_column('category') else {}
+        mapped = {}
+        for row_id in range(len(records)):
+            if row_id in deleted_rows:
+                continue
+            system, _, state = cls._row_keys(records, row_id)
+            counts = mapped.setdefault(system, {'mapped': 0, 'unmapped': 0})
+            counts[state] += 1
+
+        return cls(len(records) - len(deleted_rows), systems, categories, mapped)
+
+    def with_delta(self, records, added_row_ids, removed_row_ids):
+        """Return new stats with rows counted in and out; ``records`` must hold both sets"""
+        systems = dict(self.systems)
+        categories = dict(self.categories)
+        mapped = {system: dict(counts) for system, counts in self.mapped.items()}
+        has_category = records.has_column('category')
+
+        def adjust(row_id, step):
+            system, category, state = self._row_keys(records, row_id)
+            systems[system] = systems.get(system, 0) + step
+            if has_category:
+                categories[category] = categories.get(category, 0) + step
+            counts = mapped.setdefault(system, {'mapped': 0, 'unmapped': 0})
+            counts[state] += step
+
+        removed = list(removed_row_ids)
+        added = list(added_row_ids)
+        for row_id in removed:
+            adjust(row_id, -1)
+        for row_id in added:
+            adjust(row_id, 1)
+
+        # Drop emptied buckets so the output matches a full recount
+        systems = {key: count for key, count in systems.items() if count}
+        categories = {key: count for key, count in categories.items() if count}
+        mapped = {key: counts for key, counts in mapped.items() if counts['mapped'] or counts['unmapped']}
+        return TerminologyStats(self.total + len(added) - len(removed), systems, categories, mapped)
+
+    def to_state(self):
+        """Counters plus the rendered body and ETag; TerminologyStats(**state) restores them as is"""
+        return {
+            'total': self.total,
+            'systems': self.systems,
+            'categories': self.categories,
+            'mapped': self.mapped,
+            'body': self.body,
+            'etag': self.etag
+        }
+
+    def to_dict(self):
+        mapped_total = sum(counts['mapped'] for counts in self.mapped.values())
+        return {
+            'total_codes': self.total,
+            'systems': {
+                'ayurveda': self.systems.get('Ayurveda', 0),
+                'siddha': self.systems.get('Siddha', 0),
+                'unani': self.systems.get('Unani', 0)
+            },
+            'categories': self.categories,
+            'mapping': {
+                'mapped': mapped_total,
+                'unmapped': self.total - mapped_total,
+                'by_system': {str(system).lower(): counts for system, counts in self.mapped.items()}
+            }
+        }
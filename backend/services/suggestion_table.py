@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from services.who_icd11_service import who_service
+from services.result_cache import SingleFlightCache
+
+logger = logging.getLogger(__name__)
+
+
+class ICD11SuggestionTable:
+    """Precomputed ICD-11 mapping suggestions keyed by NAMASTE system and code.
+
+    The table is built offline (``build``) and persisted as JSON, so request
+    paths enrich results with an in-memory lookup instead of calling the WHO
+    API per row. With lazy refresh enabled (opt-in), missing or stale entries
+    are recomputed by a small background pool while the stale value is served.
+    Concurrent refreshes of one entry, from lazy refresh or a build, share a
+    single WHO call, and at most one background build runs at a time.
+    """
+
+    def __init__(self, path='cache/icd11_suggestions.json', max_age_hours=24 * 7,
+                 lazy_refresh=False, refresh_workers=2, save_interval=30):
+        self.path = path
+        self.max_age = max_age_hours * 3600
+        self.lazy_refresh = lazy_refresh
+        self.refresh_workers = refresh_workers
+        self.save_interval = save_interval
+        self.entries = {}
+        self.built_at = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._build_thread = None
+        # Used only to coalesce refreshes; results live in self.entries
+        self._flights = SingleFlightCache(name='icd11-suggestions')
+        self._executor = None
+        self._dirty = False
+        self._last_save = time.time()
+        self.load()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def key(system, code):
+        # Codes are only unique within a system (e.g. DIS exists in Ayurveda and Siddha)
+        return f"{str(system).lower()}:{code}"
+
+    def load(self):
+        """Load the persisted table, if any"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+            self.built_at = data.get('built_at')
+            logger.info(f"Loaded {len(self.entries)} precomputed ICD-11 suggestions from {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load ICD-11 suggestion table: {e}")
+            return False
+
+    def save(self):
+        """Persist the table atomically"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with self._lock:
+                snapshot = dict(self.entries)
+                self._dirty = False
+                self._last_save = time.time()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'built_at': self.built_at, 'entries': snapshot}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save ICD-11 suggestion table: {e}")
+            return False
+
+    def flush(self):
+        if self._dirty:
+            self.save()
+
+    def _is_stale(self, entry, term):
+        return entry.get('term') != term or time.time() - entry.get('updated_at', 0) > self.max_age
+
+    def lookup(self, system, code, term):
+        """Suggestions for a NAMASTE code from memory; never calls the WHO API inline"""
+        key = self.key(system, code)
+        entry = self.entries.get(key)
+
+        if entry is None or self._is_stale(entry, term):
+            if self.lazy_refresh:
+                self.refresh_async(system, code, term)
+            if entry is None:
+                return []
+
+        return entry['suggestions']
+
+    def refresh(self, system, code, term):
+        """Recompute one entry from the WHO service; concurrent refreshes of it share one call"""
+        key = self.key(system, code)
+        return self._flights.get_or_compute(
+            (key, term), lambda: self._recompute(key, code, term), cacheable=lambda suggestions: False
+        )
+
+    def _recompute(self, key, code, term):
+        suggestions = who_service.get_mapping_suggestions(term, code)
+        with self._lock:
+            self.entries[key] = {
+                'term': term,
+                'suggestions': suggestions,
+                'updated_at': time.time()
+            }
+            self._dirty = True
+        return suggestions
+
+    def refresh_async(self, system, code, term):
+        """Queue a background refresh unless one is already pending for this code"""
+        key = self.key(system, code)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix='icd11-suggest')
+        self._executor.submit(self._refresh_task, key, system, code, term)
+
+    def _refresh_task(self, key, system, code, term):
+        try:
+            self.refresh(system, code, term)
+        except Exception as e:
+            logger.warning(f"Background suggestion refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                due = self._dirty and time.time() - self._last_save > self.save_interval
+            if due:
+                self.save()
+
+    def build(self, rows, force=False, save_every=200):
+        """Offline build: compute suggestions for (system, code, term) rows that are missing or stale"""
+        started = time.time()
+        refreshed = skipped = failed = 0
+
+        for system, code, term in rows:
+            entry = self.entries.get(self.key(system, code))
+            if not force and entry is not None and not self._is_stale(entry, term):
+                skipped += 1
+                continue
+            try:
+                self.refresh(system, code, term)
+                refreshed += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Failed to build suggestions for {system}:{code}: {e}")
+            if refreshed and refreshed % save_every == 0:
+                self.save()
+
+        self.built_at = datetime.now().isoformat()
+        self.save()
+        elapsed = time.time() - started
+        logger.info(f"ICD-11 suggestion table built: {refreshed} refreshed, {skipped} fresh, {failed} failed in {elapsed:.1f}s")
+        return {'refreshed': refreshed, 'skipped': skipped, 'failed': failed, 'seconds': round(elapsed, 2)}
+
+    def build_async(self, rows, force=False):
+        """Run build() in a background thread; False if a background build is already running"""
+        # Checked and started under the lock, like refresh_async, so two callers cannot both start one
+        with self._lock:
+            if self.building:
+                return False
+            self._build_thread = threading.Thread(
+                target=self.build, args=(rows,), kwargs={'force': force},
+                name='icd11-suggestion-build', daemon=True
+            )
+            self._build_thread.start()
+        return True
+
+    @property
+    def building(self):
+        return self._build_thread is not None and self._build_thread.is_alive()
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'built_at': self.built_at,
+            'building': self.building,
+            'pending_refreshes': len(self._refreshing),
+            'in_flight': self._flights.stats()['in_flight'],
+            'lazy_refresh': self.lazy_refresh
+        }
+
+
+# Global instance
+suggestion_table = ICD11SuggestionTable(
+    lazy_refresh=os.getenv('ICD11_SUGGESTIONS_LAZY_REFRESH', 'false').lower() == 'true'
+)
@@ -0,0 +1,150 @@
+import copy
+import heapq
+import logging
+import numpy as np
+from services.lazy import LazyModule
+
+sp = LazyModule('scipy.sparse')
+
+logger = logging.getLogger(__name__)
+
+
+class ImpactOrderedIndex:
+    """Exact top-k cosine retrieval over TF-IDF weights using impact-ordered postings.
+
+    Each term keeps its postings sorted by descending weight. A query walks its
+    term lists in lockstep and scores every newly seen document exactly (the
+    document row is read from the CSR matrix). The sum of the query-weighted
+    frontier impacts bounds the score of any document not seen yet, so the walk
+    stops as soon as that bound cannot beat the current k-th best score
+    (threshold/MaxScore-style early termination). Documents that share no term
+    with the query are never touched.
+    """
+
+    def __init__(self, tfidf_matrix):
+        matrix = tfidf_matrix.tocsr()
+        matrix.sort_indices()
+        self.doc_matrix = matrix
+
+        by_term = matrix.tocsc()
+        by_term.sort_indices()
+        self.term_ptr = by_term.indptr
+        self.term_docs = np.empty_like(by_term.indices)
+        self.term_weights = np.empty_like(by_term.data)
+
+        # Reorder every posting list by descending impact (weight)
+        for term in range(by_term.shape[1]):
+            start, end = by_term.indptr[term], by_term.indptr[term + 1]
+            if start == end:
+                continue
+            order = np.argsort(-by_term.data[start:end], kind='stable')
+            self.term_docs[start:end] = by_term.indices[start:end][order]
+            self.term_weights[start:end] = by_term.data[start:end][order]
+
+        self.num_docs = matrix.shape[0]
+        # Incremental updates: small brute-force segment for appended rows plus tombstones
+        self.delta_matrix = None
+        self.delta_doc_ids = np.array([], dtype=np.int64)
+        self.deleted = frozenset()
+        logger.info(f"Impact-ordered index built: {by_term.shape[1]} terms over {self.num_docs} documents")
+
+    def to_arrays(self):
+        """Posting arrays for persisting alongside the TF-IDF matrix"""
+        return {
+            'postings_ptr': self.term_ptr,
+            'postings_docs': self.term_docs,
+            'postings_weights': self.term_weights
+        }
+
+    @classmethod
+    def from_arrays(cls, doc_matrix, arrays):
+        """Wrap persisted (possibly memory-mapped) postings without re-sorting anything"""
+        index = cls.__new__(cls)
+        index.doc_matrix = doc_matrix
+        index.term_ptr = arrays['postings_ptr']
+        index.term_docs = arrays['postings_docs']
+        index.term_weights = arrays['postings_weights']
+        index.num_docs = doc_matrix.shape[0]
+        index.delta_matrix = None
+        index.delta_doc_ids = np.array([], dtype=np.int64)
+        index.deleted = frozenset()
+        return index
+
+    def with_delta(self, added_vectors, added_doc_ids, removed_doc_ids):
+        """Return a new index with rows appended and/or removed, sharing the base postings"""
+        index = copy.copy(self)
+        if added_vectors is not None and added_vectors.shape[0] > 0:
+            added_vectors = sp.csr_matrix(added_vectors)
+            index.delta_matrix = added_vectors if self.delta_matrix is None else sp.vstack([self.delta_matrix, added_vectors]).tocsr()
+            index.delta_doc_ids = np.concatenate([self.delta_doc_ids, np.asarray(added_doc_ids, dtype=np.int64)])
+        index.deleted = self.deleted | frozenset(int(doc) for doc in removed_doc_ids)
+        return index
+
+    def _score(self, doc, query_terms, query_weights):
+        """Exact dot product of one document row with the query vector"""
+        start, end = self.doc_matrix.indptr[doc], self.doc_matrix.indptr[doc + 1]
+        if start == end:
+            return 0.0
+        doc_terms = self.doc_matrix.indices[start:end]
+        positions = np.minimum(np.searchsorted(doc_terms, query_terms), len(doc_terms) - 1)
+        hits = doc_terms[positions] == query_terms
+        if not hits.any():
+            return 0.0
+        return float(np.dot(self.doc_matrix.data[start:end][positions[hits]], query_weights[hits]))
+
+    def top_k(self, query_vector, k=3, threshold=0.0):
+        """Return [(doc_index, score)] for the k best documents scoring above threshold"""
+        if k <= 0 or query_vector.nnz == 0:
+            return []
+
+        query = query_vector.tocsr()
+        order = np.argsort(query.indices)
+        query_terms = query.indices[order]
+        query_weights = query.data[order]
+
+        cursors = [int(self.term_ptr[term]) for term in query_terms]
+        ends = [int(self.term_ptr[term + 1]) for term in query_terms]
+
+        heap = []      # min-heap of (score, -doc) holding the current best k
+        seen = set()
+
+        def offer(doc, score):
+            if score <= threshold:
+                return
+            entry = (score, -doc)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        # Rows added since the postings were built are few, so score them exhaustively first
+        if self.delta_matrix is not None:
+            delta_scores = (self.delta_matrix @ query.T).toarray().ravel()
+            for doc, score in zip(self.delta_doc_ids, delta_scores):
+                if int(doc) not in self.deleted:
+                    offer(int(doc), float(score))
+
+        while True:
+            # Bound on any unseen document: every list contributes at most its frontier impact
+            upper_bound = 0.0
+            for i, term_weight in enumerate(query_weights):
+                if cursors[i] < ends[i]:
+                    upper_bound += term_weight * self.term_weights[cursors[i]]
+
+            if upper_bound <= threshold:
+                break
+            if len(heap) == k and upper_bound <= heap[0][0]:
+                break
+
+            for i in range(len(query_terms)):
+                if cursors[i] >= ends[i]:
+                    continue
+                doc = int(self.term_docs[cursors[i]])
+                cursors[i] += 1
+                if doc in seen or doc in self.deleted:
+                    continue
+                seen.add(doc)
+
+                offer(doc, self._score(doc, query_terms, query_weights))
+
+        return [(-neg_doc, score) for score, neg_doc in sorted(heap, reverse=True)]
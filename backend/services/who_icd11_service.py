@@ -1,9 +1,22 @@
-import requests
 import json
 import os
-from datetime import datetime, timedelta
+import time
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
 import logging
 from dotenv import load_dotenv
+from services.http_transport import HTTPTransport
+from services.result_cache import SingleFlightCache
+from services.local_cache import LocalResponseCache
+from services.icd11_mirror import ICD11Mirror, MIRRORED_LINEARIZATIONS
+from services.lazy import LazyService
+from services.oauth_token import RenewingToken
+from services.similarity import token_set_scorer
+
+# Firestore is the cross-node tier; the client is only built when first consulted
+firebase_service = LazyService('services.firebase_service', 'firebase_service')
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,192 +27,365 @@ class WHOIcd11Service:
     def __init__(self):
         self.client_id = os.getenv('WHO_ICD11_CLIENT_ID')
         self.client_secret = os.getenv('WHO_ICD11_CLIENT_SECRET')
-        self.base_url = "https://id.who.int/icd"
-        self.token_url = "https://icdaccessmanagement.who.int/connect/token"
+        # Overridable to point at a proxy or the local stand-in (who_standin.py)
+        self.base_url = os.getenv('WHO_API_BASE_URL', "https://id.who.int/icd").rstrip('/')
+        self.token_url = os.getenv('WHO_TOKEN_URL', "https://icdaccessmanagement.who.int/connect/token")
         self.release_id = "2023-01"
-        self.access_token = None
-        self.token_expires = None
         
+        # Deadline for a whole fan-out search; per-call timeouts live in the transport
+        self.search_deadline = float(os.getenv('WHO_SEARCH_DEADLINE', '8'))
+        
+        # Keep-alive connections shared by every call, sized for concurrent fan-outs
+        pool_size = int(os.getenv('WHO_POOL_SIZE', '16'))
+        default_timeout = (
+            float(os.getenv('WHO_CONNECT_TIMEOUT', '3.05')),
+            float(os.getenv('WHO_READ_TIMEOUT', '10'))
+        )
+        self.transport = HTTPTransport(
+            timeouts={
+                'token': default_timeout,
+                'search': (default_timeout[0], 8.0),
+                'entity': default_timeout,
+                'sync': (default_timeout[0], 30.0),
+                'mirror': default_timeout
+            },
+            default_timeout=default_timeout,
+            pool_size=pool_size,
+            max_retries=int(os.getenv('WHO_MAX_RETRIES', '3')),
+            backoff_base=float(os.getenv('WHO_BACKOFF_BASE', '0.25')),
+            env_prefix='WHO'
+        )
+        self.search_cache = SingleFlightCache(
+            max_entries=int(os.getenv('WHO_CACHE_SIZE', '2048')),
+            ttl_seconds=float(os.getenv('WHO_CACHE_TTL', '3600')),
+            name='who-search'
+        )
+        # Node-local persistent tier shared by every worker; survives restarts
+        self.local_cache = None
+        if os.getenv('WHO_LOCAL_CACHE', 'true').lower() == 'true':
+            self.local_cache = LocalResponseCache(
+                path=os.getenv('WHO_LOCAL_CACHE_PATH', 'cache/who_responses.sqlite3'),
+                max_bytes=int(float(os.getenv('WHO_LOCAL_CACHE_MB', '64')) * 1024 * 1024),
+                fresh_seconds=float(os.getenv('WHO_LOCAL_CACHE_FRESH', '3600')),
+                stale_seconds=float(os.getenv('WHO_LOCAL_CACHE_STALE', str(7 * 24 * 3600)))
+            )
+        # Shared Firestore tier behind the local cache (cross-node, one network round trip)
+        self.firestore_cache = os.getenv('WHO_FIRESTORE_CACHE', 'true').lower() == 'true'
+        self.firestore_cache_hours = float(os.getenv('WHO_FIRESTORE_CACHE_HOURS', '24'))
+        self._search_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='who-search')
+        # Stale-while-revalidate refreshes run apart from the search fan-out pool
+        self._revalidate_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='who-revalidate')
+        self._revalidating = set()
+        self._revalidate_lock = threading.Lock()
+        # One token fetch per renewal period, rotated ahead of expiry off the request path
+        self.token = RenewingToken(
+            self._request_token,
+            refresh_margin=float(os.getenv('WHO_TOKEN_REFRESH_MARGIN', '300')),
+            retry_seconds=float(os.getenv('WHO_TOKEN_RETRY_SECONDS', '15')),
+            max_retry_seconds=float(os.getenv('WHO_TOKEN_RETRY_MAX_SECONDS', '300')),
+            name='who-icd11'
+        )
+        if self.credentials_configured():
+            self.token.start()
+        # Offline TM2/MMS mirror; once synced, searches and entity lookups never leave the node
+        self.mirror = ICD11Mirror(
+            directory=os.getenv('WHO_MIRROR_DIR', 'cache/icd11_mirror'),
+            release_id=self.release_id
+        )
+        self.mirror_enabled = os.getenv('WHO_MIRROR', 'true').lower() == 'true'
+        self.mirror_workers = int(os.getenv('WHO_MIRROR_WORKERS', '8'))
+        self._mirror_thread = None
+        self._mirror_start_lock = threading.Lock()
+        
+    def credentials_configured(self):
+        return bool(self.client_id and self.client_secret and self.client_id != 'your_client_id_here')
+    
     def get_access_token(self):
-        """Get OAuth2 access token from WHO ICD-11 API"""
-        if self.access_token and self.token_expires and datetime.now() < self.token_expires:
-            return self.access_token
-            
-        try:
-            payload = {
-                'client_id': self.client_id,
-                'client_secret': self.client_secret,
-                'scope': 'icdapi_access',
-                'grant_type': 'client_credentials'
-            }
-            
-            headers = {
-                'Content-Type': 'application/x-www-form-urlencoded'
-            }
-            
-            response = requests.post(self.token_url, data=payload, headers=headers)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            self.access_token = token_data['access_token']
-            # Token expires in 1 hour, refresh 5 minutes early
-            self.token_expires = datetime.now() + timedelta(seconds=token_data['expires_in'] - 300)
+        """Get OAuth2 access token from WHO ICD-11 API (renewed in the background)"""
+        if not self.credentials_configured():
+            return None
+        return self.token.get()
+    
+    def _request_token(self):
+        payload = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'scope': 'icdapi_access',
+            'grant_type': 'client_credentials'
+        }
+        
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+        
+        response = self.transport.post(self.token_url, endpoint='token', data=payload, headers=headers)
+        response.raise_for_status()
+        
+        token_data = response.json()
+        return token_data['access_token'], token_data['expires_in']
+    
+    def _raise_for_status(self, response):
+        if response.status_code == 401:
+            # Revoked or rotated upstream: renew in the background instead of on every request
+            self.token.invalidate()
+        response.raise_for_status()
+    
+    def _api_headers(self, token):
+        return {
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/json',
+            'API-Version': 'v2',
+            'Accept-Language': 'en'
+        }
+    
+    @staticmethod
+    def _parse_search_entities(data, system):
+        """Flatten a WHO search response into result dicts"""
+        results = []
+        for entity in data.get('destinationEntities', []):
+            # Handle different title formats
+            title = ''
+            if isinstance(entity.get('title'), dict):
+                title = entity.get('title', {}).get('@value', '')
+            elif isinstance(entity.get('title'), str):
+                title = entity.get('title', '')
             
-            logger.info("Successfully obtained WHO ICD-11 access token")
-            return self.access_token
+            # Handle different definition formats
+            definition = ''
+            if isinstance(entity.get('definition'), dict):
+                definition = entity.get('definition', {}).get('@value', '')
+            elif isinstance(entity.get('definition'), str):
+                definition = entity.get('definition', '')
             
-        except Exception as e:
-            logger.error(f"Failed to get WHO ICD-11 access token: {e}")
-            return None
+            results.append({
+                'code': entity.get('theCode', ''),
+                'title': title,
+                'definition': definition,
+                'system': system,
+                # Search hits name their URI 'id' (entity documents use '@id')
+                'uri': entity.get('id') or entity.get('@id', '')
+            })
+        return results
+    
+    def _search_linearization(self, url, query, headers, system):
+        """One search call on the pooled transport"""
+        response = self.transport.get(
+            url,
+            endpoint='search',
+            params={'q': query, 'useFuzzy': 'true', 'flatResults': 'true'},
+            headers=headers
+        )
+        self._raise_for_status(response)
+        return self._parse_search_entities(response.json(), system)
     
     def search_icd11_codes(self, query, include_tm2=True):
         """Search ICD-11 codes including TM2"""
+        return self.search_icd11_codes_detailed(query, include_tm2)['results']
+    
+    def search_icd11_codes_detailed(self, query, include_tm2=True, deadline=None):
+        """Search Foundation, TM2 and MMS concurrently, returning whatever finished within the deadline.
+        
+        Returns {'results', 'partial', 'sources'} where sources reports the status,
+        result count and latency of each endpoint.
+        """
+        mirrored = self._search_mirror(query, include_tm2)
+        if mirrored is not None:
+            return mirrored
+        
         # Check if credentials are available
-        if not self.client_id or not self.client_secret or self.client_id == 'your_client_id_here':
+        if not self.credentials_configured():
             logger.info("WHO ICD-11 credentials not configured, using mock data")
-            return self._get_mock_icd11_results(query)
-            
+            return {'results': self._get_mock_icd11_results(query), 'partial': False, 'sources': {}}
+        
+        # Identical searches from search, auto-map and suggestions share one upstream call
+        key = self.search_cache_key(query, include_tm2)
+        search = self.search_cache.get_or_compute(
+            key,
+            lambda: self._search_local_tier(key, query, include_tm2, deadline),
+            cacheable=self._search_cacheable
+        )
+        # Callers get their own result dicts; the cached ones stay untouched
+        return dict(search, results=[dict(result) for result in search['results']])
+    
+    def _search_mirror(self, query, include_tm2):
+        """Serve a search from the offline mirror when every linearization it needs is synced"""
+        linearizations = ('tm2', 'mms') if include_tm2 else ('mms',)
+        if not self.mirror_enabled or not all(self.mirror.is_complete(name) for name in linearizations):
+            return None
+        try:
+            started = time.perf_counter()
+            results = self.mirror.search(query, linearizations)
+            return {
+                'results': results,
+                'partial': False,
+                'sources': {'mirror': {'status': 'ok', 'count': len(results), 'ms': round((time.perf_counter() - started) * 1000, 1)}}
+            }
+        except Exception as e:
+            logger.warning(f"Mirror search failed, falling back to WHO API: {e}")
+            return None
+    
+    def search_cache_key(self, query, include_tm2=True):
+        """Cache key: normalized query, linearization set and release"""
+        normalized = ' '.join(unicodedata.normalize('NFC', str(query)).lower().split())
+        linearizations = ('foundation', 'tm2', 'mms') if include_tm2 else ('foundation', 'mms')
+        return (normalized, linearizations, self.release_id)
+    
+    @staticmethod
+    def _search_cacheable(search):
+        # Partial and mock-fallback results are served but never cached
+        return bool(search['sources']) and not search['partial']
+    
+    def _search_local_tier(self, key, query, include_tm2, deadline):
+        """Search through the node-local cache, revalidating stale hits in the background"""
+        if self.local_cache is None:
+            return self._search_firestore_tier(key, query, include_tm2, deadline)
+        
+        local_key = json.dumps(key, ensure_ascii=False)
+        cached, state = self.local_cache.get('search', local_key)
+        if cached is not None:
+            if state == 'stale':
+                self._revalidate(('search', local_key), lambda: self._refresh_search(key, local_key, query, include_tm2))
+            return cached
+        
+        search = self._search_firestore_tier(key, query, include_tm2, deadline)
+        if self._search_cacheable(search):
+            self.local_cache.set('search', local_key, search)
+        return search
+    
+    def _search_firestore_tier(self, key, query, include_tm2, deadline):
+        """Search through the shared Firestore cache, writing fresh upstream results back to it"""
+        if self.firestore_cache:
+            results = firebase_service.get_cached_icd_results(query, release_id=self.release_id, linearizations=list(key[1]))
+            if results is not None:
+                return {'results': results, 'partial': False, 'sources': {'firestore': {'status': 'cached', 'count': len(results)}}}
+        
+        search = self._search_upstream(query, include_tm2, deadline)
+        self._store_firestore(key, query, search)
+        return search
+    
+    def _store_firestore(self, key, query, search):
+        if self.firestore_cache and self._search_cacheable(search):
+            # Off the request path: the write is a network round trip
+            self._revalidate_pool.submit(
+                firebase_service.cache_icd_search_results, query, search['results'], self.firestore_cache_hours,
+                release_id=self.release_id, linearizations=list(key[1])
+            )
+    
+    def _refresh_search(self, key, local_key, query, include_tm2):
+        search = self._search_upstream(query, include_tm2, None)
+        if self._search_cacheable(search):
+            self.local_cache.set('search', local_key, search)
+            self.search_cache.set(key, search)
+            self._store_firestore(key, query, search)
+    
+    def _revalidate(self, key, refresh):
+        """Run refresh() once in the background for a stale entry"""
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        
+        def run():
+            try:
+                refresh()
+            except Exception as e:
+                logger.warning(f"Background revalidation of {key[0]} {key[1]} failed: {e}")
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(key)
+        
+        self._revalidate_pool.submit(run)
+    
+    def _search_upstream(self, query, include_tm2, deadline):
         token = self.get_access_token()
         if not token:
             logger.info("Failed to get access token, using mock data")
-            return self._get_mock_icd11_results(query)
+            return {'results': self._get_mock_icd11_results(query), 'partial': False, 'sources': {}}
             
         try:
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Accept': 'application/json',
-                'API-Version': 'v2',
-                'Accept-Language': 'en'
-            }
+            headers = self._api_headers(token)
             
-            results = []
+            # Foundation (general ICD-11 terms), TM2 (Traditional Medicine), MMS (Biomedicine)
+            searches = [('foundation', f"{self.base_url}/entity/search", 'ICD-11 Foundation')]
+            if include_tm2:
+                searches.append(('tm2', f"{self.base_url}/release/11/{self.release_id}/tm2/search", 'TM2'))
+            searches.append(('mms', f"{self.base_url}/release/11/{self.release_id}/mms/search", 'ICD-11 MMS'))
             
-            # 1. Search Foundation API (general ICD-11 terms)
-            try:
-                foundation_url = f"{self.base_url}/entity/search?q={query}&useFuzzy=true&flatResults=true"
-                response = requests.get(foundation_url, headers=headers)
-                response.raise_for_status()
-                
-                data = response.json()
-                if 'destinationEntities' in data:
-                    for entity in data['destinationEntities']:
-                        # Handle different title formats
-                        title = ''
-                        if isinstance(entity.get('title'), dict):
-                            title = entity.get('title', {}).get('@value', '')
-                        elif isinstance(entity.get('title'), str):
-                            title = entity.get('title', '')
-                        
-                        # Handle different definition formats
-                        definition = ''
-                        if isinstance(entity.get('definition'), dict):
-                            definition = entity.get('definition', {}).get('@value', '')
-                        elif isinstance(entity.get('definition'), str):
-                            definition = entity.get('definition', '')
-                        
-                        results.append({
-                            'code': entity.get('theCode', ''),
-                            'title': title,
-                            'definition': definition,
-                            'system': 'ICD-11 Foundation',
-                            'uri': entity.get('@id', '')
-                        })
-            except Exception as e:
-                logger.warning(f"Foundation search failed: {e}")
+            started = time.perf_counter()
+            finished = {}
+            futures = {}
+            for name, url, system in searches:
+                future = self._search_pool.submit(self._search_linearization, url, query, headers, system)
+                future.add_done_callback(lambda _, name=name: finished.__setitem__(name, time.perf_counter()))
+                futures[name] = future
+            done, _ = wait(futures.values(), timeout=self.search_deadline if deadline is None else deadline)
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
             
-            # 2. Search TM2 Linearization (Traditional Medicine)
-            if include_tm2:
+            # Merge in the fixed Foundation, TM2, MMS order regardless of completion order
+            results = []
+            sources = {}
+            partial = False
+            for name, future in futures.items():
+                if future not in done:
+                    # Late calls finish on the pool and are discarded
+                    future.cancel()
+                    partial = True
+                    sources[name] = {'status': 'timeout', 'count': 0, 'ms': elapsed_ms}
+                    logger.warning(f"{name} search missed the {elapsed_ms}ms deadline, returning partial results")
+                    continue
                 try:
-                    tm2_url = f"{self.base_url}/release/11/{self.release_id}/tm2/search?q={query}&useFuzzy=true&flatResults=true"
-                    response = requests.get(tm2_url, headers=headers)
-                    response.raise_for_status()
-                    
-                    data = response.json()
-                    if 'destinationEntities' in data:
-                        for entity in data['destinationEntities']:
-                            # Handle different title formats
-                            title = ''
-                            if isinstance(entity.get('title'), dict):
-                                title = entity.get('title', {}).get('@value', '')
-                            elif isinstance(entity.get('title'), str):
-                                title = entity.get('title', '')
-                            
-                            # Handle different definition formats
-                            definition = ''
-                            if isinstance(entity.get('definition'), dict):
-                                definition = entity.get('definition', {}).get('@value', '')
-                            elif isinstance(entity.get('definition'), str):
-                                definition = entity.get('definition', '')
-                            
-                            results.append({
-                                'code': entity.get('theCode', ''),
-                                'title': title,
-                                'definition': definition,
-                                'system': 'TM2',
-                                'uri': entity.get('@id', '')
-                            })
+                    found = future.result()
+                    results.extend(found)
+                    sources[name] = {'status': 'ok', 'count': len(found), 'ms': round((finished.get(name, time.perf_counter()) - started) * 1000, 1)}
                 except Exception as e:
-                    logger.warning(f"TM2 search failed: {e}")
+                    partial = True
+                    sources[name] = {'status': 'error', 'count': 0, 'ms': round((finished.get(name, time.perf_counter()) - started) * 1000, 1), 'error': str(e)}
+                    logger.warning(f"{name} search failed: {e}")
             
-            # 3. Search MMS Linearization (Biomedicine)
-            try:
-                mms_url = f"{self.base_url}/release/11/{self.release_id}/mms/search?q={query}&useFuzzy=true&flatResults=true"
-                response = requests.get(mms_url, headers=headers)
-                response.raise_for_status()
-                
-                data = response.json()
-                if 'destinationEntities' in data:
-                    for entity in data['destinationEntities']:
-                        # Handle different title formats
-                        title = ''
-                        if isinstance(entity.get('title'), dict):
-                            title = entity.get('title', {}).get('@value', '')
-                        elif isinstance(entity.get('title'), str):
-                            title = entity.get('title', '')
-                        
-                        # Handle different definition formats
-                        definition = ''
-                        if isinstance(entity.get('definition'), dict):
-                            definition = entity.get('definition', {}).get('@value', '')
-                        elif isinstance(entity.get('definition'), str):
-                            definition = entity.get('definition', '')
-                        
-                        results.append({
-                            'code': entity.get('theCode', ''),
-                            'title': title,
-                            'definition': definition,
-                            'system': 'ICD-11 MMS',
-                            'uri': entity.get('@id', '')
-                        })
-            except Exception as e:
-                logger.warning(f"MMS search failed: {e}")
-            
-            return results
+            return {'results': results, 'partial': partial, 'sources': sources}
             
         except Exception as e:
             logger.error(f"Failed to search ICD-11 codes: {e}")
             # Return mock ICD-11 results for demonstration
-            return self._get_mock_icd11_results(query)
+            return {'results': self._get_mock_icd11_results(query), 'partial': False, 'sources': {}}
     
     def get_icd11_entity(self, entity_id):
         """Get detailed information about an ICD-11 entity"""
+        if self.mirror_enabled:
+            try:
+                entity = self.mirror.get_entity(entity_id, 'mms')
+                if entity is not None:
+                    return entity
+            except Exception as e:
+                logger.warning(f"Mirror lookup of {entity_id} failed: {e}")
+        
+        if self.local_cache is None:
+            return self._fetch_icd11_entity(entity_id)
+        
+        local_key = str(entity_id)
+        cached, state = self.local_cache.get('entity', local_key)
+        if cached is not None:
+            if state == 'stale':
+                self._revalidate(('entity', local_key), lambda: self._fetch_icd11_entity(entity_id))
+            return cached
+        return self._fetch_icd11_entity(entity_id)
+    
+    def _fetch_icd11_entity(self, entity_id):
         token = self.get_access_token()
         if not token:
             return None
             
         try:
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Accept': 'application/json',
-                'API-Version': 'v2',
-                'Accept-Language': 'en'
-            }
+            headers = self._api_headers(token)
             
-            url = f"{self.base_url}/release/11/2023-01/mms/{entity_id}"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
+            url = f"{self.base_url}/release/11/{self.release_id}/mms/{entity_id}"
+            response = self.transport.get(url, endpoint='entity', headers=headers)
+            self._raise_for_status(response)
             
-            return response.json()
+            entity = response.json()
+            if self.local_cache is not None:
+                self.local_cache.set('entity', str(entity_id), entity)
+            return entity
             
         except Exception as e:
             logger.error(f"Failed to get ICD-11 entity {entity_id}: {e}")
@@ -212,17 +398,12 @@ class WHOIcd11Service:
             return False
             
         try:
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Accept': 'application/json',
-                'API-Version': 'v2',
-                'Accept-Language': 'en'
-            }
+            headers = self._api_headers(token)
             
             # Get TM2 root categories
-            url = f"{self.base_url}/release/11/2023-01/tm2"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
+            url = f"{self.base_url}/release/11/{self.release_id}/tm2"
+            response = self.transport.get(url, endpoint='sync', headers=headers)
+            self._raise_for_status(response)
             
             tm2_data = response.json()
             
@@ -243,16 +424,54 @@ class WHOIcd11Service:
             logger.error(f"Failed to sync TM2 codes: {e}")
             return False
     
+    def sync_icd11_mirror(self, linearizations=('tm2', 'mms'), restart=False, workers=None):
+        """Walk the TM2/MMS trees into the offline mirror; resumes an interrupted sync"""
+        if not self.get_access_token():
+            logger.error("Cannot sync ICD-11 mirror without WHO API credentials")
+            return None
+        
+        unknown = set(linearizations) - set(MIRRORED_LINEARIZATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported linearizations: {', '.join(sorted(unknown))}")
+        
+        def fetch(uri):
+            # Child links use the canonical http://id.who.int host; the token is re-read so long walks survive renewal
+            url = uri.replace('http://id.who.int/icd', self.base_url, 1)
+            response = self.transport.get(url, endpoint='mirror', headers=self._api_headers(self.get_access_token()))
+            self._raise_for_status(response)
+            return response.json()
+        
+        summary = self.mirror.sync(fetch, self.base_url, linearizations, workers=workers or self.mirror_workers, restart=restart)
+        logger.info(f"ICD-11 mirror sync finished: {summary}")
+        return summary
+    
+    def start_mirror_sync(self, linearizations=('tm2', 'mms'), restart=False):
+        """Run sync_icd11_mirror in a background thread; False if a sync is already running"""
+        unknown = set(linearizations) - set(MIRRORED_LINEARIZATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported linearizations: {', '.join(sorted(unknown))}")
+        
+        # The check and the start happen under one lock so two requests cannot both start a walk
+        with self._mirror_start_lock:
+            if (self._mirror_thread is not None and self._mirror_thread.is_alive()) or self.mirror.status()['syncing']:
+                return False
+            self._mirror_thread = threading.Thread(
+                target=self.sync_icd11_mirror, args=(tuple(linearizations),), kwargs={'restart': restart},
+                name='icd11-mirror-sync', daemon=True
+            )
+            self._mirror_thread.start()
+        return True
+    
     def get_mapping_suggestions(self, namaste_term, namaste_code):
         """Get ICD-11 mapping suggestions for NAMASTE term"""
         # Search for similar terms in ICD-11
         search_results = self.search_icd11_codes(namaste_term)
         
+        # Score every hit in one pass (simplified token-set similarity)
+        similarities = token_set_scorer.scores(namaste_term, [result['title'] for result in search_results])
+        
         suggestions = []
-        for result in search_results:
-            # Calculate similarity score (simplified)
-            similarity = self._calculate_similarity(namaste_term, result['title'])
-            
+        for result, similarity in zip(search_results, similarities.tolist()):
             if similarity > 0.3:  # Minimum threshold
                 suggestions.append({
                     'icd11_code': result['code'],
@@ -269,19 +488,6 @@ class WHOIcd11Service:
         
         return sorted(suggestions, key=lambda x: x['confidence'], reverse=True)[:3]
     
-    def _calculate_similarity(self, term1, term2):
-        """Simple similarity calculation (can be enhanced with ML)"""
-        term1_words = set(term1.lower().split())
-        term2_words = set(term2.lower().split())
-        
-        if not term1_words or not term2_words:
-            return 0
-        
-        intersection = term1_words.intersection(term2_words)
-        union = term1_words.union(term2_words)
-        
-        return len(intersection) / len(union)
-    
     def _get_mock_mapping_suggestions(self, namaste_term, namaste_code):
         """Get mock mapping suggestions for demonstration"""
         term_lower = namaste_term.lower()
@@ -331,8 +537,8 @@ class WHOIcd11Service:
         
         # Filter suggestions based on term similarity
         filtered_suggestions = []
-        for suggestion in mock_suggestions:
-            similarity = self._calculate_similarity(namaste_term, suggestion['icd11_term'])
+        similarities = token_set_scorer.scores(namaste_term, [suggestion['icd11_term'] for suggestion in mock_suggestions])
+        for suggestion, similarity in zip(mock_suggestions, similarities.tolist()):
             if similarity > 0.1:  # Lower threshold for mock data
                 suggestion['confidence'] = min(95, int(similarity * 100))
                 filtered_suggestions.append(suggestion)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Offline job that mirrors the ICD-11 TM2 and MMS linearizations into a local store
+"""
+
+import os
+import sys
+import argparse
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.who_icd11_service import who_service
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync the offline ICD-11 TM2/MMS mirror (resumes interrupted runs)')
+    parser.add_argument('--linearization', action='append', choices=['tm2', 'mms'],
+                        help='Only sync this linearization (repeatable); default both')
+    parser.add_argument('--workers', type=int, help='Concurrent WHO requests (default WHO_MIRROR_WORKERS)')
+    parser.add_argument('--restart', action='store_true', help='Discard previous progress and walk from the root')
+    args = parser.parse_args()
+    
+    linearizations = tuple(args.linearization or ['tm2', 'mms'])
+    print(f"Syncing ICD-11 {', '.join(linearizations)} for release {who_service.release_id}...")
+    summary = who_service.sync_icd11_mirror(linearizations, restart=args.restart, workers=args.workers)
+    if summary is None:
+        print("❌ WHO ICD-11 credentials are not configured")
+        sys.exit(1)
+    
+    for name in linearizations:
+        result = summary[name]
+        state = 'complete' if result['complete'] else f"{result['remaining']} not done, rerun to resume"
+        print(f"✅ {name}: fetched {result['fetched']}, failed {result['failed']} ({state})")
+    print(f"   Saved to {who_service.mirror.path} in {summary['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Auto-map jobs write back only their own mappings when the resource changed while they ran
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pandas as pd
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import services.auto_map_jobs as auto_map_jobs_module
+from services.auto_map_jobs import AutoMapJobManager
+from services.csv_processor import csv_processor
+from services.snapshot import source_version
+
+COLUMNS = ['code', 'term_original', 'term_english', 'description', 'category', 'icd11_code', 'icd11_term']
+
+
+class BlockingLookups:
+    """Stands in for the WHO service; lookups wait until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get_mapping_suggestions(self, term, code):
+        self.started.set()
+        assert self.release.wait(10)
+        return [{'icd11_code': f"M-{code}", 'icd11_term': f"mapped {term}", 'confidence': 95}]
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def wait_for(manager, job_id, states=('completed', 'failed', 'cancelled')):
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in states:
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def lookups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(csv_processor.resources_folder)
+    os.makedirs(csv_processor.upload_folder)
+    lookups = BlockingLookups()
+    monkeypatch.setattr(auto_map_jobs_module, 'who_service', lookups)
+    return lookups
+
+
+def test_upload_during_job_keeps_both_changes(lookups, tmp_path):
+    resource_path = csv_processor.resource_path('ayurveda')
+    write_csv(resource_path, [
+        ['A1', 'a1', 'vata', 'd', 'Vata', '', ''],
+        ['A2', 'a2', 'fever', 'd', 'Jvara', '', ''],
+        ['A3', 'a3', 'cough', 'd', 'Kasa', 'CA42', 'Cough'],
+    ])
+    deltas = []
+
+    def finalize(df, path, system_type, mapped_rows):
+        deltas.append(csv_processor.save_mapping_frame(df, path, mapped_rows))
+        return {'total_records': len(df)}
+
+    manager = AutoMapJobManager(directory=str(tmp_path / 'jobs'))
+    job, started = manager.submit('ayurveda', finalize, workers=2)
+    assert started
+    assert lookups.started.wait(10)
+
+    # The job has loaded its frame; an upload maps A2 itself and adds A4
+    upload_path = os.path.join(csv_processor.upload_folder, 'upload.csv')
+    write_csv(upload_path, [
+        ['A2', 'a2', 'fever (revised)', 'd', 'Jvara', 'UP00', 'Uploaded mapping'],
+        ['A4', 'a4', 'rash', 'd', 'Twak', '', ''],
+    ])
+    _, last_rows, _ = csv_processor.scan_upload(upload_path, 'ayurveda')
+    _, upload_delta = csv_processor.merge_with_existing_data(upload_path, last_rows, 'ayurveda')
+
+    lookups.release.set()
+    assert wait_for(manager, job['id'])['status'] == 'completed'
+
+    merged = pd.read_csv(resource_path, dtype=str).set_index('code')
+    assert list(merged.index) == ['A1', 'A3', 'A2', 'A4']
+    assert merged.loc['A1', 'icd11_code'] == 'M-A1'
+    assert merged.loc['A2', ['term_english', 'icd11_code']].tolist() == ['fever (revised)', 'UP00']
+    assert merged.loc['A3', 'icd11_code'] == 'CA42'
+    assert pd.isna(merged.loc['A4', 'icd11_code'])
+
+    # The delta is made against the file the upload produced, naming only A1
+    delta = deltas[0]
+    assert delta.base_version == upload_delta.version
+    assert delta.version == source_version(resource_path)
+    assert list(delta.updated) == [0]
+    assert delta.updated[0]['icd11_code'] == 'M-A1'
+
+
+def test_unchanged_resource_is_written_from_the_frame(lookups, tmp_path):
+    resource_path = csv_processor.resource_path('siddha')
+    write_csv(resource_path, [['S1', 's1', 'kapha', 'd', 'Kapha', '', ''], ['S2', 's2', 'pain', 'd', 'Vali', '', '']])
+    lookups.release.set()
+    deltas = []
+
+    def finalize(df, path, system_type, mapped_rows):
+        deltas.append(csv_processor.save_mapping_frame(df, path, mapped_rows))
+        return {'total_records': len(df)}
+
+    manager = AutoMapJobManager(directory=str(tmp_path / 'jobs'))
+    job, _ = manager.submit('siddha', finalize)
+    assert wait_for(manager, job['id'])['status'] == 'completed'
+
+    merged = pd.read_csv(resource_path, dtype=str)
+    assert merged['icd11_code'].tolist() == ['M-S1', 'M-S2']
+    assert sorted(deltas[0].updated) == [0, 1]
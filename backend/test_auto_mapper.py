@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+AutoMapper: one lookup per query_key group, at most `workers` lookups in flight, cancel stops new lookups
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pandas as pd
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.auto_mapper import AutoMapper, query_key
+
+COLUMNS = ['code', 'term_english', 'icd11_code', 'icd11_term']
+
+
+class RecordingLookups:
+    """suggest(term, code) that records calls and the peak number running at once"""
+
+    def __init__(self, delay=0.0, gate=None):
+        self.delay = delay
+        self.gate = gate
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, term, code):
+        with self.lock:
+            self.calls.append((term, code))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if self.gate is not None:
+                assert self.gate.wait(10)
+            time.sleep(self.delay)
+            return [{'icd11_code': f"M-{code}", 'icd11_term': f"mapped {term}", 'confidence': 95}]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def frame(terms):
+    return pd.DataFrame(
+        [[f"C{number}", term, '', ''] for number, term in enumerate(terms)], columns=COLUMNS
+    )
+
+
+def test_query_key_folds_spelling_variants():
+    assert query_key('Vāta') == query_key('vata') == query_key('VAATA') == 'vata'
+    assert query_key('vyAdhi-viniScayaH') == query_key('vyadhi  viniscayah') == 'vyadhi viniscayah'
+    assert query_key('pittaja') == query_key('pitaja')
+    assert query_key('') is None and query_key('  ') is None and query_key(None) is None
+    # Native-script marks are kept
+    assert query_key('वात') != query_key('वत')
+
+
+def test_duplicate_terms_share_one_lookup():
+    terms = ['Vāta', 'fever', 'vata', '', 'VAATA', 'vyAdhi-viniScayaH', 'Fever', 'vyadhi viniscayah', ' ']
+    df = frame(terms)
+    lookups = RecordingLookups()
+    results = {}
+
+    df, mapped = AutoMapper(workers=3, dedupe=True, rate_limiter=None).run(
+        df, lookups, on_result=lambda index, mapping, failed: results.setdefault(index, mapping)
+    )
+
+    # One call per distinct key, with the first row's term and code; blank terms are never merged
+    assert sorted(lookups.calls) == sorted([('Vāta', 'C0'), ('fever', 'C1'), ('', 'C3'), ('vyAdhi-viniScayaH', 'C5'), (' ', 'C8')])
+    assert mapped == len(terms)
+    assert df['icd11_code'].tolist() == ['M-C0', 'M-C1', 'M-C0', 'M-C3', 'M-C0', 'M-C5', 'M-C1', 'M-C5', 'M-C8']
+    assert results[4] == ('M-C0', 'mapped Vāta')
+    assert len(results) == len(terms)
+
+
+def test_without_dedupe_every_row_is_looked_up():
+    df = frame(['vata', 'Vata', 'vata'])
+    lookups = RecordingLookups()
+
+    AutoMapper(workers=2, dedupe=False, rate_limiter=None).run(df, lookups)
+    assert sorted(lookups.calls) == [('Vata', 'C1'), ('vata', 'C0'), ('vata', 'C2')]
+
+
+def test_lookups_in_flight_never_exceed_workers():
+    df = frame([f"term {number}" for number in range(40)])
+    lookups = RecordingLookups(delay=0.01)
+    progress = []
+
+    df, mapped = AutoMapper(workers=4, rate_limiter=None).run(df, lookups, progress=progress.append)
+
+    assert len(lookups.calls) == 40 and mapped == 40
+    assert lookups.peak == 4
+    assert progress[-1]['lookups'] == 40 and progress[-1]['processed'] == 40
+
+
+def test_cancel_stops_new_lookups():
+    df = frame([f"term {number}" for number in range(20)])
+    gate = threading.Event()
+    lookups = RecordingLookups(gate=gate)
+    cancel = threading.Event()
+    outcome = {}
+
+    runner = threading.Thread(
+        target=lambda: outcome.update(result=AutoMapper(workers=3, rate_limiter=None).run(df, lookups, cancel=cancel))
+    )
+    runner.start()
+    deadline = time.time() + 10
+    while len(lookups.calls) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    # Three lookups are in flight; cancel, then let them finish
+    cancel.set()
+    gate.set()
+    runner.join(10)
+
+    df, mapped = outcome['result']
+    assert len(lookups.calls) == 3
+    # Lookups already in flight are applied
+    assert mapped == 3
+    assert (df['icd11_code'] != '').sum() == 3
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Chunked upload merge: same result as merging both files in memory, plus the matching SourceDelta
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.csv_processor import CSVProcessor
+from services.snapshot import FileRows, source_version
+
+COLUMNS = ['code', 'term_original', 'term_english', 'description', 'category', 'icd11_code', 'icd11_term']
+
+EXISTING = [
+    ['A1', 'a1', 'fever', 'd', 'Jvara', 'BA00', 'Mapped'],
+    ['A2', 'a2', 'cough', 'd', 'Kasa', '', ''],
+    ['', 'x', 'no code one', 'd', 'Kasa', '', ''],
+    ['A3', 'a3', 'headache', 'd', 'Shiro', '', ''],
+    ['A2', 'a2', 'cough again', 'd', 'Kasa', 'CA00', 'Mapped'],
+    ['', 'y', 'no code two', 'd', '', '', ''],
+    ['A4', 'a4', 'joint pain', 'd', 'Vata', '', ''],
+]
+
+UPLOAD = [
+    ['A3', 'n3', 'new headache', 'd', 'Shiro', 'MB00', 'Mapped'],
+    ['B1', 'b1', 'rash', 'd', 'Twak', '', ''],
+    ['B1', 'b1', 'rash again', 'd', 'Twak', '', ''],
+    ['A1', 'n1', 'new fever', 'd', 'Jvara', '', ''],
+    ['B2', 'b2', 'ulcer', 'd', 'Twak', 'DA00', 'Mapped'],
+]
+
+
+def write_csv(path, rows, columns=COLUMNS):
+    pd.DataFrame(rows, columns=COLUMNS)[columns].to_csv(path, index=False)
+
+
+def expected_merge(existing_path, upload_path):
+    """The in-memory reference: concatenate, keep the last row of each code and every row without one"""
+    combined = pd.concat([pd.read_csv(existing_path, dtype=str), pd.read_csv(upload_path, dtype=str)], ignore_index=True)
+    keep = combined['code'].isna() | ~combined['code'].duplicated(keep='last')
+    return combined[keep].reset_index(drop=True)
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return lambda chunk_rows: CSVProcessor(chunk_rows=chunk_rows)
+
+
+def merge(processor, chunk_rows, upload_columns=COLUMNS):
+    csv = processor(chunk_rows)
+    resource_path = csv.resource_path('ayurveda')
+    upload_path = os.path.join(csv.upload_folder, 'upload.csv')
+    write_csv(resource_path, EXISTING)
+    write_csv(upload_path, UPLOAD, upload_columns)
+    expected = expected_merge(resource_path, upload_path)
+    base_version = source_version(resource_path)
+
+    validation, last_rows, row_count = csv.scan_upload(upload_path, 'ayurveda')
+    assert validation == {'valid': True}
+    assert row_count == len(UPLOAD)
+    report, delta = csv.merge_with_existing_data(upload_path, last_rows, 'ayurveda')
+    return csv, resource_path, expected, base_version, report, delta
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 3, 1000])
+def test_chunked_merge_matches_in_memory_merge(processor, chunk_rows):
+    _, resource_path, expected, _, report, _ = merge(processor, chunk_rows)
+    merged = pd.read_csv(resource_path, dtype=str)
+
+    pd.testing.assert_frame_equal(merged, expected)
+    assert merged['code'].dropna().tolist() == ['A2', 'A4', 'A3', 'B1', 'A1', 'B2']
+    assert merged['term_english'].tolist()[-3:] == ['rash again', 'new fever', 'ulcer']
+    assert merged['code'].isna().sum() == 2
+
+    assert report['total_records'] == len(expected)
+    assert report['mapped_records'] == int(expected['icd11_code'].notna().sum())
+    assert report['categories'] == expected['category'].value_counts().to_dict()
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4])
+def test_merge_delta_positions(processor, chunk_rows):
+    _, resource_path, expected, base_version, _, delta = merge(processor, chunk_rows)
+
+    assert delta.base_version == base_version
+    assert delta.version == source_version(resource_path)
+    # A1 and A3 are superseded by the upload, the first A2 by the later existing one
+    assert sorted(delta.removed) == [0, 1, 3]
+    assert not delta.updated
+    # Kept upload rows are referenced in the upload file, not copied
+    assert isinstance(delta.appended, FileRows)
+    assert delta.appended.runs == [[0, 1], [2, 5]]
+    appended = pd.concat(delta.iter_appended(chunk_rows), ignore_index=True)
+    assert appended['code'].tolist() == ['A3', 'B1', 'A1', 'B2']
+    pd.testing.assert_frame_equal(appended, expected.iloc[-len(delta.appended):].reset_index(drop=True))
+
+
+def test_merge_with_reordered_upload_columns(processor):
+    upload_columns = list(reversed(COLUMNS))
+    _, resource_path, expected, _, _, delta = merge(processor, 2, upload_columns)
+
+    merged = pd.read_csv(resource_path, dtype=str)
+    assert list(merged.columns) == COLUMNS
+    pd.testing.assert_frame_equal(merged, expected[COLUMNS])
+    appended = pd.concat(delta.iter_appended(2), ignore_index=True)
+    pd.testing.assert_frame_equal(appended[COLUMNS], expected[COLUMNS].iloc[-len(delta.appended):].reset_index(drop=True))
+
+
+def test_iter_records_yields_text_without_nan(processor):
+    csv, resource_path, expected, _, _, _ = merge(processor, 3)
+
+    batches = list(csv.iter_records('ayurveda', batch_rows=2))
+    assert [len(batch) for batch in batches] == [2, 2, 2, 2]
+    records = [record for batch in batches for record in batch]
+    assert len(records) == len(expected)
+    assert all(isinstance(value, str) for record in records for value in record.values())
+    assert records[0]['code'] == '' and records[0]['term_english'] == 'no code one'
+    assert records[-1]['icd11_code'] == 'DA00'
+
+
+def test_concurrent_merges_keep_every_upload(processor):
+    csv = processor(2)
+    resource_path = csv.resource_path('ayurveda')
+    write_csv(resource_path, EXISTING)
+    version = source_version(resource_path)
+    uploads = []
+    for number in range(6):
+        upload_path = os.path.join(csv.upload_folder, f"upload-{number}.csv")
+        write_csv(upload_path, [[f"C{number}", 'c', f"term {number}", 'd', 'Twak', '', '']])
+        uploads.append(upload_path)
+
+    def run(upload_path):
+        _, last_rows, _ = csv.scan_upload(upload_path, 'ayurveda')
+        return csv.merge_with_existing_data(upload_path, last_rows, 'ayurveda')[1]
+
+    with ThreadPoolExecutor(max_workers=len(uploads)) as pool:
+        deltas = list(pool.map(run, uploads))
+
+    merged = pd.read_csv(resource_path, dtype=str)
+    assert sorted(merged['code'].dropna())[-6:] == [f"C{number}" for number in range(6)]
+    # The first merge also drops the superseded existing A2
+    assert len(merged) == len(EXISTING) - 1 + len(uploads)
+    # Serialized rewrites: each delta starts from the version the previous one produced
+    versions = {delta.base_version: delta.version for delta in deltas}
+    for _ in deltas:
+        version = versions[version]
+    assert version == source_version(resource_path)
+    assert not [name for name in os.listdir('resources') if name.endswith('.tmp')]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Native-script fuzzy search must return exactly the brute-force substring Levenshtein matches
+"""
+
+import os
+import sys
+import copy
+import random
+
+import numpy as np
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.fuzzy_index import NativeScriptFuzzyIndex, detect_script, normalize_native, substring_distance, trigrams
+
+ALPHABETS = {
+    'devanagari': 'कखगघचजटडतदनपबमयरलवशसहािीुूेैोौंः्',
+    'tamil': 'கஙசஞடணதநபமயரலவழளறனாிீுூெேைொோ்',
+    'arabic': 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي',
+}
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def reference_distance(query, text):
+    """Fewest edits turning query into any substring of text, by trying every substring"""
+    return min(levenshtein(query, text[start:end]) for start in range(len(text) + 1) for end in range(start, len(text) + 1))
+
+
+def effective_distance(query):
+    """The edit bound search() applies: the default, capped so one trigram must still be shared"""
+    query = normalize_native(query)
+    return max(0, min(NativeScriptFuzzyIndex.default_distance(query), (len(trigrams(query)) - 1) // 3))
+
+
+class Table:
+    """Normalized terms of every row as a padded code-point matrix, for a vectorized brute-force scan"""
+
+    def __init__(self, rows):
+        self.row_ids = np.array([row_id for row_id, _, _ in rows], dtype=np.int64)
+        self.systems = np.array([str(system).lower() for _, _, system in rows])
+        terms = [normalize_native(term) for _, term, _ in rows]
+        self.lengths = np.array([len(term) for term in terms])
+        self.codes = np.full((len(terms), max(self.lengths, default=0)), -1, dtype=np.int64)
+        for position, term in enumerate(terms):
+            self.codes[position, :len(term)] = [ord(char) for char in term]
+
+    def without(self, row_ids):
+        """The table minus the given rows"""
+        keep = ~np.isin(self.row_ids, list(row_ids))
+        table = copy.copy(self)
+        table.row_ids, table.systems, table.lengths, table.codes = (
+            self.row_ids[keep], self.systems[keep], self.lengths[keep], self.codes[keep]
+        )
+        return table
+
+    def distances(self, query):
+        """Semi-global edit distance of the query against every term at once (free start and end in the term)"""
+        query = np.array([ord(char) for char in query])
+        previous = np.tile(np.arange(len(query) + 1), (len(self.codes), 1))
+        best = previous[:, -1].copy()
+        for position in range(self.codes.shape[1]):
+            chars = self.codes[:, position]
+            current = np.zeros_like(previous)
+            for j in range(1, len(query) + 1):
+                current[:, j] = np.minimum(np.minimum(previous[:, j] + 1, current[:, j - 1] + 1),
+                                           previous[:, j - 1] + (chars != query[j - 1]))
+            active = position < self.lengths
+            best = np.where(active, np.minimum(best, current[:, -1]), best)
+            previous = np.where(active[:, None], current, previous)
+        return best
+
+
+def brute_force(table, query, systems=None, distances=None):
+    """Every row within the edit bound, scanning all terms: [(row_id, edits)] by edits then row id"""
+    if distances is None:
+        distances = table.distances(normalize_native(query))
+    keep = distances <= effective_distance(query)
+    if systems is not None:
+        keep &= np.isin(table.systems, [str(system).lower() for system in systems])
+    return sorted(zip(table.row_ids[keep].tolist(), distances[keep].tolist()), key=lambda match: (match[1], match[0]))
+
+
+def misspell(term, rng, edits):
+    """Query from a slice of a real term with random substitutions, insertions and deletions"""
+    start = rng.randrange(max(1, len(term) - 8))
+    query = list(term[start:start + rng.randint(5, 12)])
+    alphabet = ALPHABETS.get(detect_script(term), 'abcdefghijklmnopqrstuvwxyz')
+    for _ in range(edits):
+        position = rng.randrange(len(query))
+        operation = rng.choice('sid')
+        if operation == 's':
+            query[position] = rng.choice(alphabet)
+        elif operation == 'i':
+            query.insert(position, rng.choice(alphabet))
+        elif len(query) > 4:
+            del query[position]
+    return ''.join(query)
+
+
+@pytest.fixture(scope='module')
+def records(app_module):
+    return app_module.mapping_service.peek_snapshot().records
+
+
+@pytest.fixture(scope='module')
+def terms(records):
+    return Table(list(zip(range(len(records)), records.column('term_original'), records.column('system'))))
+
+
+@pytest.fixture(scope='module')
+def queries(records):
+    rng = random.Random(7)
+    by_script = {}
+    for term in records.column('term_original'):
+        normalized = normalize_native(term)
+        if len(normalized) >= 6:
+            by_script.setdefault(detect_script(normalized), []).append(normalized)
+    assert {'devanagari', 'tamil', 'arabic'} <= set(by_script)
+    return [
+        misspell(term, rng, edits)
+        for script in ('devanagari', 'tamil', 'arabic')
+        for term in rng.sample(by_script[script], 10)
+        for edits in (0, 1, 2)
+    ]
+
+
+def test_substring_distance_matches_every_substring_levenshtein():
+    rng = random.Random(3)
+    for alphabet in ALPHABETS.values():
+        for _ in range(150):
+            text = ''.join(rng.choice(alphabet[:8]) for _ in range(rng.randint(0, 12)))
+            query = ''.join(rng.choice(alphabet[:8]) for _ in range(rng.randint(1, 6)))
+            expected = reference_distance(query, text)
+            for bound in (0, 1, 2, 3):
+                assert substring_distance(query, text, bound) == (expected if expected <= bound else None), (query, text)
+
+
+def test_search_matches_brute_force(records, terms, queries):
+    index = NativeScriptFuzzyIndex.from_records(records)
+    found = 0
+    for query in queries:
+        distances = terms.distances(normalize_native(query))
+        for systems in (None, ['ayurveda'], ['Siddha', 'UNANI'], []):
+            expected = brute_force(terms, query, systems, distances)
+            assert index.search(query, systems=systems, limit=None) == expected, (query, systems)
+        found += bool(brute_force(terms, query, distances=distances))
+    # Most queries are edited slices of real terms, so they should mostly match something
+    assert found > len(queries) // 2
+
+
+def test_delta_matches_brute_force(records, terms, queries):
+    index = NativeScriptFuzzyIndex.from_records(records)
+    rng = random.Random(11)
+    removed = set(rng.sample(range(len(records)), len(records) // 5))
+    sources = [term for term in records.column('term_original') if term]
+    added = [(len(records) + offset, misspell(term, rng, 1), 'Siddha') for offset, term in enumerate(rng.sample(sources, 40))]
+
+    updated = index.with_delta(added[:20], sorted(removed)[:100]).with_delta(added[20:], sorted(removed)[100:])
+    live, appended = terms.without(removed), Table(added)
+    for query in queries:
+        expected = sorted(brute_force(live, query) + brute_force(appended, query), key=lambda match: (match[1], match[0]))
+        assert updated.search(query, limit=None) == expected, query
+    # The base index is unchanged
+    assert index.search(queries[0], limit=None) == brute_force(terms, queries[0])
+
+
+def test_short_and_latin_queries():
+    index = NativeScriptFuzzyIndex.from_rows([(0, 'वातव्याधि', 'Ayurveda'), (1, 'vatavyadhi', 'Ayurveda')])
+
+    assert index.search('वा') == []
+    assert index.search('वातव्याधी') == [(0, 1)]
+    assert index.search('vatavyadi') == [(1, 1)]
+    assert NativeScriptFuzzyIndex().search('वातव्याधि') == []
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+ICD-11 mirror sync against the WHO stand-in: breadth-first walk, resume after an interruption, retries
+"""
+
+import os
+import sys
+import argparse
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.icd11_mirror import ICD11Mirror
+from who_standin import CANONICAL_BASE, StandIn
+
+
+class Interrupted(BaseException):
+    """Stands in for the process being stopped mid-sync"""
+
+
+class StandInFetch:
+    """fetch(uri) served by the stand-in's routing, with scripted failures and interruptions"""
+
+    def __init__(self):
+        args = argparse.Namespace(
+            release='2023-01', scale=1, latency=0, jitter=0, endpoint_latency=None, error_rate=0,
+            rate_limit=0, seed=0, replay=None, strict=False
+        )
+        self.standin = StandIn(args)
+        self.failures = {}
+        self.interrupt_after = None
+        self.fetched = []
+
+    def __call__(self, uri):
+        if self.interrupt_after is not None and len(self.fetched) >= self.interrupt_after:
+            raise Interrupted()
+        if self.failures.get(uri, 0):
+            self.failures[uri] -= 1
+            raise RuntimeError(f"503 for {uri}")
+        status, body = self.standin.api_response(uri[len(CANONICAL_BASE):], {})
+        if status != 200:
+            raise RuntimeError(f"{status} for {uri}")
+        self.fetched.append(uri)
+        return body
+
+    def entities(self, linearization):
+        return self.standin.corpus.entities[linearization]
+
+    def depths(self, linearization):
+        """Tree depth of every entity URI, root 0"""
+        entities = {entity['@id']: entity for entity in self.entities(linearization).values()}
+        depths = {}
+        for uri, entity in entities.items():
+            depth, parents = 0, entity['parent']
+            while parents:
+                depth, parents = depth + 1, entities[parents[0]]['parent']
+            depths[uri] = depth
+        return depths
+
+    def uri(self, linearization, entity_id):
+        return self.entities(linearization)[entity_id]['@id']
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    return ICD11Mirror(directory=str(tmp_path))
+
+
+@pytest.fixture
+def fetch():
+    return StandInFetch()
+
+
+def assert_breadth_first(fetch, linearization):
+    depths = fetch.depths(linearization)
+    order = [depths[uri] for uri in fetch.fetched if uri in depths]
+    assert order == sorted(order)
+
+
+def test_full_sync_is_breadth_first_and_serves_entities(mirror, fetch):
+    summary = mirror.sync(fetch, CANONICAL_BASE, workers=1)
+
+    for linearization in ('tm2', 'mms'):
+        total = len(fetch.entities(linearization))
+        assert summary[linearization] == {'fetched': total, 'failed': 0, 'retried': 0, 'remaining': 0, 'complete': True}
+        assert mirror.status()['linearizations'][linearization]['entities'] == total
+    assert_breadth_first(fetch, 'tm2')
+    assert mirror.get_entity('3000', 'mms')['title']['@value'] == 'Diabetes mellitus'
+    assert {result['code'] for result in mirror.search('vata joint', linearizations=('tm2',))} >= {'SD00'}
+
+
+def test_interrupted_sync_resumes_breadth_first(mirror, fetch, tmp_path):
+    fetch.interrupt_after = 30
+    with pytest.raises(Interrupted):
+        mirror.sync(fetch, CANONICAL_BASE, linearizations=('tm2',), workers=1, commit_every=7)
+    first_run = list(fetch.fetched)
+    status = mirror.status()['linearizations']['tm2']
+    assert not status['complete']
+    # Everything fetched before the interruption was kept
+    assert status['entities'] == len(first_run)
+
+    # A new process picks up the frontier from the file
+    fetch.interrupt_after = None
+    resumed = ICD11Mirror(directory=str(tmp_path))
+    summary = resumed.sync(fetch, CANONICAL_BASE, linearizations=('tm2',), workers=1)
+
+    total = len(fetch.entities('tm2'))
+    assert summary['tm2']['fetched'] == total - len(first_run)
+    assert summary['tm2']['complete']
+    assert sorted(fetch.fetched) == sorted(entity['@id'] for entity in fetch.entities('tm2').values())
+    assert_breadth_first(fetch, 'tm2')
+
+
+def test_failed_fetches_are_retried_then_skipped(mirror, fetch):
+    flaky = fetch.uri('mms', '3001')
+    broken = fetch.uri('mms', '3002')
+    fetch.failures = {flaky: 2, broken: 99}
+
+    summary = mirror.sync(fetch, CANONICAL_BASE, linearizations=('mms',), workers=4, max_attempts=3)['mms']
+
+    # The broken chapter and its six children are missing; the walk still completes
+    total = len(fetch.entities('mms'))
+    assert summary == {'fetched': total - 7, 'failed': 1, 'retried': 4, 'remaining': 0, 'complete': True}
+    assert mirror.get_entity('3001', 'mms') is not None
+    assert mirror.get_entity('3002', 'mms') is None
+    assert mirror.status()['linearizations']['mms']['failed'] == 1
+
+    # More attempts on a later run pick the failed URI up again
+    fetch.failures = {}
+    summary = mirror.sync(fetch, CANONICAL_BASE, linearizations=('mms',), workers=4, max_attempts=5)['mms']
+    assert summary['fetched'] == 7 and summary['failed'] == 0
+    assert mirror.status()['linearizations']['mms']['entities'] == total
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Incremental index updates must serve the same data as a full rebuild of the same files
+"""
+
+import io
+import os
+import sys
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.csv_processor import csv_processor
+from services.snapshot import SourceDelta, source_version
+
+FIELDS = ('system', 'code', 'term_english', 'term_original', 'description', 'category', 'icd11_code', 'icd11_term')
+QUERIES = ['vata', 'fever', 'zznew', 'replaced', 'siddha']
+TEXTS = ['fever with cough', 'vata disorder of joints', 'new siddha fever condition']
+
+
+def live_rows(snapshot):
+    records = snapshot.records
+    return Counter(records.values(row_id, FIELDS) for row_id in range(len(records)) if row_id not in snapshot.deleted_rows)
+
+
+def codes(records, row_ids):
+    return sorted(records.value(row_id, 'code') for row_id in row_ids)
+
+
+def reference_top_k(service, incremental, full, text, k, threshold):
+    """Brute-force top-k over the full rebuild's live rows, vectorized with the incremental vocabulary"""
+    records = full.records
+    documents = [
+        service._document_text(term, description, category)
+        for term, description, category in zip(records.column('term_english'), records.column('description'), records.column('category'))
+    ]
+    scores = (incremental.vectorizer.transform(documents) @ incremental.vectorizer.transform([text.lower()]).T).toarray().ravel()
+    by_row = {records.values(row_id, FIELDS): score for row_id, score in enumerate(scores)}
+    return sorted((score for score in scores if score > threshold), reverse=True)[:k], by_row
+
+
+def assert_matches_full_rebuild(app_module, service, fresh_service):
+    """Same live rows, stats and search hits as a full rebuild; top-k exact under the kept vocabulary"""
+    incremental = service.peek_snapshot()
+    full = fresh_service().peek_snapshot()
+
+    assert live_rows(incremental) == live_rows(full)
+    assert incremental.stats.to_dict() == full.stats.to_dict()
+    for query in QUERIES:
+        assert codes(incremental.records, incremental.search_index.search(query, None, None)) == \
+            codes(full.records, full.search_index.search(query, None, None)), query
+    for text in TEXTS:
+        query = incremental.vectorizer.transform([text.lower()])
+        threshold = app_module.DEFAULT_SIMILARITY_THRESHOLD
+        matches = incremental.retrieval_index.top_k(query, k=5, threshold=threshold)
+        expected, scores = reference_top_k(service, incremental, full, text, 5, threshold)
+        assert [score for _, score in matches] == pytest.approx(expected), text
+        for row_id, score in matches:
+            assert row_id not in incremental.deleted_rows
+            assert scores[incremental.records.values(row_id, FIELDS)] == pytest.approx(score)
+
+
+def upload(app_module, system_type, text):
+    client = app_module.app.test_client()
+    return client.post(
+        '/api/csv/upload',
+        data={'system_type': system_type, 'file': (io.BytesIO(text.encode('utf-8')), 'upload.csv')},
+        content_type='multipart/form-data'
+    )
+
+
+def test_upload_merge_delta_matches_full_rebuild(app_module, service, fresh_service, monkeypatch):
+    monkeypatch.setattr(service, '_plan_from_file', lambda *args: pytest.fail('upload delta was not used'))
+    # Upload rows are streamed back from the upload file in several chunks
+    monkeypatch.setattr(csv_processor, 'chunk_rows', 2)
+    existing = pd.read_csv(csv_processor.resource_path('ayurveda'), dtype=str)['code'].tolist()
+    text = (
+        "code,term_original,term_english,description,category,icd11_code,icd11_term\n"
+        f"{existing[0]},x,replaced ayurveda fever,d,Cat,,\n"
+        "ZZNEW1,y,zznew cough,d,Cat,,\n"
+        "ZZNEW1,y,zznew cough again,d,Cat,BA00,Thing\n"
+        f"{existing[3]},z,replaced three,d,Cat,,\n"
+    )
+
+    for system_type in ('ayurveda', 'siddha'):
+        response = upload(app_module, system_type, text)
+        assert response.status_code == 200
+        assert response.get_json()['index_update']['mode'] == 'incremental'
+    assert response.get_json()['index_update']['added'] == 3
+    assert_matches_full_rebuild(app_module, service, fresh_service)
+
+
+def test_auto_map_delta_matches_full_rebuild(app_module, service, fresh_service):
+    df, path = csv_processor.load_mapping_frame('siddha')
+    mapped_rows = [0, 5, 17]
+    df[['icd11_code', 'icd11_term']] = df[['icd11_code', 'icd11_term']].astype(object)
+    df.loc[mapped_rows, ['icd11_code', 'icd11_term']] = ['XX00', 'Test mapping']
+    delta = csv_processor.save_mapping_frame(df, path, mapped_rows)
+
+    result = service.apply_incremental_update('siddha', delta)
+    assert result == {'mode': 'incremental', 'added': 0, 'changed': 3, 'removed': 0}
+    assert service.peek_snapshot().stats.to_dict()['mapping']['by_system']['siddha']['mapped'] == 3
+    assert_matches_full_rebuild(app_module, service, fresh_service)
+
+
+def test_chained_deltas_match_full_rebuild(app_module, service, fresh_service):
+    path = csv_processor.resource_path('unani')
+    raw = pd.read_csv(path, dtype=str)
+    base = source_version(path)
+    changed = dict(raw.iloc[3].to_dict(), NUMC_TERM='changed unani term')
+    appended = [dict(raw.iloc[0].to_dict(), NUMC_CODE='ZZNEW2', NUMC_TERM='zznew unani row')]
+    rewritten = raw.drop(index=[0, 10])
+    rewritten.loc[3, 'NUMC_TERM'] = 'changed unani term'
+    pd.concat([rewritten, pd.DataFrame(appended)], ignore_index=True).to_csv(path, index=False)
+    delta = SourceDelta(base, source_version(path), removed=[0, 10], updated={3: changed}, appended=appended)
+    assert service.apply_incremental_update('unani', delta) == {'mode': 'incremental', 'added': 1, 'changed': 1, 'removed': 2}
+
+    # A second delta against the new file version
+    raw = pd.read_csv(path, dtype=str)
+    base = source_version(path)
+    raw.drop(index=[0]).to_csv(path, index=False)
+    assert service.apply_incremental_update('unani', SourceDelta(base, source_version(path), removed=[0]))['removed'] == 1
+    assert_matches_full_rebuild(app_module, service, fresh_service)
+
+
+def test_stale_or_missing_delta_falls_back_to_file_diff(app_module, service, fresh_service):
+    path = csv_processor.resource_path('unani')
+    raw = pd.read_csv(path, dtype=str)
+    raw.drop(index=[1, 2]).to_csv(path, index=False)
+    stale = SourceDelta(('not', 'this', 'version'), source_version(path), removed=[7])
+
+    assert service.apply_incremental_update('unani', stale)['removed'] == 2
+    assert_matches_full_rebuild(app_module, service, fresh_service)
+
+    pd.read_csv(path, dtype=str).iloc[:-5].to_csv(path, index=False)
+    assert service.apply_incremental_update('unani')['removed'] == 5
+    assert_matches_full_rebuild(app_module, service, fresh_service)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Node-local response cache: fresh/stale/miss by age, least-recently-read eviction, and
+stale-while-revalidate in the WHO search tier (stale value served, one background refresh)
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import services.local_cache as local_cache_module
+from services.local_cache import LocalResponseCache
+from services.who_icd11_service import WHOIcd11Service
+
+
+class FakeClock:
+    """Stands in for the time module; only time() is used"""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(local_cache_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return LocalResponseCache(path=str(tmp_path / 'responses.sqlite3'), fresh_seconds=60, stale_seconds=600)
+
+
+def test_entries_are_fresh_then_stale_then_missing(cache, clock):
+    assert cache.get('search', 'vata') == (None, 'miss')
+    cache.set('search', 'vata', {'results': ['SD00']})
+
+    assert cache.get('search', 'vata') == ({'results': ['SD00']}, 'fresh')
+    clock.now += 61
+    assert cache.get('search', 'vata') == ({'results': ['SD00']}, 'stale')
+    clock.now += 540
+    assert cache.get('search', 'vata') == (None, 'miss')
+    # Namespaces are separate
+    cache.set('entity', 'vata', {'id': 1})
+    assert cache.get('search', 'vata') == (None, 'miss')
+
+    stats = cache.stats()
+    assert (stats['fresh_hits'], stats['stale_hits'], stats['misses'], stats['writes']) == (1, 1, 3, 2)
+
+
+def test_least_recently_read_entries_are_evicted(cache, clock):
+    payload = 'x' * 100
+    cache.max_bytes = 350
+    for key in ('a', 'b', 'c'):
+        cache.set('search', key, payload)
+        clock.now += 1
+    # Reads refresh the access time at most once per TOUCH_INTERVAL
+    clock.now += cache.TOUCH_INTERVAL + 1
+    assert cache.get('search', 'a')[1] == 'stale'
+
+    cache.set('search', 'd', payload)
+    assert cache.get('search', 'b') == (None, 'miss')
+    assert [cache.get('search', key)[0] for key in ('a', 'c', 'd')] == [payload] * 3
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_expired_entries_are_dropped_before_live_ones(cache, clock):
+    cache.max_bytes = 250
+    cache.set('search', 'old', 'x' * 100)
+    clock.now += 601
+    cache.set('search', 'new', 'y' * 100)
+    cache.set('search', 'newer', 'z' * 100)
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 0
+    assert cache.get('search', 'new')[0] == 'y' * 100
+
+
+def local_key(key):
+    """The local tier stores searches under the JSON of the search cache key"""
+    return json.dumps(key, ensure_ascii=False)
+
+
+@pytest.fixture
+def who(tmp_path, clock, monkeypatch):
+    """A WHO service with only the local tier: no credentials, mirror or Firestore"""
+    monkeypatch.setenv('WHO_ICD11_CLIENT_ID', 'your_client_id_here')
+    monkeypatch.setenv('WHO_LOCAL_CACHE_PATH', str(tmp_path / 'who.sqlite3'))
+    monkeypatch.setenv('WHO_LOCAL_CACHE_FRESH', '60')
+    monkeypatch.setenv('WHO_LOCAL_CACHE_STALE', '600')
+    monkeypatch.setenv('WHO_MIRROR_DIR', str(tmp_path / 'mirror'))
+    monkeypatch.setenv('WHO_FIRESTORE_CACHE', 'false')
+    return WHOIcd11Service()
+
+
+def test_stale_hit_is_served_while_one_refresh_runs(who, clock):
+    release = threading.Event()
+    calls = []
+
+    def upstream(query, include_tm2, deadline):
+        calls.append(query)
+        assert release.wait(10)
+        return {'results': [{'code': 'NEW'}], 'partial': False, 'sources': {'tm2': {'status': 'ok'}}}
+
+    who._search_upstream = upstream
+    key = who.search_cache_key('vata joint')
+    stale = {'results': [{'code': 'OLD'}], 'partial': False, 'sources': {'tm2': {'status': 'ok'}}}
+    who.local_cache.set('search', local_key(key), stale)
+    clock.now += 61
+
+    # Every caller gets the stale value at once; only one refresh is started
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        served = list(pool.map(lambda _: who._search_local_tier(key, 'vata joint', True, None), range(6)))
+    assert served == [stale] * 6
+    deadline = time.time() + 10
+    while not calls and time.time() < deadline:
+        time.sleep(0.01)
+    assert calls == ['vata joint']
+    assert who._search_local_tier(key, 'vata joint', True, None) == stale
+
+    release.set()
+    deadline = time.time() + 10
+    while who._revalidating and time.time() < deadline:
+        time.sleep(0.01)
+    assert calls == ['vata joint']
+    # The refresh replaced both tiers
+    assert who.local_cache.get('search', local_key(key)) == (
+        {'results': [{'code': 'NEW'}], 'partial': False, 'sources': {'tm2': {'status': 'ok'}}}, 'fresh'
+    )
+    assert who.search_cache.get(key)['results'] == [{'code': 'NEW'}]
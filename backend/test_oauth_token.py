@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+RenewingToken: no renewal spin on a non-positive expires_in, minimum renew delay, backoff after failures
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import services.oauth_token as oauth_token_module
+from services.oauth_token import RenewingToken
+
+
+class FakeClock:
+    """Stands in for the time module; only monotonic() is used"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TokenEndpoint:
+    """fetch() returning scripted (token, expires_in) pairs or raising scripted errors"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        response = self.responses[min(self.calls, len(self.responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(oauth_token_module, 'time', clock)
+    return clock
+
+
+@pytest.mark.parametrize('expires_in', [0, -5])
+def test_expired_token_does_not_spin_the_renewer(clock, expires_in):
+    endpoint = TokenEndpoint(('t1', expires_in))
+    token = RenewingToken(endpoint, retry_seconds=15)
+    token.start()
+
+    # The clock is frozen: a renewer scheduling itself for "now" would call the endpoint in a loop
+    time.sleep(0.2)
+    assert endpoint.calls == 1
+    assert token.get() is None
+    assert endpoint.calls == 1
+    stats = token.stats()
+    assert (stats['failures'], stats['consecutive_failures'], stats['valid']) == (1, 1, False)
+
+
+def test_short_lived_token_renews_no_sooner_than_the_minimum(clock):
+    endpoint = TokenEndpoint(('t1', 2))
+    token = RenewingToken(endpoint, refresh_margin=300, min_renew_seconds=5)
+
+    assert token.get() == 't1'
+    assert token.stats()['renews_in'] == 5
+    time.sleep(0.1)
+    assert endpoint.calls == 1
+
+
+def test_failures_back_off_exponentially_up_to_the_cap(clock):
+    endpoint = TokenEndpoint(RuntimeError('503'))
+    token = RenewingToken(endpoint, retry_seconds=10, max_retry_seconds=35)
+
+    attempts = []
+    for _ in range(120):
+        token.get()
+        attempts.append(endpoint.calls)
+        clock.now += 1
+    # A new attempt is made 10, 20, 35, 35... seconds after each failure
+    started = [second for second in range(len(attempts)) if attempts[second] != (attempts[second - 1] if second else 0)]
+    assert started == [0, 10, 30, 65, 100]
+
+
+def test_success_resets_the_backoff(clock):
+    endpoint = TokenEndpoint(RuntimeError('503'), RuntimeError('503'), ('t1', 3600), RuntimeError('503'))
+    token = RenewingToken(endpoint, retry_seconds=10, max_retry_seconds=300)
+
+    assert token.get() is None
+    clock.now += 10
+    assert token.get() is None
+    clock.now += 20
+    assert token.get() == 't1'
+    assert token.stats()['consecutive_failures'] == 0
+
+    token.invalidate()
+    assert token.get() is None
+    assert token.stats()['consecutive_failures'] == 1
+    clock.now += 9
+    token.get()
+    assert endpoint.calls == 4
+    clock.now += 1
+    token.get()
+    assert endpoint.calls == 5
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Batch prediction must return what per-item predict_mapping returns for the same texts and options
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.csv_processor import csv_processor
+
+TEXTS = [
+    'Patient has vata imbalance with digestive issues',
+    'fever with cough',
+    'chronic dry cough and breathlessness',
+    'headache',
+    'joint pain and swelling, worse in the morning',
+    'zzqx nothing matches this',
+    '',
+    'Fever WITH Cough',
+]
+
+
+@pytest.fixture
+def scored(service, monkeypatch):
+    """Predictions as (row_id, similarity) so scores are compared unrounded"""
+    monkeypatch.setattr(type(service), '_build_prediction', staticmethod(lambda snapshot, idx, similarity: (int(idx), float(similarity))))
+    return service
+
+
+def assert_same_predictions(batch, single):
+    """Same scores in the same order; rows may only differ among equal scores"""
+    assert [score for _, score in batch] == pytest.approx([score for _, score in single])
+    scores = dict(single)
+    for row_id, score in batch:
+        if row_id in scores:
+            assert scores[row_id] == pytest.approx(score)
+        else:
+            assert any(other == pytest.approx(score) for other in scores.values())
+
+
+@pytest.mark.parametrize('top_k', [1, 3, 10])
+@pytest.mark.parametrize('chunk_size', [1, 3, 512])
+def test_batch_matches_single_predictions(app_module, scored, top_k, chunk_size):
+    snapshot = scored.peek_snapshot()
+    threshold = app_module.DEFAULT_SIMILARITY_THRESHOLD
+
+    results = list(scored.predict_mapping_batch(TEXTS, top_k=top_k, threshold=threshold, chunk_size=chunk_size, snapshot=snapshot))
+    assert [index for index, _ in results] == list(range(len(TEXTS)))
+    assert any(predictions for _, predictions in results)
+    for (index, predictions), text in zip(results, TEXTS):
+        assert_same_predictions(predictions, scored.predict_mapping(text, top_k=top_k, snapshot=snapshot))
+
+
+def test_per_item_options_match_single_predictions(app_module, scored):
+    snapshot = scored.peek_snapshot()
+    items = [
+        {'clinical_text': 'fever with cough', 'top_k': 5},
+        {'clinical_text': 'vata disorder of joints', 'top_k': 2, 'threshold': 0.3},
+        'headache',
+        {'clinical_text': 'fever', 'top_k': 0},
+    ]
+    expected = [
+        scored.predict_mapping('fever with cough', top_k=5, snapshot=snapshot),
+        [match for match in scored.predict_mapping('vata disorder of joints', top_k=50, snapshot=snapshot) if match[1] > 0.3][:2],
+        scored.predict_mapping('headache', top_k=3, snapshot=snapshot),
+        [],
+    ]
+
+    results = dict(scored.predict_mapping_batch(items, top_k=3, snapshot=snapshot))
+    for index, predictions in enumerate(expected):
+        assert_same_predictions(results[index], predictions)
+
+
+def test_batch_skips_deleted_rows_like_single(app_module, scored):
+    # Tombstoned and appended rows after an incremental update
+    df, path = csv_processor.load_mapping_frame('siddha')
+    df = df.drop(index=[0, 1, 2]).reset_index(drop=True)
+    df.loc[len(df)] = dict(df.iloc[0].to_dict(), code='ZZNEW3', term_english='fever with cough and cold')
+    df.to_csv(path, index=False)
+    scored.apply_incremental_update('siddha')
+    snapshot = scored.peek_snapshot()
+    assert snapshot.deleted_rows
+
+    for index, predictions in scored.predict_mapping_batch(TEXTS, top_k=10, snapshot=snapshot):
+        assert not {row_id for row_id, _ in predictions} & snapshot.deleted_rows
+        assert_same_predictions(predictions, scored.predict_mapping(TEXTS[index], top_k=10, snapshot=snapshot))
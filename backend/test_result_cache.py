@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+SingleFlightCache: one compute per key across concurrent callers, LRU eviction and TTL expiry
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import services.result_cache as result_cache_module
+from services.result_cache import SingleFlightCache
+
+
+class FakeClock:
+    """Stands in for the time module; only monotonic() is used"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache_module, 'time', clock)
+    return clock
+
+
+def test_concurrent_misses_share_one_compute():
+    cache = SingleFlightCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        assert release.wait(10)
+        return {'results': ['x']}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_compute, 'key', compute) for _ in range(8)]
+        # Let every caller reach the cache before the upstream call returns
+        deadline = time.time() + 10
+        while cache.stats()['coalesced'] < 7 and time.time() < deadline:
+            time.sleep(0.005)
+        release.set()
+        values = [future.result(10) for future in futures]
+
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+    stats = cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['in_flight']) == (1, 7, 0)
+    # Later callers are plain hits
+    assert cache.get_or_compute('key', lambda: pytest.fail('recomputed')) is values[0]
+
+
+def test_errors_and_uncacheable_values_are_not_stored():
+    cache = SingleFlightCache()
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('key', fail)
+    assert cache.get('key') is None
+    assert cache.get_or_compute('key', lambda: 'partial', cacheable=lambda value: False) == 'partial'
+    assert cache.get('key') is None
+    assert cache.get_or_compute('key', lambda: 'full') == 'full'
+    assert cache.get('key') == 'full'
+    assert cache.stats()['errors'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SingleFlightCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SingleFlightCache(ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=300)
+
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.stats()['expired'] == 1
+
+    # An expired key is computed again
+    assert cache.get_or_compute('a', lambda: 10) == 10
+    assert cache.stats()['misses'] == 1
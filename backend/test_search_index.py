@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+NAMASTE search index: token/prefix matching with AND/OR, system filters and table-order results
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.record_store import TerminologyRecordStore
+from services.search_index import NAMASTESearchIndex
+
+COLUMNS = ['system', 'code', 'term_english', 'term_original', 'description', 'category']
+
+ROWS = [
+    ['Ayurveda', 'AY-1', 'vata disorder', 'वातव्याधि', 'Disease of vata dosha', 'Vata'],
+    ['Ayurveda', 'AY-2', 'fever', 'ज्वर', 'Raised body temperature', 'Jvara'],
+    ['Siddha', 'SI-1', 'vatham', 'வாதம்', 'Vata-type joint pain', 'Vatham'],
+    ['Siddha', 'SI-2', 'cough', 'இருமல்', 'Persistent cough with fever', 'Kasam'],
+    ['Unani', 'UN-1', 'headache', 'صداع', 'Pain in the head', 'Sar'],
+    ['Unani', 'UN-2', 'fever with chills', 'حمى', 'Intermittent fever', 'Humma'],
+]
+
+
+def build_index():
+    records = TerminologyRecordStore.from_dataframe(pd.DataFrame(ROWS, columns=COLUMNS))
+    return records, NAMASTESearchIndex.from_records(records)
+
+
+def codes(records, row_ids):
+    return [records.value(row_id, 'code') for row_id in row_ids]
+
+
+def substring_search(records, query):
+    """The previous behaviour: the whole query anywhere in any search field"""
+    query = query.lower()
+    return [
+        row_id for row_id in range(len(records))
+        if any(query in records.value(row_id, field).lower() for field in NAMASTESearchIndex.SEARCH_FIELDS)
+    ]
+
+
+def test_terms_match_word_prefixes():
+    records, index = build_index()
+
+    assert codes(records, index.search('vat', limit=None)) == ['AY-1', 'SI-1']
+    assert codes(records, index.search('VATHAM', limit=None)) == ['SI-1']
+    # Native-script terms, categories and codes are searched too
+    assert codes(records, index.search('ज्व', limit=None)) == ['AY-2']
+    assert codes(records, index.search('humma', limit=None)) == ['UN-2']
+    assert codes(records, index.search('un', limit=None)) == ['UN-1', 'UN-2']
+
+
+def test_and_or_operators():
+    records, index = build_index()
+
+    assert codes(records, index.search('fever cough', limit=None)) == ['SI-2']
+    assert codes(records, index.search('fever cough', limit=None, operator='or')) == ['AY-2', 'SI-2', 'UN-2']
+    assert index.search('fever headache', limit=None) == []
+    # Term order and repetition do not matter
+    assert index.search('cough fever fever', limit=None) == index.search('fever cough', limit=None)
+
+
+def test_system_filter_and_limit():
+    records, index = build_index()
+
+    assert codes(records, index.search('fever', systems=['unani'], limit=None)) == ['UN-2']
+    assert codes(records, index.search('fever', systems=['Ayurveda', 'SIDDHA'], limit=None)) == ['AY-2', 'SI-2']
+    assert index.search('fever', systems=[], limit=None) == []
+    assert codes(records, index.search('', systems=['siddha'], limit=None)) == ['SI-1', 'SI-2']
+    assert codes(records, index.search('', limit=3)) == ['AY-1', 'AY-2', 'SI-1']
+
+
+def test_prefix_matching_differs_from_substring_matching():
+    records, index = build_index()
+
+    # Word prefixes match the same rows either way
+    for query in ('fever', 'vata', 'pain', 'head'):
+        assert index.search(query, limit=None) == substring_search(records, query), query
+    # Mid-word fragments only matched as substrings
+    assert codes(records, substring_search(records, 'ata')) == ['AY-1', 'SI-1']
+    assert index.search('ata', limit=None) == []
+    assert codes(records, substring_search(records, 'ache')) == ['UN-1']
+    assert index.search('ache', limit=None) == []
+    # Several words are matched independently, not as one phrase
+    assert substring_search(records, 'chills fever') == []
+    assert codes(records, index.search('chills fever', limit=None)) == ['UN-2']
+
+
+def test_delta_rows_are_searched_and_removed_rows_are_not():
+    records, index = build_index()
+    updated = index.with_delta(
+        [(len(records), ('fever chart', 'x', 'new row', 'Jvara', 'AY-3'), 'Ayurveda')],
+        [1]
+    )
+
+    assert updated.search('fever', limit=None) == [3, 5, len(records)]
+    assert updated.search('fever', systems=['ayurveda'], limit=None) == [len(records)]
+    # The base index is unchanged
+    assert index.search('fever', limit=None) == [1, 3, 5]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+TokenSetScorer: same scores and ranking as a plain set-based Jaccard
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.similarity import TokenSetScorer
+
+QUERIES = ['Joint pain', 'fever fever with  chills', 'VATA disorder of joints', '', '   ', 'unmatched']
+
+CANDIDATES = [
+    'Pain in joint',
+    'Joint pain joint pain',
+    'Fever with chills',
+    'fever',
+    'Disorders of joints',
+    'Vata dosha disorder',
+    '',
+    ' ',
+    'Fever with chills',
+    'chills WITH fever fever',
+]
+
+
+def jaccard(a, b):
+    """The reference: intersection over union of lowercase whitespace token sets, 0 if either is empty"""
+    a, b = set(a.lower().split()), set(b.lower().split())
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def ranking(scores):
+    """Candidate positions by descending score, ties in candidate order"""
+    return sorted(range(len(scores)), key=lambda position: -scores[position])
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_scores_match_set_jaccard(query):
+    scorer = TokenSetScorer()
+    expected = [jaccard(query, candidate) for candidate in CANDIDATES]
+
+    scores = scorer.scores(query, CANDIDATES)
+    assert scores.tolist() == pytest.approx(expected)
+    assert ranking(scores.tolist()) == ranking(expected)
+
+
+def test_duplicate_tokens_count_once():
+    scorer = TokenSetScorer()
+
+    assert scorer.scores('pain pain joint', ['joint pain', 'joint joint joint']).tolist() == pytest.approx([1.0, 0.5])
+
+
+def test_empty_inputs():
+    scorer = TokenSetScorer()
+
+    assert scorer.scores('fever', []).tolist() == []
+    assert scorer.scores('', ['fever', '']).tolist() == [0.0, 0.0]
+    assert scorer.scores('fever', ['', ' ']).tolist() == [0.0, 0.0]
+
+
+def test_cache_reset_keeps_scores_exact():
+    # Resets between batches (never inside one) must not mix token ids from two vocabularies
+    scorer = TokenSetScorer(max_cached=len(CANDIDATES) + 2)
+    for query in QUERIES * 2:
+        expected = [jaccard(query, candidate) for candidate in CANDIDATES]
+        assert scorer.scores(query, CANDIDATES).tolist() == pytest.approx(expected), query
+        assert len(scorer._cache) <= scorer.max_cached
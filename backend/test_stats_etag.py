@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+/api/stats: prerendered body with an ETag, 304 on a matching If-None-Match, new tag after updates
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.csv_processor import csv_processor
+from services.stats import TerminologyStats
+
+
+def get_stats(app_module, etag=None):
+    headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+    return app_module.app.test_client().get('/api/stats', headers=headers)
+
+
+def test_stats_body_and_etag(app_module, service):
+    response = get_stats(app_module)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    snapshot = service.peek_snapshot()
+    stats = response.get_json()
+    assert response.get_etag()[0] == snapshot.stats.etag
+    assert stats == TerminologyStats.from_records(snapshot.records, snapshot.deleted_rows).to_dict()
+    # ICD-11 mappings present in the resource files are kept when loading
+    assert stats['mapping']['by_system']['ayurveda']['mapped'] == 27
+    assert stats['total_codes'] == sum(stats['systems'].values())
+
+
+def test_matching_etag_gets_304(app_module, service):
+    etag = get_stats(app_module).get_etag()[0]
+
+    response = get_stats(app_module, etag)
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.get_etag()[0] == etag
+
+    assert get_stats(app_module, 'someothertag').status_code == 200
+
+
+def test_update_changes_etag(app_module, service):
+    old = get_stats(app_module)
+    df, path = csv_processor.load_mapping_frame('siddha')
+    df[['icd11_code', 'icd11_term']] = df[['icd11_code', 'icd11_term']].astype(object)
+    df.loc[[1, 2], ['icd11_code', 'icd11_term']] = ['XX00', 'Test mapping']
+    service.apply_incremental_update('siddha', csv_processor.save_mapping_frame(df, path, [1, 2]))
+
+    response = get_stats(app_module, old.get_etag()[0])
+    assert response.status_code == 200
+    assert response.get_etag()[0] != old.get_etag()[0]
+    stats = json.loads(response.data)
+    assert stats['mapping']['mapped'] == old.get_json()['mapping']['mapped'] + 2
+    assert stats['mapping']['by_system']['siddha']['mapped'] == 2
+
+
+
+def test_artifact_restores_stats_and_fuzzy_index(app_module, fresh_service, monkeypatch):
+    built = fresh_service()
+    restored = app_module.NAMASTEMappingService(autoload=False)
+    restored.model_store.cache_dir = built.model_store.cache_dir
+    # Both come from the artifact: neither is recounted nor rebuilt from the records
+    monkeypatch.setattr(TerminologyStats, 'from_records', lambda *args: pytest.fail('stats were recounted'))
+    monkeypatch.setattr(restored, 'build_fuzzy_index', lambda records: pytest.fail('fuzzy index was rebuilt'))
+    restored.reload()
+
+    expected, snapshot = built.peek_snapshot(), restored.peek_snapshot()
+    assert (snapshot.stats.body, snapshot.stats.etag) == (expected.stats.body, expected.stats.etag)
+    assert snapshot.stats.to_dict() == expected.stats.to_dict()
+    for query in ('वात', 'व्याधि', 'சித்தா', 'رطوبت'):
+        matches = expected.fuzzy_index.search(query, limit=None)
+        assert matches and snapshot.fuzzy_index.search(query, limit=None) == matches, query
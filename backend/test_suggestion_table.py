@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+ICD-11 suggestion table: one background build at a time, through the table and the refresh endpoint
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import services.suggestion_table as suggestion_table_module
+from services.suggestion_table import ICD11SuggestionTable
+
+
+class BlockingLookups:
+    """Stands in for the WHO service; lookups wait until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get_mapping_suggestions(self, term, code):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(10)
+        return [{'icd11_code': f"M-{code}", 'icd11_term': term, 'confidence': 90}]
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    lookups = BlockingLookups()
+    monkeypatch.setattr(suggestion_table_module, 'who_service', lookups)
+    yield lookups
+    lookups.release.set()
+
+
+@pytest.fixture
+def table(tmp_path):
+    return ICD11SuggestionTable(path=str(tmp_path / 'suggestions.json'))
+
+
+def test_second_build_is_refused_while_one_runs(table, lookups):
+    rows = [('ayurveda', 'A1', 'fever'), ('ayurveda', 'A2', 'cough')]
+
+    assert table.build_async(rows)
+    assert lookups.started.wait(10)
+    assert table.stats()['building']
+    assert not table.build_async(rows, force=True)
+
+    lookups.release.set()
+    table._build_thread.join(10)
+    assert not table.stats()['building']
+    assert lookups.calls == 2
+    assert table.lookup('ayurveda', 'A2', 'cough')[0]['icd11_code'] == 'M-A2'
+
+    # Once finished, another build may start
+    assert table.build_async(rows, force=True)
+    table._build_thread.join(10)
+    assert lookups.calls == 4
+
+
+def test_refresh_endpoint_returns_409_while_building(app_module, table, lookups, monkeypatch):
+    monkeypatch.setattr(app_module, 'suggestion_table', table)
+    client = app_module.app.test_client()
+
+    response = client.post('/api/mapping/suggestions/refresh', json={})
+    assert response.status_code == 202
+    assert lookups.started.wait(10)
+
+    response = client.post('/api/mapping/suggestions/refresh', json={'force': True})
+    assert response.status_code == 409
+    assert response.get_json()['table']['building']
+    assert len([thread for thread in threading.enumerate() if thread.name == 'icd11-suggestion-build']) == 1
+
+    lookups.release.set()
+    table._build_thread.join(30)
+    assert client.post('/api/mapping/suggestions/refresh', json={}).status_code == 202
+    table._build_thread.join(30)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Exact top-k retrieval: ImpactOrderedIndex must agree with brute-force cosine scoring
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.topk_retrieval import ImpactOrderedIndex
+
+
+def random_tfidf(rows, terms=400, density=0.02, seed=0):
+    """L2-normalized sparse rows, like TfidfVectorizer output"""
+    matrix = sp.random(rows, terms, density=density, format='csr', random_state=seed, dtype=np.float64)
+    return normalize(matrix)
+
+
+def brute_force(matrix, query, k, threshold, deleted=()):
+    """Reference top-k: score every row, drop deleted ones, best first"""
+    scores = (matrix @ query.T).toarray().ravel()
+    scores[list(deleted)] = 0.0
+    candidates = [doc for doc in np.argsort(-scores, kind='stable') if scores[doc] > threshold]
+    return [(int(doc), float(scores[doc])) for doc in candidates[:k]], scores
+
+
+def assert_same_top_k(matches, expected, scores):
+    """Same scores in the same order; every returned doc really has its score"""
+    assert len(matches) == len(expected)
+    assert [score for _, score in matches] == pytest.approx([score for _, score in expected])
+    for doc, score in matches:
+        assert scores[doc] == pytest.approx(score)
+
+
+@pytest.mark.parametrize('k', [1, 3, 10, 50])
+@pytest.mark.parametrize('threshold', [0.0, 0.1])
+def test_top_k_matches_brute_force(k, threshold):
+    matrix = random_tfidf(2000)
+    index = ImpactOrderedIndex(matrix)
+    queries = random_tfidf(40, density=0.01, seed=1)
+
+    for row in range(queries.shape[0]):
+        query = queries[row]
+        expected, scores = brute_force(matrix, query, k, threshold)
+        assert_same_top_k(index.top_k(query, k=k, threshold=threshold), expected, scores)
+
+
+def test_top_k_from_persisted_arrays():
+    matrix = random_tfidf(500)
+    index = ImpactOrderedIndex.from_arrays(matrix, ImpactOrderedIndex(matrix).to_arrays())
+    query = random_tfidf(1, density=0.05, seed=2)
+
+    expected, scores = brute_force(matrix, query, 5, 0.0)
+    assert_same_top_k(index.top_k(query, k=5), expected, scores)
+
+
+def test_top_k_with_delta_rows_and_deletions():
+    matrix = random_tfidf(1000)
+    added = random_tfidf(30, seed=3)
+    added_ids = np.arange(1000, 1030)
+    deleted = [0, 5, 17, 999, 1003]
+    index = ImpactOrderedIndex(matrix).with_delta(added, added_ids, deleted)
+    corpus = sp.vstack([matrix, added]).tocsr()
+    queries = random_tfidf(25, density=0.01, seed=4)
+
+    for row in range(queries.shape[0]):
+        query = queries[row]
+        expected, scores = brute_force(corpus, query, 10, 0.0, deleted)
+        matches = index.top_k(query, k=10)
+        assert not set(doc for doc, _ in matches) & set(deleted)
+        assert_same_top_k(matches, expected, scores)
+
+
+def test_empty_query_and_zero_k():
+    index = ImpactOrderedIndex(random_tfidf(100))
+    assert index.top_k(sp.csr_matrix((1, 400)), k=3) == []
+    assert index.top_k(random_tfidf(1, seed=5), k=0) == []
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the WHO ICD-11 API, for offline development, benchmarking and load tests
+
+Serves the OAuth token endpoint, Foundation/TM2/MMS search and entity lookups from
+a synthetic corpus or from responses recorded against the real API, with
+configurable latency, error rate and rate limiting. Point the backend at it with:
+
+    WHO_API_BASE_URL=http://127.0.0.1:8765/icd
+    WHO_TOKEN_URL=http://127.0.0.1:8765/connect/token
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import uuid
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+CANONICAL_BASE = 'http://id.who.int/icd'
+
+# Vocabulary for the synthetic corpus: TM2 patterns by body system, MMS conditions by qualifier
+TM2_SITES = ['digestive', 'respiratory', 'nervous', 'joint', 'skin', 'urinary', 'fever', 'sleep']
+TM2_DOSHAS = ['vata', 'pitta', 'kapha', 'vata-pitta', 'pitta-kapha', 'vata-kapha', 'tridosha']
+TM2_KINDS = ['pattern', 'disorder', 'imbalance', 'aggravation', 'accumulation', 'depletion']
+MMS_CONDITIONS = [
+    'diabetes mellitus', 'essential hypertension', 'asthma', 'migraine', 'gastritis',
+    'osteoarthritis', 'psoriasis', 'insomnia', 'pneumonia', 'anaemia', 'chronic kidney disease',
+    'urinary tract infection', 'peptic ulcer', 'rheumatoid arthritis', 'eczema', 'bronchitis',
+    'obesity', 'hypothyroidism', 'fever of unknown origin', 'irritable bowel syndrome'
+]
+MMS_QUALIFIERS = ['', 'acute', 'chronic', 'recurrent', 'severe', 'unspecified']
+
+
+def normalize_query(value):
+    return ' '.join(value.lower().split())
+
+
+def request_key(path, params):
+    """Replay key: path plus sorted parameters with the search text normalized"""
+    items = sorted((name, normalize_query(value) if name == 'q' else value) for name, value in params.items())
+    return f"{path}?{urlencode(items)}"
+
+
+class SyntheticCorpus:
+    """Deterministic ICD-11-shaped trees for the foundation, tm2 and mms linearizations"""
+
+    def __init__(self, release_id='2023-01', scale=1):
+        self.release_id = release_id
+        self.entities = {'foundation': {}, 'tm2': {}, 'mms': {}}
+        self._build_tm2(scale)
+        self._build_mms(scale)
+        self.index = {name: self._index(entities) for name, entities in self.entities.items()}
+
+    def _uri(self, linearization, entity_id=''):
+        if linearization == 'foundation':
+            return f"{CANONICAL_BASE}/entity/{entity_id}".rstrip('/')
+        return f"{CANONICAL_BASE}/release/11/{self.release_id}/{linearization}/{entity_id}".rstrip('/')
+
+    def _add(self, linearization, entity_id, code, title, definition, parent):
+        entity = {
+            '@id': self._uri(linearization, entity_id),
+            'code': code,
+            'title': {'@language': 'en', '@value': title},
+            'definition': {'@language': 'en', '@value': definition},
+            'parent': [self._uri(linearization, parent)] if parent is not None else [],
+            'child': []
+        }
+        self.entities[linearization][entity_id] = entity
+        if parent is not None:
+            self.entities[linearization][parent]['child'].append(entity['@id'])
+        if linearization != 'foundation' and code:
+            # Every linearized entity also exists in the Foundation under a numeric id
+            foundation_id = str(100000000 + len(self.entities['foundation']))
+            self.entities['foundation'][foundation_id] = dict(entity, **{
+                '@id': self._uri('foundation', foundation_id), 'code': code, 'parent': [], 'child': []
+            })
+        return entity
+
+    def _build_tm2(self, scale):
+        self._add('tm2', '', '', 'Traditional Medicine conditions - Module 2', 'Supplementary chapter for traditional medicine', None)
+        for s, site in enumerate(TM2_SITES):
+            chapter = f"{2000 + s}"
+            self._add('tm2', chapter, f"S{chr(65 + s)}", f"{site.capitalize()} system patterns (TM2)",
+                      f"Traditional medicine patterns affecting the {site} system", '')
+            number = 0
+            for copy in range(scale):
+                for dosha in TM2_DOSHAS:
+                    for kind in TM2_KINDS:
+                        suffix = f" type {copy + 1}" if copy else ''
+                        self._add('tm2', f"{chapter}{number:04d}", f"S{chr(65 + s)}{number // 10:X}{number % 10}",
+                                  f"{dosha.capitalize()} {kind} of the {site} system{suffix} (TM2)",
+                                  f"A {dosha} {kind} presenting in the {site} system", chapter)
+                        number += 1
+
+    def _build_mms(self, scale):
+        self._add('mms', '', '', 'ICD-11 for Mortality and Morbidity Statistics', 'Root of the MMS linearization', None)
+        for c, condition in enumerate(MMS_CONDITIONS):
+            chapter = f"{3000 + c}"
+            code = f"{chr(65 + c % 26)}{chr(65 + c // 26)}{c:02d}"
+            self._add('mms', chapter, code, condition.capitalize(), f"Grouping for {condition}", '')
+            number = 0
+            for copy in range(scale):
+                for qualifier in MMS_QUALIFIERS:
+                    suffix = f" type {copy + 1}" if copy else ''
+                    title = f"{qualifier} {condition}{suffix}".strip().capitalize()
+                    self._add('mms', f"{chapter}{number:04d}", f"{code}.{number}", title,
+                              f"{title}, as classified for morbidity statistics", chapter)
+                    number += 1
+
+    @staticmethod
+    def _index(entities):
+        rows = []
+        for entity_id, entity in entities.items():
+            if entity['code']:
+                title = entity['title']['@value']
+                rows.append((re.findall(r'\w+', title.lower()), entity))
+        return rows
+
+    def search(self, linearization, query, limit):
+        """Entities whose title has a word starting with every query term, shortest titles first"""
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return []
+        matches = [
+            entity for words, entity in self.index[linearization]
+            if all(any(word.startswith(term) for word in words) for term in terms)
+        ]
+        matches.sort(key=lambda entity: len(entity['title']['@value']))
+        return matches[:limit]
+
+    def entity(self, linearization, entity_id):
+        return self.entities[linearization].get(entity_id)
+
+
+class StandIn:
+    """Request routing, fault injection, token bookkeeping and record/replay"""
+
+    def __init__(self, args):
+        self.args = args
+        self.corpus = SyntheticCorpus(args.release, args.scale)
+        self.tokens = {}
+        self.recordings = {}
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.latency = {'token': args.latency, 'search': args.latency, 'entity': args.latency}
+        for override in args.endpoint_latency or []:
+            name, _, value = override.partition('=')
+            self.latency[name] = float(value)
+        # Token bucket shared by all clients
+        self.bucket = float(args.rate_limit or 0)
+        self.bucket_at = time.monotonic()
+        self.random = random.Random(args.seed)
+        if args.replay:
+            self._load_recordings(args.replay)
+
+    def _load_recordings(self, path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recordings[entry['key']] = entry
+        print(f"📼 Loaded {len(self.recordings)} recorded responses from {path}")
+
+    def count(self, endpoint, status):
+        with self.lock:
+            counters = self.counters.setdefault(endpoint, {})
+            counters[status] = counters.get(status, 0) + 1
+
+    def rate_limited(self):
+        """True when the token bucket is empty; refills at --rate-limit per second"""
+        if not self.args.rate_limit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.bucket = min(self.args.rate_limit, self.bucket + (now - self.bucket_at) * self.args.rate_limit)
+            self.bucket_at = now
+            if self.bucket < 1:
+                return True
+            self.bucket -= 1
+            return False
+
+    def delay(self, endpoint, linearization=None):
+        """Sleep for the linearization's latency override, else the endpoint's, plus jitter"""
+        with self.lock:
+            jitter = self.random.uniform(0, self.args.jitter)
+        latency = self.latency.get(linearization, self.latency.get(endpoint, self.args.latency))
+        time.sleep((latency + jitter) / 1000)
+
+    def inject_error(self):
+        with self.lock:
+            if self.random.random() < self.args.error_rate:
+                return self.random.choice([500, 502, 503])
+        return None
+
+    def issue_token(self):
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = time.time() + self.args.token_ttl
+        return {'access_token': token, 'expires_in': self.args.token_ttl, 'token_type': 'Bearer', 'scope': 'icdapi_access'}
+
+    def authorized(self, header):
+        if self.args.no_auth:
+            return True
+        token = (header or '').replace('Bearer ', '', 1)
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    def record(self, key, status, body):
+        entry = {'key': key, 'status': status, 'body': body}
+        with self.lock:
+            self.recordings[key] = entry
+            with open(self.args.record, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def api_response(self, path, params):
+        """(status, body) for an API path relative to /icd"""
+        key = request_key(path, params)
+        if key in self.recordings:
+            entry = self.recordings[key]
+            return entry['status'], entry['body']
+        if self.args.strict:
+            return 404, {'error': f'No recording for {key}'}
+
+        release = f"/release/11/{self.args.release}/"
+        if path == '/entity/search':
+            return 200, self.search_body('foundation', params)
+        if path.startswith(release):
+            linearization, _, rest = path[len(release):].partition('/')
+            if linearization in ('tm2', 'mms'):
+                if rest == 'search':
+                    return 200, self.search_body(linearization, params)
+                entity = self.corpus.entity(linearization, rest)
+                if entity is not None:
+                    return 200, entity
+        elif path.startswith('/entity/'):
+            entity = self.corpus.entity('foundation', path[len('/entity/'):])
+            if entity is not None:
+                return 200, entity
+        return 404, {'error': 'Not found'}
+
+    def search_body(self, linearization, params):
+        entities = self.corpus.search(linearization, params.get('q', ''), self.args.max_results)
+        return {
+            'error': False,
+            'errorMessage': None,
+            'resultChopped': False,
+            'uniqueSearchId': uuid.uuid4().hex,
+            'destinationEntities': [
+                {
+                    # Search hits carry 'id'; only entity documents use JSON-LD '@id'
+                    'id': entity['@id'],
+                    'theCode': entity['code'],
+                    'title': entity['title']['@value'],
+                    'definition': entity['definition']['@value'],
+                    'score': 1.0
+                }
+                for entity in entities
+            ]
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    standin = None
+
+    def log_message(self, fmt, *args):
+        if self.standin.args.verbose:
+            super().log_message(fmt, *args)
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def guard(self, endpoint, linearization=None):
+        """Apply rate limiting, latency and error injection; True when the request may proceed"""
+        standin = self.standin
+        if standin.rate_limited():
+            standin.count(endpoint, 429)
+            self.send_json(429, {'error': 'Too many requests'}, {'Retry-After': '1'})
+            return False
+        standin.delay(endpoint, linearization)
+        status = standin.inject_error()
+        if status is not None:
+            standin.count(endpoint, status)
+            self.send_json(status, {'error': 'Injected failure'})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode('utf-8'))) if length else {}
+        if urlsplit(self.path).path != '/connect/token':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        if not self.guard('token'):
+            return
+
+        args = self.standin.args
+        if args.record:
+            upstream = requests.post(args.upstream_token_url, data=form, timeout=30)
+            self.standin.count('token', upstream.status_code)
+            self.send_json(upstream.status_code, upstream.json())
+            return
+        if not form.get('client_id') or not form.get('client_secret'):
+            self.standin.count('token', 400)
+            self.send_json(400, {'error': 'invalid_client'})
+            return
+        self.standin.count('token', 200)
+        self.send_json(200, self.standin.issue_token())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/standin/stats':
+            with self.standin.lock:
+                counters = {name: dict(statuses) for name, statuses in self.standin.counters.items()}
+            self.send_json(200, {'requests': counters, 'recordings': len(self.standin.recordings)})
+            return
+        if not url.path.startswith('/icd/'):
+            self.send_json(404, {'error': 'Not found'})
+            return
+
+        path = url.path[len('/icd'):]
+        params = dict(parse_qsl(url.query))
+        endpoint = 'search' if path.endswith('/search') else 'entity'
+        release = f"/release/11/{self.standin.args.release}/"
+        linearization = path[len(release):].split('/', 1)[0] if path.startswith(release) else 'foundation'
+        if not self.guard(endpoint, linearization):
+            return
+
+        args = self.standin.args
+        if args.record:
+            upstream = requests.get(f"{args.upstream_base}{path}", params=params, timeout=30, headers={
+                name: self.headers[name] for name in ('Authorization', 'Accept', 'API-Version', 'Accept-Language')
+                if self.headers.get(name)
+            })
+            body = upstream.json() if upstream.content else {}
+            if upstream.status_code == 200:
+                self.standin.record(request_key(path, params), 200, body)
+            self.standin.count(endpoint, upstream.status_code)
+            self.send_json(upstream.status_code, body)
+            return
+
+        if not self.standin.authorized(self.headers.get('Authorization')):
+            self.standin.count(endpoint, 401)
+            self.send_json(401, {'error': 'Invalid or expired token'})
+            return
+        status, body = self.standin.api_response(path, params)
+        self.standin.count(endpoint, status)
+        self.send_json(status, body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the WHO ICD-11 API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--release', default='2023-01', help='ICD-11 release id served')
+    parser.add_argument('--scale', type=int, default=1, help='Multiply the synthetic corpus size')
+    parser.add_argument('--max-results', type=int, default=50, help='Search results per linearization')
+    parser.add_argument('--latency', type=float, default=0, help='Added latency per request (ms)')
+    parser.add_argument('--jitter', type=float, default=0, help='Extra uniform random latency (ms)')
+    parser.add_argument('--endpoint-latency', action='append', metavar='NAME=MS',
+                        help='Latency override for token, search, entity, or foundation/tm2/mms calls (repeatable)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with a 5xx')
+    parser.add_argument('--rate-limit', type=float, default=0, help='Requests per second before answering 429')
+    parser.add_argument('--token-ttl', type=int, default=3600, help='Lifetime of issued tokens (seconds)')
+    parser.add_argument('--no-auth', action='store_true', help='Accept API calls without a valid token')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for latency jitter and error injection')
+    parser.add_argument('--replay', help='Serve responses recorded in this JSONL file before the synthetic corpus')
+    parser.add_argument('--strict', action='store_true', help='With --replay, answer 404 for unrecorded requests')
+    parser.add_argument('--record', help='Proxy to the real WHO API and append responses to this JSONL file')
+    parser.add_argument('--upstream-base', default='https://id.who.int/icd')
+    parser.add_argument('--upstream-token-url', default='https://icdaccessmanagement.who.int/connect/token')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    if args.record and args.replay:
+        parser.error('--record and --replay are mutually exclusive')
+
+    Handler.standin = StandIn(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+
+    corpus = Handler.standin.corpus
+    mode = f"recording to {args.record}" if args.record else 'serving'
+    print(f"🩺 WHO ICD-11 stand-in {mode} on http://{args.host}:{args.port}")
+    print(f"   Corpus: {', '.join(f'{name} {len(entities)}' for name, entities in corpus.entities.items())} entities")
+    print(f"   Latency {args.latency}ms (+{args.jitter}ms jitter), error rate {args.error_rate}, "
+          f"rate limit {args.rate_limit or 'off'}")
+    print(f"   WHO_API_BASE_URL=http://{args.host}:{args.port}/icd")
+    print(f"   WHO_TOKEN_URL=http://{args.host}:{args.port}/connect/token")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping stand-in")
+        server.server_close()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -100,8 +100,24 @@ const WHOSyncPanel = () => {
         body: JSON.stringify({ system_type: autoMappingStatus.selectedSystem })
       });
       
-      const result = await response.json();
-      
+      let result = await response.json();
+
+      // Auto-mapping runs as a background job; poll it until it finishes
+      let job = result.job;
+      while (job && (job.status === 'queued' || job.status === 'running')) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const statusResponse = await fetch(`${apiBaseUrl}/mapping/auto/jobs/${job.id}`);
+        job = (await statusResponse.json()).job;
+      }
+      if (job) {
+        result = {
+          success: job.status === 'completed',
+          message: job.status === 'completed'
+            ? `Successfully auto-mapped ${job.mapped} of ${job.total} codes`
+            : `Auto-mapping ${job.status} after ${job.processed} of ${job.total} codes${job.error ? `: ${job.error}` : ''}`
+        };
+      }
+
       setAutoMappingStatus(prev => ({
         ...prev,
         isMapping: false,